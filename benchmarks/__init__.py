@@ -0,0 +1,4 @@
+"""
+Benchmarks are plain scripts, kept out of the pytest run. Launch them from the repository root, e.g.
+python -m benchmarks.bench_assign
+"""
@@ -0,0 +1,41 @@
+"""
+Assign latency against the size of the run: looking a task up by reference shouldn't depend on how many tasks the
+StaffOptimizer holds.
+"""
+import random
+import statistics
+import time
+
+from src.staffoptimizer.domain.model import StaffOptimizer, Task, Status, Editor
+
+SIZES = (100, 1_000, 10_000, 100_000)
+SAMPLES = 2_000
+
+
+def make_run(size):
+    return StaffOptimizer(
+        "BENCH",
+        tasks=[Task(f"Task {i}", Status.REVIEW_STAFFING.value, f"Team {i % 20}") for i in range(size)],
+    )
+
+
+def assign_latency(size):
+    so = make_run(size)
+    editor = Editor("Medhi", "MB13")
+    references = [f"Task {random.randrange(size)}" for _ in range(SAMPLES)]
+    timings = []
+    for ref in references:
+        start = time.perf_counter()
+        so.assign(editor, so.get_task(ref))
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    print(f"{'tasks':>8} {'median assign (µs)':>20}")
+    for size in SIZES:
+        print(f"{size:>8} {assign_latency(size) * 1e6:>20.2f}")
+
+
+if __name__ == "__main__":
+    main()
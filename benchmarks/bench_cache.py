@@ -0,0 +1,55 @@
+"""
+Validating the same run again and again, as a dashboard polling it would, with and without the cache of aggregates,
+for runs of growing size on a file-backed SQLite database. A hit costs a SELECT of the revision of the run, one of
+the users assigned to its tasks, and attaching the cached aggregate to the session.
+
+    python -m benchmarks.bench_cache
+"""
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.staffoptimizer.adapters import database, orm
+from src.staffoptimizer.adapters.cache import AggregateCache
+from src.staffoptimizer.config import Settings
+from src.staffoptimizer.domain.model import Status
+from src.staffoptimizer.service_layer import services, unit_of_work
+
+REPEAT = 10
+
+
+def median_ms(function):
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    orm.start_mappers()
+    print(f"{'tasks':>7} {'uncached (ms)':>14} {'cached (ms)':>12} {'hit rate':>9}")
+    for size in (100, 1_000, 10_000, 50_000):
+        with tempfile.TemporaryDirectory() as directory:
+            url = f"sqlite:///{os.path.join(directory, 'bench.sqlite')}"
+            orm.metadata.create_all(create_engine(url))
+            engine = database.build_engine(Settings(database_url=url, metrics_enabled=False))
+            session_factory = sessionmaker(bind=engine)
+            uncached = unit_of_work.SQLAlchemyUnitOfWork(session_factory)
+            cache = AggregateCache(max_tasks=100_000)
+            cached = unit_of_work.SQLAlchemyUnitOfWork(session_factory, cache=cache)
+            tasks = [(f"Task {i}", Status.REVIEW_STAFFING.value, "Kosovo") for i in range(size)]
+            services.add_tasks("KB9", tasks, uncached)
+            print(
+                f"{size:>7} {median_ms(lambda: services.validate('KB9', uncached)):>14.1f} "
+                f"{median_ms(lambda: services.validate('KB9', cached)):>12.1f} {cache.stats()['hit_rate']:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
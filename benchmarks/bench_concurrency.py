@@ -0,0 +1,124 @@
+"""
+Requests per second served by the synchronous and the asynchronous endpoints, with CLIENTS concurrent clients
+validating their own run against a file-backed SQLite database.
+python -m benchmarks.bench_concurrency [CLIENTS] [SECONDS]
+
+The app runs under uvicorn in a separate process, built by create_app() from the BENCH_* environment variables.
+"""
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+
+from src.staffoptimizer.adapters import database, orm
+from src.staffoptimizer.config import Settings
+from src.staffoptimizer.entrypoints import async_router, router
+
+TASKS_PER_RUN = 20
+PORT = 8765
+
+
+def create_app():
+    orm.start_mappers()
+    database.configure(Settings(database_url=f"sqlite:///{os.environ['BENCH_DATABASE']}"))
+    app = FastAPI()
+    app.include_router(async_router.router if os.environ["BENCH_MODE"] == "async" else router.router)
+    app.on_event("shutdown")(database.dispose)
+    return app
+
+
+def seed(path, runs):
+    engine = create_engine(f"sqlite:///{path}")
+    orm.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(orm.staffoptimizers.insert(), [{"run_id": f"RUN{r}"} for r in range(runs)])
+        connection.execute(
+            orm.tasks.insert(),
+            [
+                {"run_id": f"RUN{r}", "reference": f"Task {t}", "status": 2, "team": "Kosovo"}
+                for r in range(runs)
+                for t in range(TASKS_PER_RUN)
+            ],
+        )
+
+
+async def client(run_id, deadline, latencies, errors):
+    reader, writer = await asyncio.open_connection("127.0.0.1", PORT)
+    request = f"POST /validate?run_id={run_id} HTTP/1.1\r\nHost: localhost\r\nContent-Length: 0\r\n\r\n".encode()
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        writer.write(request)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        length = 0
+        while (header := await reader.readline()) != b"\r\n":
+            name, _, value = header.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+        errors[status >= 400] += 1
+    writer.close()
+
+
+async def load(clients, seconds):
+    latencies, errors = [], {False: 0, True: 0}
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*(client(f"RUN{i}", deadline, latencies, errors) for i in range(clients)))
+    return latencies, errors[True]
+
+
+def wait_for_server():
+    for _ in range(100):
+        try:
+            asyncio.run(asyncio.open_connection("127.0.0.1", PORT))
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("uvicorn didn't start")
+
+
+def bench(mode, clients, seconds):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.sqlite")
+        seed(path, clients)
+        server = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "benchmarks.bench_concurrency:create_app", "--factory",
+                "--port", str(PORT), "--log-level", "warning",
+            ],
+            env={**os.environ, "BENCH_DATABASE": path, "BENCH_MODE": mode},
+        )
+        try:
+            wait_for_server()
+            latencies, errors = asyncio.run(load(clients, seconds))
+        finally:
+            server.terminate()
+            server.wait()
+    latencies.sort()
+    return {
+        "rps": len(latencies) / seconds,
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[int(len(latencies) * 0.99)] * 1000,
+        "errors": errors,
+    }
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10
+    print(f"{clients} concurrent clients, {seconds}s")
+    print(f"{'mode':<6} {'req/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9} {'errors':>7}")
+    for mode in ("sync", "async"):
+        result = bench(mode, clients, seconds)
+        print(f"{mode:<6} {result['rps']:>8.1f} {result['p50']:>9.1f} {result['p99']:>9.1f} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Per-request cost of getting a connection and running a trivial query on a file-backed SQLite database: with an engine
+built for each request, with the default engine of SQLAlchemy 1.4 (no pooling for SQLite files), and with the pooled
+engine of adapters.database.
+"""
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.staffoptimizer.adapters import database
+from src.staffoptimizer.config import Settings
+
+REQUESTS = 2_000
+
+
+def per_request_ms(get_session):
+    timings = []
+    for _ in range(REQUESTS):
+        start = time.perf_counter()
+        with get_session() as session:
+            session.execute("SELECT 1")
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'bench.sqlite')}"
+        default_factory = sessionmaker(bind=create_engine(url))
+        pooled_factory = sessionmaker(bind=database.build_engine(Settings(database_url=url)))
+        results = {
+            "engine per request": per_request_ms(lambda: sessionmaker(bind=create_engine(url))()),
+            "default engine": per_request_ms(default_factory),
+            "pooled engine": per_request_ms(pooled_factory),
+        }
+    print(f"{'':<20} {'median (ms)':>12}")
+    for name, median in results.items():
+        print(f"{name:<20} {median:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
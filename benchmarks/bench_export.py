@@ -0,0 +1,88 @@
+"""
+Exporting a run as streamed by the GET /tasks endpoint, against hydrating it first: time to the first chunk, total
+time and peak memory allocated by Python, for runs of growing size on a file-backed SQLite database. Chunks are
+pulled from the endpoint's encoder directly, the test client of Starlette buffering the whole response.
+
+    python -m benchmarks.bench_export [largest run, default 1000000]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.staffoptimizer.adapters import database, orm
+from src.staffoptimizer.config import Settings
+from src.staffoptimizer.entrypoints import router
+from src.staffoptimizer.service_layer import services, unit_of_work
+
+HYDRATED_UP_TO = 100_000
+
+
+def seed(url, size):
+    engine = create_engine(url)
+    orm.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(orm.staffoptimizers.insert(), [{"run_id": "KB9"}])
+        for start in range(0, size, 100_000):
+            connection.execute(
+                orm.tasks.insert(),
+                [
+                    {"run_id": "KB9", "reference": f"Task {t}", "status": 2, "team": "Kosovo"}
+                    for t in range(start, min(size, start + 100_000))
+                ],
+            )
+
+
+def streamed(session_factory):
+    start = time.perf_counter()
+    first_chunk = None
+    tasks = services.export_tasks("KB9", unit_of_work.SQLAlchemyUnitOfWork(session_factory))
+    for _ in router._encode(tasks, router.TaskExport(router.TaskFormat.csv)):
+        first_chunk = first_chunk or time.perf_counter() - start
+    return first_chunk, time.perf_counter() - start
+
+
+def hydrated(session_factory):
+    start = time.perf_counter()
+    with unit_of_work.SQLAlchemyUnitOfWork(session_factory) as uow:
+        so = uow.so.get("KB9", profile="validate")
+        "".join(f"{t.reference},{t.status},{t.team}\n" for t in so.tasks)
+    return None, time.perf_counter() - start
+
+
+def measure(export):
+    tracemalloc.start()
+    first_chunk, total = export()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first_chunk, total, peak
+
+
+def main():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    orm.start_mappers()
+    print(f"{'tasks':>9} {'mode':<9} {'first chunk (ms)':>17} {'total (s)':>10} {'peak (MB)':>10}")
+    size = 10_000
+    while size <= largest:
+        with tempfile.TemporaryDirectory() as directory:
+            url = f"sqlite:///{os.path.join(directory, 'bench.sqlite')}"
+            seed(url, size)
+            engine = database.build_engine(Settings(database_url=url, metrics_enabled=False))
+            session_factory = sessionmaker(bind=engine)
+            # Hydrating a million tasks would take gigabytes
+            modes = {"streamed": streamed, "hydrated": hydrated if size <= HYDRATED_UP_TO else None}
+            for mode, export in modes.items():
+                if export is None:
+                    continue
+                first_chunk, total, peak = measure(lambda: export(session_factory))
+                first_chunk = f"{first_chunk * 1000:.1f}" if first_chunk is not None else "-"
+                print(f"{size:>9} {mode:<9} {first_chunk:>17} {total:>10.2f} {peak / 2 ** 20:>10.1f}")
+        size *= 10
+
+
+if __name__ == "__main__":
+    main()
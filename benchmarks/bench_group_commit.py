@@ -0,0 +1,123 @@
+"""
+Throughput of concurrent writers, add_task and assign requests on 20 runs of a file-backed SQLite database, each
+committing on its own, then sharing commits through the group commit, for growing numbers of threads. Each thread
+sends its requests back to back. A batch holds at most one unit of work per thread. Errors are requests which
+failed, e.g. with TaskAlreadyExists or a database lock held for longer than the busy timeout.
+
+With synchronous=FULL, every commit waits for the disk. With synchronous=NORMAL, the default of the settings, WAL
+commits aren't synced: what remains is writers waiting for the database lock, SQLite's busy handler sleeping between
+attempts.
+https://www.sqlite.org/pragma.html#pragma_synchronous
+
+    python -m benchmarks.bench_group_commit [--threads 1 4 16] [--duration 5]
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from itertools import count
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks import synthetic
+from src.staffoptimizer.adapters import database, orm
+from src.staffoptimizer.adapters.group_commit import GroupCommit
+from src.staffoptimizer.config import Settings
+from src.staffoptimizer.domain.model import Status
+from src.staffoptimizer.service_layer import services, unit_of_work
+
+RUNS = 20
+# None stands for a commit per request
+WINDOWS_MS = (None, 2, 10)
+
+
+def writer(uow_factory, run, run_ids, stop, seed, new_tasks, latencies, errors):
+    rng = random.Random(seed)
+    unstaffed = {run_id: iter(run.unstaffed()[seed::64]) for run_id in run_ids}
+    while not stop.is_set():
+        run_id = rng.choice(run_ids)
+        reference = next(unstaffed[run_id], None)
+        start = time.perf_counter()
+        try:
+            if reference is not None and rng.random() < 0.5:
+                services.assign(rng.choice(run.editors), reference, run_id, uow_factory())
+            else:
+                reference = f"New task {next(new_tasks)}"
+                services.add_task(reference, Status.REVIEW_STAFFING.value, "New", run_id, uow_factory())
+        except Exception as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+def measure(url: str, synchronous: str, window_ms, threads: int, duration: float, run, run_ids) -> dict:
+    engine = database.build_engine(
+        Settings(database_url=url, sqlite_synchronous=synchronous, pool_size=threads, metrics_enabled=False)
+    )
+    session_factory = sessionmaker(bind=engine)
+    group = GroupCommit(engine, window_ms / 1000, max_units=threads) if window_ms else None
+    stop, new_tasks, latencies, errors = threading.Event(), count(), [], []
+    workers = [
+        threading.Thread(
+            target=writer,
+            args=(
+                lambda: unit_of_work.SQLAlchemyUnitOfWork(session_factory, group=group),
+                run, run_ids, stop, seed, new_tasks, latencies, errors,
+            ),
+        )
+        for seed in range(threads)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    time.sleep(duration)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    if group is not None:
+        group.close()
+    engine.dispose()
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": statistics.quantiles(latencies, n=100, method="inclusive")[98] * 1000,
+        "errors": len(errors),
+        "units_per_batch": group.stats()["units_per_batch"] if group is not None else 1.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_group_commit")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--duration", type=float, default=5, help="seconds per measure")
+    parser.add_argument("--synchronous", nargs="+", default=["FULL", "NORMAL"])
+    arguments = parser.parse_args()
+
+    orm.start_mappers()
+    run = synthetic.generate(tasks=200, editors=50)
+    run_ids = [f"RUN{r}" for r in range(RUNS)]
+    print(
+        f"{'sync':<7} {'threads':>7} {'commit':>12} {'ops/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9} {'errors':>7} "
+        f"{'units/commit':>12}"
+    )
+    for synchronous in arguments.synchronous:
+        for threads in arguments.threads:
+            for window_ms in WINDOWS_MS:
+                with tempfile.TemporaryDirectory() as directory:
+                    url = f"sqlite:///{os.path.join(directory, 'bench.sqlite')}"
+                    synthetic.load_into_database(run, url, run_ids=tuple(run_ids))
+                    result = measure(url, synchronous, window_ms, threads, arguments.duration, run, run_ids)
+                commit = "per request" if window_ms is None else f"group {window_ms} ms"
+                print(
+                    f"{synchronous:<7} {threads:>7} {commit:>12} {result['throughput']:>8.1f} {result['p50_ms']:>9.1f} "
+                    f"{result['p99_ms']:>9.1f} {result['errors']:>7} {result['units_per_batch']:>12.1f}",
+                    flush=True,
+                )
+
+
+if __name__ == "__main__":
+    main()
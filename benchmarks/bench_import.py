@@ -0,0 +1,67 @@
+"""
+Importing the lines of a CSV file with services.import_tasks, against calling services.add_task once per line: cost
+per task, and peak memory allocated by Python while importing, on a file-backed SQLite database.
+
+    python -m benchmarks.bench_import [lines imported, default 200000]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.staffoptimizer.adapters import database, orm
+from src.staffoptimizer.config import Settings
+from src.staffoptimizer.service_layer import services, unit_of_work
+
+ADD_TASK_LINES = 2_000
+
+
+def csv_lines(count):
+    yield "ref,status,team"
+    for i in range(count):
+        yield f"Task {i},2,Kosovo"
+
+
+def one_add_task_per_line(uow, count):
+    for ref, status, team in (line.split(",") for line in csv_lines(count) if not line.startswith("ref,")):
+        services.add_task(ref, int(status), team, "KB9", uow)
+
+
+def import_tasks(uow, count):
+    for _ in services.import_tasks("KB9", csv_lines(count), "csv", uow):
+        pass
+
+
+def measure(load, uow, count):
+    tracemalloc.start()
+    start = time.perf_counter()
+    load(uow, count)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed / count * 1e6, peak
+
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    orm.start_mappers()
+    print(f"{'':<22} {'lines':>8} {'per task (µs)':>14} {'peak (MB)':>10}")
+    for name, load, count in (
+        ("add_task per line", one_add_task_per_line, ADD_TASK_LINES),
+        ("import_tasks", import_tasks, lines),
+    ):
+        with tempfile.TemporaryDirectory() as directory:
+            url = f"sqlite:///{os.path.join(directory, 'bench.sqlite')}"
+            orm.metadata.create_all(create_engine(url))
+            engine = database.build_engine(Settings(database_url=url, metrics_enabled=False))
+            uow = unit_of_work.SQLAlchemyUnitOfWork(sessionmaker(bind=engine))
+            per_task, peak = measure(load, uow, count)
+        print(f"{name:<22} {count:>8} {per_task:>14.1f} {peak / 2 ** 20:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Validating a run again after a few of its tasks were assigned an editor: the whole run, against only the tasks changed
+since the last validation, for runs of growing size on a file-backed SQLite database. Summaries are kept up to date
+in both cases, by the handler of RunValidated or by the incremental validation itself.
+
+    python -m benchmarks.bench_incremental
+"""
+import os
+import statistics
+import tempfile
+import time
+from itertools import count
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.staffoptimizer.adapters import database, orm
+from src.staffoptimizer.config import Settings
+from src.staffoptimizer.domain.model import Status
+from src.staffoptimizer.service_layer import messagebus, services, unit_of_work
+
+REPEAT = 5
+
+
+def median_ms(uow, changed, tasks, incremental):
+    timings = []
+    for _ in range(REPEAT):
+        services.assign_many("KB9", [("MB13", f"Task {next(tasks)}") for _ in range(changed)], uow)
+        start = time.perf_counter()
+        services.validate("KB9", uow, incremental=incremental)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    orm.start_mappers()
+    print(f"{'tasks':>7} {'changed':>8} {'whole run (ms)':>15} {'incremental (ms)':>17}")
+    for size in (10_000, 50_000):
+        for changed in (3, 300):
+            with tempfile.TemporaryDirectory() as directory:
+                url = f"sqlite:///{os.path.join(directory, 'bench.sqlite')}"
+                orm.metadata.create_all(create_engine(url))
+                engine = database.build_engine(Settings(database_url=url, metrics_enabled=False))
+                session_factory = sessionmaker(bind=engine)
+                bus = messagebus.MessageBus(lambda: unit_of_work.SQLAlchemyUnitOfWork(session_factory), workers=0)
+                uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory, bus=bus)
+                with session_factory() as session:
+                    session.execute("INSERT INTO users (name, editor_id, role) VALUES ('Medhi', 'MB13', 'editor')")
+                    session.commit()
+                tasks = [(f"Task {i}", Status.REVIEW_STAFFING.value, "Kosovo") for i in range(size)]
+                services.add_tasks("KB9", tasks, uow)
+                services.validate("KB9", uow)
+                assigned = count()
+                print(
+                    f"{size:>7} {changed:>8} {median_ms(uow, changed, assigned, False):>15.1f} "
+                    f"{median_ms(uow, changed, assigned, True):>17.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
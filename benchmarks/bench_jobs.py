@@ -0,0 +1,88 @@
+"""
+Validating a large run in the database within a single request, against a background job validating it in chunks:
+time until the response, total time, and the longest transaction, during which the run is locked for the other
+writers. File-backed SQLite database.
+
+    python -m benchmarks.bench_jobs [largest run, default 1000000]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from src.staffoptimizer.adapters import database, orm
+from src.staffoptimizer.config import Settings
+from src.staffoptimizer.service_layer import services, unit_of_work
+
+CHUNK_SIZE = 10_000
+
+
+def seed(url, size):
+    engine = create_engine(url)
+    orm.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(orm.staffoptimizers.insert(), [{"run_id": "KB9"}])
+        connection.execute(orm.users.insert(), [{"id": 1, "name": "Medhi", "editor_id": "MB13", "role": "editor"}])
+        for start in range(0, size, 100_000):
+            ids = range(start + 1, min(size, start + 100_000) + 1)
+            connection.execute(
+                orm.tasks.insert(),
+                [{"id": t, "run_id": "KB9", "reference": f"Task {t}", "status": 2, "team": "Kosovo"} for t in ids],
+            )
+            connection.execute(orm.assignments.insert(), [{"task_id": t, "user_id": 1} for t in ids if t % 2])
+
+
+def longest_transaction(engine):
+    """
+    Records the time between each BEGIN and the following COMMIT.
+    """
+    transactions = []
+
+    @event.listens_for(engine, "begin")
+    def begin(connection):
+        transactions.append(time.perf_counter())
+
+    @event.listens_for(engine, "commit")
+    def commit(connection):
+        transactions[-1] = time.perf_counter() - transactions[-1]
+
+    return lambda: max(t for t in transactions if t < 1e5)
+
+
+def in_request(session_factory):
+    start = time.perf_counter()
+    services.validate("KB9", unit_of_work.SQLAlchemyUnitOfWork(session_factory), in_database=True)
+    total = time.perf_counter() - start
+    return total, total
+
+
+def in_background(session_factory):
+    start = time.perf_counter()
+    job_id, _ = services.start_validation("KB9", unit_of_work.SQLAlchemyUnitOfWork(session_factory))
+    response = time.perf_counter() - start
+    services.run_validation(job_id, unit_of_work.SQLAlchemyUnitOfWork(session_factory), chunk_size=CHUNK_SIZE)
+    return response, time.perf_counter() - start
+
+
+def main():
+    largest = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    orm.start_mappers()
+    print(f"{'tasks':>9} {'mode':<11} {'response (ms)':>14} {'total (s)':>10} {'longest transaction (ms)':>25}")
+    size = 100_000
+    while size <= largest:
+        for mode, validate in (("request", in_request), ("background", in_background)):
+            with tempfile.TemporaryDirectory() as directory:
+                url = f"sqlite:///{os.path.join(directory, 'bench.sqlite')}"
+                seed(url, size)
+                engine = database.build_engine(Settings(database_url=url, metrics_enabled=False))
+                longest = longest_transaction(engine)
+                response, total = validate(sessionmaker(bind=engine))
+                print(f"{size:>9} {mode:<11} {response * 1000:>14.1f} {total:>10.2f} {longest() * 1000:>25.1f}")
+        size *= 10
+
+
+if __name__ == "__main__":
+    main()
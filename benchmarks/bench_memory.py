@@ -0,0 +1,92 @@
+"""
+Memory held by a run: bytes per task and per assignment, once built as domain objects, as the fake unit of work and
+the cache of aggregates hold them, and once loaded whole into a session from a file-backed SQLite database, as
+services.validate loads it. Measured with tracemalloc, the run being built twice: once without any assignment, once
+with half of its tasks assigned an editor, the difference giving the cost of an assignment.
+
+    python -m benchmarks.bench_memory [--tasks 200000] [--editors 1000]
+"""
+import argparse
+import gc
+import os
+import tempfile
+import tracemalloc
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks import synthetic
+from src.staffoptimizer.adapters import database, orm, repository
+from src.staffoptimizer.config import Settings
+from src.staffoptimizer.domain import model
+from tests.fakes import FakeUnitOfWork
+
+
+def allocated(build) -> int:
+    """
+    Bytes still allocated once build() returned, as long as what it returned is alive.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return after - before
+
+
+def in_memory(run: synthetic.SyntheticRun) -> int:
+    uow = FakeUnitOfWork()
+    # The editors are shared by every run, only the tasks are measured
+    editors = [model.Editor(f"Editor {editor_id}", editor_id, capacity=len(run.tasks)) for editor_id in run.editors]
+
+    def build():
+        tasks = []
+        for reference, status, team, editor in run.tasks:
+            task = model.Task(reference, status, team)
+            if editor is not None:
+                task.assign(editors[editor])
+            tasks.append(task)
+        so = model.StaffOptimizer(synthetic.RUN_ID, tasks)
+        uow.so.add(so)
+        return so
+
+    return allocated(build)
+
+
+def loaded(run: synthetic.SyntheticRun) -> int:
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'bench.sqlite')}"
+        synthetic.load_into_database(run, url)
+        engine = database.build_engine(Settings(database_url=url, metrics_enabled=False))
+        with sessionmaker(bind=engine)() as session:
+            # Loaded once beforehand, so that the editors are already in the session
+            session.query(model.Editor).all()
+            so = allocated(lambda: repository.StaffOptimizerRepository(session).get(synthetic.RUN_ID, "validate"))
+        engine.dispose()
+    return so
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_memory")
+    parser.add_argument("--tasks", type=int, default=200_000)
+    parser.add_argument("--editors", type=int, default=1_000)
+    arguments = parser.parse_args()
+
+    orm.start_mappers()
+    run = synthetic.generate(arguments.tasks, arguments.editors)
+    unassigned = synthetic.SyntheticRun([(*task, None) for *task, _ in run.tasks], run.editors)
+    assignments = sum(editor is not None for *_, editor in run.tasks)
+    print(f"{len(run.tasks)} tasks, {assignments} assignments")
+    print(f"{'':<10} {'total (MiB)':>12} {'bytes/task':>11} {'bytes/assignment':>17}")
+    for name, measure in (("in memory", in_memory), ("loaded", loaded)):
+        tasks_only, total = measure(unassigned), measure(run)
+        print(
+            f"{name:<10} {total / 2**20:>12.1f} {tasks_only / len(run.tasks):>11.0f} "
+            f"{(total - tasks_only) / assignments:>17.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
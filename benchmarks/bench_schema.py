@@ -0,0 +1,122 @@
+"""
+Repository lookups on a file-backed SQLite database holding ROWS tasks and ROWS users, with the legacy schema (no
+secondary index) and with the current one.
+python -m benchmarks.bench_schema [ROWS]
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from src.staffoptimizer.adapters import orm
+from src.staffoptimizer.adapters.repository import StaffOptimizerRepository, UserRepository
+
+TASKS_PER_RUN = 1_000
+SAMPLES = 200
+BATCH = 50_000
+
+LEGACY_SCHEMA = [
+    # Primary key added for the ORM to map the table at all
+    "CREATE TABLE staffoptimizers (run_id VARCHAR(255) PRIMARY KEY)",
+    "CREATE TABLE tasks (id INTEGER PRIMARY KEY, run_id VARCHAR(255), reference VARCHAR(255), status INTEGER,"
+    " team VARCHAR(255))",
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, name VARCHAR(255), editor_id VARCHAR(255), csid VARCHAR(255),"
+    " esid VARCHAR(255), role VARCHAR(50))",
+    "CREATE TABLE assignments (id INTEGER PRIMARY KEY, task_id INTEGER, user_id INTEGER)",
+]
+
+
+def create_schema(engine, legacy):
+    if legacy:
+        with engine.begin() as connection:
+            for statement in LEGACY_SCHEMA:
+                connection.exec_driver_sql(statement)
+    else:
+        orm.metadata.create_all(engine)
+
+
+def populate(engine, rows):
+    runs = rows // TASKS_PER_RUN
+    with engine.begin() as connection:
+        connection.execute(orm.staffoptimizers.insert(), [{"run_id": f"RUN{r}"} for r in range(runs)])
+        for start in range(0, rows, BATCH):
+            ids = range(start, min(start + BATCH, rows))
+            connection.execute(
+                orm.tasks.insert(),
+                [
+                    {
+                        "id": i,
+                        "run_id": f"RUN{i // TASKS_PER_RUN}",
+                        "reference": f"Task {i}",
+                        "status": 2,
+                        "team": "Kosovo",
+                    }
+                    for i in ids
+                ],
+            )
+            connection.execute(
+                orm.users.insert(),
+                [{"id": i, "name": f"Editor {i}", "editor_id": f"E{i}", "role": "editor"} for i in ids],
+            )
+            connection.execute(orm.assignments.insert(), [{"task_id": i, "user_id": i} for i in ids])
+
+
+def median_ms(session_factory, lookup, arguments):
+    timings = []
+    for argument in arguments:
+        session = session_factory()
+        start = time.perf_counter()
+        lookup(session, argument)
+        timings.append(time.perf_counter() - start)
+        session.close()
+    return statistics.median(timings) * 1000
+
+
+def bench(rows, legacy):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.sqlite')}")
+        create_schema(engine, legacy)
+        populate(engine, rows)
+        session_factory = sessionmaker(bind=engine)
+        task_ids = [random.randrange(rows) for _ in range(SAMPLES)]
+        timings = {
+            "get_editor": median_ms(
+                session_factory, lambda s, i: UserRepository(s).get_editor(f"E{i}"), task_ids
+            ),
+            "get (assign profile)": median_ms(
+                session_factory,
+                lambda s, i: StaffOptimizerRepository(s).get(
+                    f"RUN{i // TASKS_PER_RUN}", profile="assign", reference=f"Task {i}"
+                ),
+                task_ids,
+            ),
+            "get (validate profile)": median_ms(
+                session_factory,
+                lambda s, i: StaffOptimizerRepository(s).get(f"RUN{i // TASKS_PER_RUN}", profile="validate"),
+                task_ids[:20],
+            ),
+        }
+        engine.dispose()
+    return timings
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    orm.start_mappers()
+    try:
+        legacy, current = bench(rows, legacy=True), bench(rows, legacy=False)
+    finally:
+        clear_mappers()
+    print(f"{rows} rows, median latency (ms)")
+    print(f"{'lookup':<24} {'legacy':>10} {'indexed':>10}")
+    for lookup in current:
+        print(f"{lookup:<24} {legacy[lookup]:>10.2f} {current[lookup]:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
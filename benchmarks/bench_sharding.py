@@ -0,0 +1,99 @@
+"""
+Write throughput of concurrent writers, add_task and assign requests on 24 runs spread over 1 to 4 file-backed SQLite
+databases, see adapters.sharding. The writers are those of bench_group_commit, each committing on its own.
+
+A SQLite database takes a single writer at a time: writers of runs held by different shards no longer wait for each
+other, each shard committing on its own. What sharding can't spread is the CPU of the process, the ORM work of a
+request, under the GIL: the more writers wait for the disk or the lock, the more sharding helps, hence the measures
+with synchronous=FULL, each commit waiting for the disk, and NORMAL.
+https://www.sqlite.org/lockingv3.html
+
+    python -m benchmarks.bench_sharding [--shards 1 2 4] [--threads 16] [--duration 5]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from itertools import count
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks import synthetic
+from benchmarks.bench_group_commit import writer
+from src.staffoptimizer.adapters import database, orm, sharding
+from src.staffoptimizer.config import Settings
+from src.staffoptimizer.service_layer import unit_of_work
+
+RUNS = 24
+
+
+def measure(urls: list[str], synchronous: str, threads: int, duration: float, run, run_ids) -> dict:
+    engines = [
+        database.build_engine(
+            Settings(database_url=url, sqlite_synchronous=synchronous, pool_size=threads, metrics_enabled=False)
+        )
+        for url in urls
+    ]
+    session_factory = sessionmaker(class_=sharding.ShardedSession, shards=engines)
+    stop, new_tasks, latencies, errors = threading.Event(), count(), [], []
+    workers = [
+        threading.Thread(
+            target=writer,
+            args=(
+                lambda: unit_of_work.SQLAlchemyUnitOfWork(session_factory),
+                run, run_ids, stop, seed, new_tasks, latencies, errors,
+            ),
+        )
+        for seed in range(threads)
+    ]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    time.sleep(duration)
+    stop.set()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    for engine in engines:
+        engine.dispose()
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": statistics.quantiles(latencies, n=100, method="inclusive")[98] * 1000,
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.bench_sharding")
+    parser.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, nargs="+", default=[16])
+    parser.add_argument("--duration", type=float, default=5, help="seconds per measure")
+    parser.add_argument("--synchronous", nargs="+", default=["FULL", "NORMAL"])
+    arguments = parser.parse_args()
+
+    orm.start_mappers()
+    run = synthetic.generate(tasks=200, editors=50)
+    run_ids = [f"RUN{r}" for r in range(RUNS)]
+    print(f"{'sync':<7} {'threads':>7} {'shards':>6} {'ops/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9} {'errors':>7}")
+    for synchronous in arguments.synchronous:
+        for threads in arguments.threads:
+            for shards in arguments.shards:
+                with tempfile.TemporaryDirectory() as directory:
+                    urls = [f"sqlite:///{os.path.join(directory, f'shard{s}.sqlite')}" for s in range(shards)]
+                    for shard, url in enumerate(urls):
+                        # Every shard gets the editors, only its own runs
+                        held = tuple(run_id for run_id in run_ids if sharding.shard_of(run_id, shards) == shard)
+                        synthetic.load_into_database(run, url, run_ids=held)
+                    result = measure(urls, synchronous, threads, arguments.duration, run, run_ids)
+                print(
+                    f"{synchronous:<7} {threads:>7} {shards:>6} {result['throughput']:>8.1f} {result['p50_ms']:>9.1f} "
+                    f"{result['p99_ms']:>9.1f} {result['errors']:>7}",
+                    flush=True,
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Time taken by the solver to staff a run, for growing numbers of tasks and editors.
+"""
+import random
+import time
+
+from src.staffoptimizer.domain.model import StaffOptimizer, Task, Status, Editor
+from src.staffoptimizer.domain.solver import allocate
+
+SIZES = ((1_000, 100), (10_000, 1_000), (100_000, 10_000))
+TEAMS = [f"Team {i}" for i in range(30)]
+
+
+def main():
+    print(f"{'tasks':>8} {'editors':>8} {'allocate (ms)':>14} {'same team':>10}")
+    for task_count, editor_count in SIZES:
+        so = StaffOptimizer(
+            "BENCH",
+            tasks=[Task(f"Task {i}", Status.READY_FOR_STAFFING.value, random.choice(TEAMS)) for i in range(task_count)],
+        )
+        editors = [
+            Editor(f"Editor {i}", f"E{i}", random.choice(TEAMS), capacity=random.randint(5, 15))
+            for i in range(editor_count)
+        ]
+        start = time.perf_counter()
+        allocation = allocate(so.tasks, editors, so.workload())
+        elapsed = time.perf_counter() - start
+        same_team = sum(editor.team == task.team for editor, task in allocation) / len(allocation)
+        print(f"{task_count:>8} {editor_count:>8} {elapsed * 1000:>14.1f} {same_team:>10.1%}")
+
+
+if __name__ == "__main__":
+    main()
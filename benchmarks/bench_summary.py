@@ -0,0 +1,52 @@
+"""
+Answering "how many tasks are staffed or unallocated in run X": reading the run_summaries read model, against
+hydrating the StaffOptimizer aggregate, for runs of growing size. The cost the read model adds to the writes is
+measured on add_task.
+"""
+import statistics
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.staffoptimizer import views
+from src.staffoptimizer.adapters import orm
+from src.staffoptimizer.domain.model import Status
+from src.staffoptimizer.service_layer import services, unit_of_work
+
+REPEAT = 20
+
+
+def median_ms(function):
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def hydrated(uow):
+    with uow:
+        so = uow.so.get("KB9", profile="validate")
+        return len(so.staffed_tasks), len(so.unallocated_tasks)
+
+
+def main():
+    orm.start_mappers()
+    print(f"{'tasks':>7} {'read model (ms)':>16} {'hydrated (ms)':>14} {'add_task (ms)':>14}")
+    for size in (100, 1_000, 10_000, 50_000):
+        engine = create_engine("sqlite://")
+        orm.metadata.create_all(engine)
+        uow = unit_of_work.SQLAlchemyUnitOfWork(sessionmaker(bind=engine))
+        services.add_tasks("KB9", [(f"Task {i}", Status.REVIEW_STAFFING.value, "Kosovo") for i in range(size)], uow)
+        added = iter(range(REPEAT))
+        print(
+            f"{size:>7} {median_ms(lambda: views.run_summary('KB9', uow)):>16.3f} "
+            f"{median_ms(lambda: hydrated(uow)):>14.3f} "
+            f"{median_ms(lambda: services.add_task(f'New {next(added)}', 2, 'Kosovo', 'KB9', uow)):>14.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
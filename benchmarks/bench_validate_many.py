@@ -0,0 +1,75 @@
+"""
+Validating RUNS runs of TASKS tasks each, one after another in the current process, then fanned out across pools of
+1, 2, 4... processes up to the number of CPUs, against a file-backed SQLite database in WAL mode. Each measure starts
+from the same freshly seeded database, and includes spawning the processes.
+
+    python -m benchmarks.bench_validate_many [RUNS] [TASKS]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+
+from src.staffoptimizer import bootstrap
+from src.staffoptimizer.adapters import database, orm
+from src.staffoptimizer.config import Settings
+from src.staffoptimizer.service_layer import messagebus, services, unit_of_work
+
+
+def seed(url, runs, tasks):
+    engine = create_engine(url)
+    orm.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(orm.staffoptimizers.insert(), [{"run_id": f"RUN{r}"} for r in range(runs)])
+        connection.execute(
+            orm.tasks.insert(),
+            [
+                {"run_id": f"RUN{r}", "reference": f"Task {t}", "status": 2, "team": "Kosovo"}
+                for r in range(runs)
+                for t in range(tasks)
+            ],
+        )
+    engine.dispose()
+
+
+def one_after_another(run_ids, settings):
+    orm.start_mappers()
+    database.configure(settings.copy(update={"aggregate_cache_max_tasks": 0}))
+    bus = messagebus.MessageBus(unit_of_work.SQLAlchemyUnitOfWork, workers=0)
+    for run_id in run_ids:
+        services.validate(run_id, unit_of_work.SQLAlchemyUnitOfWork(bus=bus))
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    tasks = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    run_ids = [f"RUN{r}" for r in range(runs)]
+    cpus = os.cpu_count()
+    print(f"{runs} runs of {tasks} tasks, {cpus} CPUs")
+    print(f"{'processes':<12} {'seconds':>8} {'runs/s':>8} {'speedup':>8}")
+
+    counts = [None]
+    while (counts[-1] or 0) < cpus:
+        counts.append(min(cpus, 2 * (counts[-1] or 0) or 1))
+    reference = None
+    for processes in counts:
+        with tempfile.TemporaryDirectory() as directory:
+            url = f"sqlite:///{os.path.join(directory, 'bench.sqlite')}"
+            seed(url, runs, tasks)
+            settings = Settings(database_url=url, sqlite_journal_mode="WAL", metrics_enabled=False)
+            start = time.perf_counter()
+            if processes is None:
+                one_after_another(run_ids, settings)
+            else:
+                errors = bootstrap.validate_many(run_ids, processes=processes, settings=settings)
+                assert not any(errors.values()), errors
+            seconds = time.perf_counter() - start
+        reference = reference or seconds
+        label = "sequential" if processes is None else processes
+        print(f"{label:<12} {seconds:>8.2f} {runs / seconds:>8.1f} {reference / seconds:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
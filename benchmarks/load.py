@@ -0,0 +1,284 @@
+"""
+Load test of the application as deployed: main.app served by uvicorn, against a temporary SQLite database seeded with
+runs and editors (see synthetic.py), driven over HTTP by a mix of add-task, assign and validate requests.
+
+Requests arrive at a given rate, at random intervals (a Poisson process), whether or not the previous ones have been
+answered: an open loop, as independent clients behave. They are sent over a pool of keep-alive connections, a request
+waiting for a free connection when all of them are busy. Latencies are measured from the time a request was due rather
+than from the time it was sent, so that a slow server can't hide its backlog in the load generator (coordinated
+omission).
+
+The rate is stepped up until the application misses one of the SLOs: p99 latency, error rate, or throughput falling
+behind the rate. The last rate it sustained is its saturation point.
+
+    python -m benchmarks.load [--rates 25 50 100] [--duration 10] [--connections 32]
+                              [--mix add_task=4,assign=4,validate=2] [--slo-p99-ms 250] [--slo-errors 0.01]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from itertools import count
+from typing import Optional
+
+from benchmarks import synthetic
+from src.staffoptimizer.domain.model import Status
+
+PORT = 8766
+HISTOGRAM_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# How long answers are waited for once a step has sent its requests, those still pending then counting as errors
+DRAIN_SECONDS = 30
+KEEP_ALIVE_SECONDS = 600
+# Traffic sent at the lowest rate before measuring, for the caches and pools of the server to fill up
+WARM_UP_SECONDS = 3
+# Share of the rate a step must sustain
+SUSTAINED = 0.9
+
+
+class Traffic:
+    """
+    The requests of the mix, each about a random run: a new task to add, a task lacking an editor to assign, or
+    the run to validate. Once every task of a run is staffed, assigning falls back to adding a task.
+    """
+
+    def __init__(self, run: synthetic.SyntheticRun, run_ids: list[str], mix: dict[str, float], seed: int = 0):
+        self.rng = random.Random(seed)
+        self.operations, self.weights = list(mix), list(mix.values())
+        self.run_ids = run_ids
+        self.editors = run.editors
+        self.unstaffed = {run_id: iter(run.unstaffed()) for run_id in run_ids}
+        self.new_tasks = count()
+
+    def next_request(self) -> tuple[str, str, Optional[list]]:
+        operation = self.rng.choices(self.operations, self.weights)[0]
+        run_id = self.rng.choice(self.run_ids)
+        if operation == "assign":
+            reference = next(self.unstaffed[run_id], None)
+            if reference is not None:
+                body = [{"editor_id": self.rng.choice(self.editors), "ref": reference}]
+                return operation, f"/assignments?run_id={run_id}", body
+            operation = "add_task"
+        if operation == "add_task":
+            reference = f"Load task {next(self.new_tasks)}"
+            body = [{"ref": reference, "status": Status.REVIEW_STAFFING.value, "team": "Load"}]
+            return operation, f"/tasks?run_id={run_id}", body
+        return operation, f"/validate?run_id={run_id}", None
+
+
+async def open_connection(port: int):
+    return await asyncio.open_connection("127.0.0.1", port)
+
+
+async def post(connection, target: str, body: Optional[list]) -> int:
+    reader, writer = connection
+    content = b"" if body is None else json.dumps(body).encode()
+    writer.write(
+        f"POST {target} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(content)}\r\n\r\n".encode() + content
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (header := await reader.readline()) != b"\r\n":
+        name, _, value = header.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def send(pool: asyncio.Queue, port: int, request: tuple, due: float, answers: list):
+    operation, target, body = request
+    loop = asyncio.get_running_loop()
+    connection = await pool.get()
+    try:
+        status = await post(connection, target, body)
+    except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+        status = 0
+    try:
+        # uvicorn closes the connection of a request which raised, and the connection can't be trusted anymore anyway
+        if status == 0 or status >= 500:
+            connection[1].close()
+            connection = await open_connection(port)
+    finally:
+        pool.put_nowait(connection)
+    answers.append((operation, status, loop.time() - due))
+
+
+async def step(rate: float, duration: float, traffic: Traffic, connections: int, port: int) -> dict:
+    pool = asyncio.Queue()
+    for _ in range(connections):
+        pool.put_nowait(await open_connection(port))
+    loop = asyncio.get_running_loop()
+    answers, requests = [], []
+    start = due = loop.time()
+    while due < start + duration:
+        await asyncio.sleep(due - loop.time())
+        # Requests falling due while sleeping are sent at once
+        while due <= loop.time() and due < start + duration:
+            request = traffic.next_request()
+            requests.append((request[0], asyncio.create_task(send(pool, port, request, due, answers))))
+            due += traffic.rng.expovariate(rate)
+    await asyncio.wait([task for _, task in requests], timeout=DRAIN_SECONDS)
+    elapsed = loop.time() - start
+    unanswered = [(operation, 0, DRAIN_SECONDS) for operation, task in requests if not task.done()]
+    for _, task in requests:
+        task.cancel()
+    while not pool.empty():
+        pool.get_nowait()[1].close()
+    return summarize(rate, answers, unanswered, elapsed)
+
+
+def summarize(rate: float, answers: list, unanswered: list, elapsed: float) -> dict:
+    every = answers + unanswered
+    latencies = sorted(latency * 1000 for _, _, latency in every)
+    errors = sum(not 200 <= status < 300 for _, status, _ in every)
+    histogram = [0] * (len(HISTOGRAM_MS) + 1)
+    for latency in latencies:
+        histogram[next((i for i, bound in enumerate(HISTOGRAM_MS) if latency <= bound), len(HISTOGRAM_MS))] += 1
+    operations = {}
+    for operation in sorted({operation for operation, _, _ in every}):
+        of_operation = sorted(latency * 1000 for name, _, latency in every if name == operation)
+        operations[operation] = {
+            "requests": len(of_operation),
+            "errors": sum(not 200 <= status < 300 for name, status, _ in every if name == operation),
+            # 0 stands for a request left unanswered, or whose connection failed
+            "statuses": dict(Counter(str(status) for name, status, _ in every if name == operation)),
+            "p50_ms": statistics.median(of_operation),
+            "p99_ms": _percentile(of_operation, 0.99),
+        }
+    return {
+        "rate": rate,
+        "requests": len(every),
+        "throughput": len(answers) / elapsed,
+        "error_rate": errors / len(every) if every else 0.0,
+        "p50_ms": statistics.median(latencies) if latencies else 0.0,
+        "p95_ms": _percentile(latencies, 0.95),
+        "p99_ms": _percentile(latencies, 0.99),
+        "histogram": dict(zip([str(bound) for bound in HISTOGRAM_MS] + ["+Inf"], histogram)),
+        "operations": operations,
+    }
+
+
+def _percentile(ordered: list[float], quantile: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * quantile))] if ordered else 0.0
+
+
+def meets_slos(result: dict, slo_p99_ms: float, slo_errors: float) -> bool:
+    return (
+        result["p99_ms"] <= slo_p99_ms
+        and result["error_rate"] <= slo_errors
+        and result["throughput"] >= SUSTAINED * result["rate"]
+    )
+
+
+def start_server(database: str, port: int, log) -> subprocess.Popen:
+    # Connections of the pool may stay idle longer than the 5 seconds uvicorn keeps them alive by default
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "src.staffoptimizer.main:app", "--port", str(port),
+            "--log-level", "warning", "--timeout-keep-alive", str(KEEP_ALIVE_SECONDS),
+        ],
+        env={**os.environ, "STAFFOPTIMIZER_DATABASE_URL": f"sqlite:///{database}"},
+        stdout=log,
+        stderr=subprocess.STDOUT,
+    )
+    for _ in range(100):
+        try:
+            asyncio.run(open_connection(port))
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("uvicorn didn't start")
+
+
+def print_histogram(result: dict):
+    width = max(result["histogram"].values()) or 1
+    for bound, requests in result["histogram"].items():
+        print(f"  <= {bound:>6} ms {requests:>7} {'#' * round(40 * requests / width)}")
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    weights = dict(item.split("=") for item in mix.split(","))
+    unknown = set(weights) - {"add_task", "assign", "validate"}
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown operations {', '.join(sorted(unknown))}")
+    return {operation: float(weight) for operation, weight in weights.items()}
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=200, help="tasks per run")
+    parser.add_argument("--editors", type=int, default=50)
+    parser.add_argument("--rates", type=float, nargs="+", default=[25, 50, 100, 200, 400], help="requests per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per rate")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--mix", type=parse_mix, default="add_task=4,assign=4,validate=2")
+    parser.add_argument("--slo-p99-ms", type=float, default=250)
+    parser.add_argument("--slo-errors", type=float, default=0.01, help="0.01 tolerates 1%% of errors")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--output", help="saves the results of every step as JSON")
+    parser.add_argument("--server-log", help="where the output of uvicorn goes, e.g. the tracebacks of errors")
+    arguments = parser.parse_args(argv)
+
+    run = synthetic.generate(arguments.tasks, arguments.editors)
+    run_ids = [f"RUN{r}" for r in range(arguments.runs)]
+    traffic = Traffic(run, run_ids, arguments.mix)
+    steps, saturated = [], None
+    with tempfile.TemporaryDirectory() as directory, open(arguments.server_log or os.devnull, "w") as log:
+        database = os.path.join(directory, "load.sqlite")
+        synthetic.load_into_database(run, f"sqlite:///{database}", run_ids=tuple(run_ids))
+        server = start_server(database, arguments.port, log)
+        try:
+            asyncio.run(step(min(arguments.rates), WARM_UP_SECONDS, traffic, arguments.connections, arguments.port))
+            print(f"{'rate':>7} {'req/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'errors':>7}  SLOs")
+            for rate in sorted(arguments.rates):
+                result = asyncio.run(step(rate, arguments.duration, traffic, arguments.connections, arguments.port))
+                result["meets_slos"] = meets_slos(result, arguments.slo_p99_ms, arguments.slo_errors)
+                steps.append(result)
+                print(
+                    f"{rate:>7g} {result['throughput']:>8.1f} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+                    f"{result['p99_ms']:>9.1f} {result['error_rate']:>7.1%}  "
+                    f"{'met' if result['meets_slos'] else 'MISSED'}"
+                )
+                if not result["meets_slos"]:
+                    saturated = result
+                    break
+        finally:
+            server.terminate()
+            server.wait()
+
+    sustained = [result for result in steps if result["meets_slos"]]
+    for result in (sustained[-1] if sustained else None, saturated):
+        if result is not None:
+            print(f"\nLatencies at {result['rate']:g} req/s")
+            print_histogram(result)
+            for operation, measures in result["operations"].items():
+                statuses = ", ".join(f"{status}: {n}" for status, n in sorted(measures["statuses"].items()))
+                print(
+                    f"  {operation:<9} {measures['requests']:>6} requests, {measures['errors']:>5} errors, "
+                    f"p50 {measures['p50_ms']:.1f} ms, p99 {measures['p99_ms']:.1f} ms ({statuses})"
+                )
+    if saturated is None:
+        print(f"\nSLOs met up to {steps[-1]['rate']:g} req/s, the highest rate tried")
+    elif sustained:
+        print(f"\nSaturation point: {sustained[-1]['rate']:g} req/s, SLOs missed at {saturated['rate']:g} req/s")
+    else:
+        print(f"\nSLOs missed at {saturated['rate']:g} req/s already, the lowest rate tried")
+    if arguments.output:
+        with open(arguments.output, "w") as output:
+            json.dump({"arguments": {**vars(arguments), "mix": arguments.mix}, "steps": steps}, output, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
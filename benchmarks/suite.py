@@ -0,0 +1,218 @@
+"""
+Benchmark suite of the service layer: add_task, assign and validate, run against the fake unit of work and against
+SQLAlchemyUnitOfWork on a file-backed SQLite database, for synthetic runs of 100 to 100k tasks staffed by 10 to 10k
+editors, see synthetic.py. Each measure reports the throughput, the p50 and p99 latencies, the peak of the memory
+allocated by a single call (tracemalloc) and the SQL statements sent per call.
+
+    python -m benchmarks.suite run [--tasks 100 1000] [--editors 10] [--uow fake] [--output results.json]
+    python -m benchmarks.suite compare baseline.json results.json [--threshold 0.2]
+
+Results are saved as JSON, along with the commit they were measured on. compare flags the measures which got worse by
+more than the threshold between two result files: latencies, memory or statements going up, throughput going down.
+It exits with 1 when any did, e.g. to fail a CI job.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from itertools import count, product
+
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks import synthetic
+from src.staffoptimizer.adapters import database, metrics, orm
+from src.staffoptimizer.config import Settings
+from src.staffoptimizer.domain.model import Status
+from src.staffoptimizer.service_layer import services, unit_of_work
+from tests.fakes import FakeUnitOfWork
+
+TASKS = (100, 1_000, 10_000, 100_000)
+EDITORS = (10, 10_000)
+UOWS = ("fake", "sqlalchemy")
+OPERATIONS = ("add_task", "assign", "validate")
+# Samples per measure, unless the budget runs out first
+SAMPLES = 200
+MIN_SAMPLES = 3
+BUDGET_SECONDS = 10.0
+# Measures compared, and whether more is better
+COMPARED = {"throughput": True, "p50_ms": False, "p99_ms": False, "peak_memory_kib": False, "statements": False}
+
+
+def calls(operation: str, run: synthetic.SyntheticRun, uow):
+    """
+    An endless supply of calls to the service, each one changing something else: a new task to add, another task
+    to assign. Validating again costs the same as validating first, every task of the run being gone through.
+    """
+    if operation == "add_task":
+        for i in count():
+            yield lambda i=i: services.add_task(
+                f"New task {i}", Status.REVIEW_STAFFING.value, "Team 0", synthetic.RUN_ID, uow
+            )
+    elif operation == "assign":
+        editors = run.editors
+        for i, reference in enumerate(run.unstaffed()):
+            yield lambda i=i, reference=reference: services.assign(
+                editors[i % len(editors)], reference, synthetic.RUN_ID, uow
+            )
+    else:
+        while True:
+            yield lambda: services.validate(synthetic.RUN_ID, uow)
+
+
+def measure(operation: str, run: synthetic.SyntheticRun, uow, samples: int, budget: float) -> dict:
+    latencies, statements = [], []
+    supply = calls(operation, run, uow)
+    # Measured apart, tracing allocations slowing every call down. The first call warms the caches up as well.
+    tracemalloc.start()
+    next(supply)()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    recorders = metrics.collect()
+    deadline = time.perf_counter() + budget
+    for call in supply:
+        recorded = len(recorders)
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+        statements.append(sum(recorder.statements for recorder in recorders[recorded:]))
+        if len(latencies) >= samples or (len(latencies) >= MIN_SAMPLES and time.perf_counter() > deadline):
+            break
+    return {
+        "samples": len(latencies),
+        "throughput": len(latencies) / sum(latencies),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": statistics.quantiles(latencies, n=100, method="inclusive")[98] * 1000,
+        "peak_memory_kib": peak / 1024,
+        # The fake unit of work doesn't record anything
+        "statements": statistics.median(statements) if recorders else None,
+    }
+
+
+def run_suite(arguments) -> dict:
+    orm.start_mappers()
+    results = []
+    for tasks, editors, uow_kind in product(arguments.tasks, arguments.editors, arguments.uow):
+        run = synthetic.generate(tasks, editors)
+        with tempfile.TemporaryDirectory() as directory:
+            if uow_kind == "fake":
+                uow = FakeUnitOfWork()
+                synthetic.load_into_fake(run, uow)
+            else:
+                url = f"sqlite:///{os.path.join(directory, 'bench.sqlite')}"
+                synthetic.load_into_database(run, url)
+                engine = database.build_engine(Settings(database_url=url, metrics_enabled=True))
+                metrics.enable()
+                uow = unit_of_work.SQLAlchemyUnitOfWork(sessionmaker(bind=engine))
+            for operation in arguments.operations:
+                result = {"uow": uow_kind, "operation": operation, "tasks": tasks, "editors": editors}
+                result.update(measure(operation, run, uow, arguments.samples, arguments.budget))
+                results.append(result)
+                print(_row(result), flush=True)
+            if uow_kind == "sqlalchemy":
+                engine.dispose()
+    metrics.disable()
+    return {
+        "commit": _commit(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "machine": f"{platform.machine()}, {os.cpu_count()} CPUs",
+        "results": results,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+HEADER = (
+    f"{'uow':<11} {'operation':<9} {'tasks':>7} {'editors':>7} {'samples':>7} {'ops/s':>9} {'p50 (ms)':>9} "
+    f"{'p99 (ms)':>9} {'peak (KiB)':>10} {'statements':>10}"
+)
+
+
+def _row(result: dict) -> str:
+    statements = "-" if result["statements"] is None else f"{result['statements']:g}"
+    return (
+        f"{result['uow']:<11} {result['operation']:<9} {result['tasks']:>7} {result['editors']:>7} "
+        f"{result['samples']:>7} {result['throughput']:>9.1f} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+        f"{result['peak_memory_kib']:>10.0f} {statements:>10}"
+    )
+
+
+def _key(result: dict) -> tuple:
+    return result["uow"], result["operation"], result["tasks"], result["editors"]
+
+
+def regressions(baseline: dict, current: dict, threshold: float) -> list[tuple]:
+    """
+    (uow, operation, tasks, editors, measure, baseline value, current value) of each measure which got worse by more
+    than threshold, a ratio of the baseline value. Measures taken by a single of the two runs aren't compared.
+    """
+    before = {_key(result): result for result in baseline["results"]}
+    found = []
+    for result in current["results"]:
+        previous = before.get(_key(result))
+        if previous is None:
+            continue
+        for name, higher_is_better in COMPARED.items():
+            old, new = previous[name], result[name]
+            if old is None or new is None:
+                continue
+            worse = old - new if higher_is_better else new - old
+            if worse > threshold * old:
+                found.append(_key(result) + (name, old, new))
+    return found
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="measure the services, and save the results")
+    run.add_argument("--tasks", type=int, nargs="+", default=TASKS)
+    run.add_argument("--editors", type=int, nargs="+", default=EDITORS)
+    run.add_argument("--uow", nargs="+", choices=UOWS, default=UOWS)
+    run.add_argument("--operations", nargs="+", choices=OPERATIONS, default=OPERATIONS)
+    run.add_argument("--samples", type=int, default=SAMPLES)
+    run.add_argument("--budget", type=float, default=BUDGET_SECONDS, help="seconds per measure, at the least")
+    run.add_argument("--output", default="benchmark-results.json")
+    compare = commands.add_parser("compare", help="flag the regressions between two results")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=0.2, help="0.2 flags measures worse by more than 20%%")
+    arguments = parser.parse_args(argv)
+
+    if arguments.command == "run":
+        print(HEADER)
+        results = run_suite(arguments)
+        with open(arguments.output, "w") as output:
+            json.dump(results, output, indent=2)
+        print(f"Saved to {arguments.output}")
+        return 0
+
+    with open(arguments.baseline) as baseline, open(arguments.current) as current:
+        baseline, current = json.load(baseline), json.load(current)
+    found = regressions(baseline, current, arguments.threshold)
+    print(f"{baseline['commit']} -> {current['commit']}, threshold {arguments.threshold:.0%}")
+    for uow, operation, tasks, editors, name, old, new in found:
+        print(f"REGRESSION {uow} {operation} tasks={tasks} editors={editors}: {name} {old:.2f} -> {new:.2f}")
+    if not found:
+        print("No regression")
+    return int(bool(found))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Synthetic runs for the benchmarks: a run of any size, staffed by any number of editors, generated from a seed so that
+two commits are measured against the same data. The same run is loaded either into the fake unit of work, as domain
+objects, or into a database, through core INSERT statements.
+"""
+import random
+from dataclasses import dataclass
+from itertools import count
+
+from sqlalchemy import create_engine
+
+from src.staffoptimizer.adapters import orm
+from src.staffoptimizer.domain import model
+from src.staffoptimizer.domain.model import Status
+
+RUN_ID = "BENCH"
+TEAMS = 20
+# Share of the tasks in each status, and of the tasks under review already assigned an editor
+STATUSES = {Status.REVIEW_STAFFING.value: 0.7, Status.READY_FOR_STAFFING.value: 0.2, Status.READY_TO_EDIT.value: 0.1}
+STAFFED = 0.5
+
+
+@dataclass
+class SyntheticRun:
+    # (reference, status, team, index of the editor assigned or None) of each task
+    tasks: list[tuple[str, int, str, int]]
+    # editor_id of each editor
+    editors: list[str]
+
+    def unstaffed(self) -> list[str]:
+        """
+        References of the tasks which can be assigned an editor, in a random but reproducible order.
+        """
+        references = [reference for reference, _, _, editor in self.tasks if editor is None]
+        random.Random(len(references)).shuffle(references)
+        return references
+
+
+def generate(tasks: int, editors: int, seed: int = 0) -> SyntheticRun:
+    rng = random.Random(seed)
+    statuses = rng.choices(list(STATUSES), weights=list(STATUSES.values()), k=tasks)
+    return SyntheticRun(
+        tasks=[
+            (
+                f"Task {i}",
+                status,
+                f"Team {i % TEAMS}",
+                rng.randrange(editors) if status != Status.READY_FOR_STAFFING.value and rng.random() < STAFFED
+                else None,
+            )
+            for i, status in enumerate(statuses)
+        ],
+        editors=[f"ED{e}" for e in range(editors)],
+    )
+
+
+def load_into_fake(run: SyntheticRun, uow):
+    editors = [model.Editor(f"Editor {editor_id}", editor_id, capacity=len(run.tasks)) for editor_id in run.editors]
+    tasks = []
+    for reference, status, team, editor in run.tasks:
+        task = model.Task(reference, status, team)
+        if editor is not None:
+            task.assign(editors[editor])
+        tasks.append(task)
+    for editor in editors:
+        uow.user.add(editor)
+    uow.so.add(model.StaffOptimizer(RUN_ID, tasks))
+
+
+def load_into_database(run: SyntheticRun, url: str, run_ids: tuple = (RUN_ID,), batch_size: int = 50_000):
+    """
+    With several run_ids, each run gets a copy of the tasks, the editors being shared.
+    """
+    engine = create_engine(url)
+    orm.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(orm.staffoptimizers.insert(), [{"run_id": run_id} for run_id in run_ids])
+        connection.execute(
+            orm.users.insert(),
+            [
+                {
+                    "id": e + 1,
+                    "name": f"Editor {editor_id}",
+                    "editor_id": editor_id,
+                    "role": "editor",
+                    "capacity": len(run.tasks),
+                }
+                for e, editor_id in enumerate(run.editors)
+            ],
+        )
+        task_ids = count(1)
+        for run_id in run_ids:
+            for start in range(0, len(run.tasks), batch_size):
+                batch = [(next(task_ids), task) for task in run.tasks[start:start + batch_size]]
+                connection.execute(
+                    orm.tasks.insert(),
+                    [
+                        {"id": task_id, "run_id": run_id, "reference": reference, "status": status, "team": team}
+                        for task_id, (reference, status, team, _) in batch
+                    ],
+                )
+                assignments = [
+                    {"task_id": task_id, "user_id": editor + 1}
+                    for task_id, (*_, editor) in batch
+                    if editor is not None
+                ]
+                if assignments:
+                    connection.execute(orm.assignments.insert(), assignments)
+    engine.dispose()
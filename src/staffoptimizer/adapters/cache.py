@@ -0,0 +1,111 @@
+"""
+Aggregates kept in memory between units of work, so that a run validated or optimized again and again isn't rebuilt
+from its rows each time. The cache is shared by the whole process, the aggregates it holds are detached from any
+session.
+
+An aggregate is checked out by the unit of work using it, and checked back in once committed: a detached object
+can't belong to two sessions at once, and an aggregate changed by a unit of work which then failed is simply lost.
+
+Cached aggregates may be outdated by another process, or by a unit of work which didn't go through the cache. The
+revision of the staffoptimizers row, incremented by every unit of work changing the run, tells: an aggregate is only
+handed out when its revision is still the one of the database, and otherwise reloaded. Users aren't part of the run
+and have no revision: the repository reloads those of an aggregate it checks out.
+https://www.cosmicpython.com/book/chapter_07_aggregate.html#_optimistic_concurrency_with_version_numbers
+
+The cache is bounded by the number of tasks it holds, the bulk of the memory of an aggregate: least recently used
+aggregates are evicted first.
+"""
+
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from src.staffoptimizer.domain import model
+
+
+class AggregateCache:
+    def __init__(self, max_tasks: int):
+        self.max_tasks = max_tasks
+        self._lock = threading.Lock()
+        # run_id -> (aggregate, size, revision), least recently used first
+        self._entries = OrderedDict()
+        self._tasks = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def checkout(self, run_id: str, current_revision: Callable[[], Optional[int]]) -> Optional[model.StaffOptimizer]:
+        """
+        Takes the aggregate of the run out of the cache, provided current_revision(), read from the database, is still
+        the revision it was checked in with. None when it has to be loaded.
+        """
+        with self._lock:
+            so, size, revision = self._entries.pop(run_id, (None, 0, None))
+            self._tasks -= size
+            if so is None:
+                self.misses += 1
+                return None
+        # The lock isn't held while the database answers
+        if current_revision() != revision:
+            with self._lock:
+                self.stale += 1
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return so
+
+    def checkin(self, so: model.StaffOptimizer, revision: int):
+        size = len(so.tasks)
+        if size > self.max_tasks:
+            return
+        with self._lock:
+            _, replaced, _ = self._entries.pop(so.run_id, (None, 0, None))
+            self._entries[so.run_id] = so, size, revision
+            self._tasks += size - replaced
+            while self._tasks > self.max_tasks:
+                _, (_, evicted, _) = self._entries.popitem(last=False)
+                self._tasks -= evicted
+                self.evictions += 1
+
+    def discard(self, run_id: str):
+        with self._lock:
+            _, size, _ = self._entries.pop(run_id, (None, 0, None))
+            self._tasks -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "aggregates": len(self._entries),
+                "tasks": self._tasks,
+            }
+
+    def expose(self) -> list[str]:
+        """
+        Statistics in the Prometheus text format, see adapters.metrics.
+        """
+        stats = self.stats()
+        lines = []
+        for name, documentation in (
+            ("hits", "Aggregates handed out by the cache"),
+            ("misses", "Aggregates loaded from the database instead, stale ones included"),
+            ("stale", "Cached aggregates outdated by another unit of work"),
+            ("evictions", "Aggregates evicted to stay within the size of the cache"),
+        ):
+            metric = f"staffoptimizer_aggregate_cache_{name}_total"
+            lines += [f"# HELP {metric} {documentation}", f"# TYPE {metric} counter", f"{metric} {stats[name]}"]
+        for name, documentation in (
+            ("aggregates", "Aggregates currently cached"),
+            ("tasks", "Tasks held by the cached aggregates"),
+        ):
+            metric = f"staffoptimizer_aggregate_cache_{name}"
+            lines += [f"# HELP {metric} {documentation}", f"# TYPE {metric} gauge", f"{metric} {stats[name]}"]
+        return lines
@@ -0,0 +1,182 @@
+"""
+Engines are expensive: each holds a pool of connections to the database. They are built once per process by the
+factories below, from the settings, and shared by every unit of work.
+https://docs.sqlalchemy.org/en/14/core/connections.html#basic-usage
+
+configure() is called when the application starts, followed by upgrade_schema(). Otherwise, the session factories
+are built on first use. dispose() closes the pooled connections when it stops: aiosqlite runs each connection in its
+own thread, which would otherwise keep the process alive.
+
+The group commit, when enabled, takes a connection of the synchronous engine for each of its batches, see
+group_commit.py.
+
+With shards, an engine is built for each of them, with a pool of its own, and sessions are routed from one shard to
+another, see sharding.py.
+"""
+
+
+from typing import Optional
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
+
+from src.staffoptimizer.adapters import cache, metrics, migrations, orm, sharding
+from src.staffoptimizer.adapters.group_commit import GroupCommit
+from src.staffoptimizer.config import Settings, get_settings
+
+_session_factory = None  # type: Optional[sessionmaker]
+_async_session_factory = None  # type: Optional[sessionmaker]
+_aggregate_cache = None  # type: Optional[cache.AggregateCache]
+_group_commit = None  # type: Optional[GroupCommit]
+# Every engine built by configure(), disposed of by dispose()
+_engines = []  # type: list
+
+
+def build_engine(settings: Settings) -> Engine:
+    url = make_url(settings.database_url)
+    engine = create_engine(url, **_pool_arguments(url, settings, QueuePool))
+    _set_sqlite_pragmas(engine, settings)
+    if settings.metrics_enabled:
+        metrics.instrument(engine)
+    return engine
+
+
+def build_async_engine(settings: Settings) -> AsyncEngine:
+    url = make_url(settings.async_database_url or _async_url(settings.database_url))
+    engine = create_async_engine(url, **_pool_arguments(url, settings, AsyncAdaptedQueuePool))
+    _set_sqlite_pragmas(engine.sync_engine, settings)
+    if settings.metrics_enabled:
+        metrics.instrument(engine.sync_engine)
+    return engine
+
+
+def _async_url(database_url: str) -> str:
+    url = make_url(database_url)
+    drivers = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+    return str(url.set(drivername=f"{url.get_backend_name()}+{drivers[url.get_backend_name()]}"))
+
+
+def _pool_arguments(url, settings: Settings, poolclass) -> dict:
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # A single connection, shared across threads: every new connection would open another empty database
+        return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+    arguments = {
+        "poolclass": poolclass,
+        "pool_size": settings.pool_size,
+        "max_overflow": settings.max_overflow,
+        "pool_timeout": settings.pool_timeout,
+        "pool_pre_ping": settings.pool_pre_ping,
+        "pool_recycle": settings.pool_recycle,
+    }
+    if url.get_backend_name() == "sqlite":
+        # Pooled connections are handed over to whichever thread serves the request
+        arguments["connect_args"] = {"check_same_thread": False}
+    return arguments
+
+
+def _set_sqlite_pragmas(engine: Engine, settings: Settings):
+    """
+    Pragmas are per connection, they are run each time the pool opens a new one. With WAL, readers don't block the
+    writer anymore, and synchronous=NORMAL only syncs to disk at checkpoints instead of at every commit.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if engine.url.database not in (None, "", ":memory:"):
+            cursor.execute(f"PRAGMA journal_mode = {settings.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous = {settings.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout = {settings.sqlite_busy_timeout_ms}")
+        cursor.close()
+
+
+def configure(settings: Settings):
+    global _session_factory, _async_session_factory, _aggregate_cache, _group_commit, _engines
+    if settings.shard_urls and settings.group_commit_window_ms:
+        raise ValueError("The group commit isn't available with shards")
+    # Objects aren't expired on commit by the AsyncSession: refreshing them would mean an implicit I/O, which asyncio
+    # doesn't allow
+    if settings.shard_urls:
+        shards = [
+            settings.copy(update={"database_url": url, "async_database_url": None}) for url in settings.shard_urls
+        ]
+        engines = [build_engine(shard) for shard in shards]
+        async_engines = [build_async_engine(shard) for shard in shards]
+        _session_factory = sessionmaker(class_=sharding.ShardedSession, shards=engines)
+        _async_session_factory = sessionmaker(
+            class_=AsyncSession,
+            sync_session_class=sharding.ShardedSession,
+            shards=[engine.sync_engine for engine in async_engines],
+            expire_on_commit=False,
+        )
+    else:
+        engines, async_engines = [build_engine(settings)], [build_async_engine(settings)]
+        _session_factory = sessionmaker(bind=engines[0])
+        _async_session_factory = sessionmaker(bind=async_engines[0], class_=AsyncSession, expire_on_commit=False)
+    _engines = engines + async_engines
+    # Shared by the synchronous and asynchronous engines, which point to the same databases
+    _aggregate_cache = None
+    if settings.aggregate_cache_max_tasks:
+        _aggregate_cache = cache.AggregateCache(settings.aggregate_cache_max_tasks)
+    _group_commit = None
+    if settings.group_commit_window_ms:
+        _group_commit = GroupCommit(engines[0], settings.group_commit_window_ms / 1000, settings.group_commit_max_units)
+
+
+def session_factory() -> sessionmaker:
+    if _session_factory is None:
+        configure(get_settings())
+    return _session_factory
+
+
+def async_session_factory() -> sessionmaker:
+    if _async_session_factory is None:
+        configure(get_settings())
+    return _async_session_factory
+
+
+def aggregate_cache() -> Optional[cache.AggregateCache]:
+    if _session_factory is None:
+        configure(get_settings())
+    return _aggregate_cache
+
+
+def group_commit() -> Optional[GroupCommit]:
+    if _session_factory is None:
+        configure(get_settings())
+    return _group_commit
+
+
+def shards() -> list[Engine]:
+    """
+    The engine of each shard, the directory of users first, or the single engine of database_url.
+    """
+    factory = session_factory()
+    return factory.kw.get("shards") or [factory.kw["bind"]]
+
+
+def upgrade_schema():
+    """
+    Creates the tables of a new database, or brings those of an existing one up to date, on every shard. Migrations
+    are written for SQLite, see migrations.py: other databases only get their missing tables.
+    """
+    for engine in shards():
+        if engine.dialect.name == "sqlite":
+            migrations.upgrade(engine)
+        else:
+            orm.metadata.create_all(engine)
+
+
+async def dispose():
+    if _group_commit is not None:
+        _group_commit.close()
+    for engine in _engines:
+        if isinstance(engine, AsyncEngine):
+            await engine.dispose()
+        else:
+            engine.dispose()
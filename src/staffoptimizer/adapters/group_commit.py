@@ -0,0 +1,194 @@
+"""
+Group commit: units of work changing the same run side by side share a single transaction, committed once for all of
+them, rather than paying a commit each. On SQLite, every commit is a write to the disk, and writers wait for each
+other's commit anyway, the database being locked by a single writer at a time.
+https://www.sqlite.org/lockingv3.html
+
+Only units of work loading a run to change it join, once they know which run, see StaffOptimizerRepository.get: the
+others, e.g. reading a summary or exporting a run, use a connection of their own and never wait for a batch. Each run
+has a group of its own, writers of different runs don't wait for each other's batch. Except on SQLite: a batch holds
+the write lock of the whole database until committed, the batch of another run would wait for it anyway, its window
+included. All the runs share a single group there.
+
+The first unit of work to arrive opens a batch, a transaction on a connection of its own. Units of work of the run
+then take turns on that connection, each within a SAVEPOINT of its own: what one commits is released into the batch,
+what one rolls back, e.g. a task referenced twice, leaves the batch as it was. Once the window elapsed, or the batch
+is full, the batch is committed, and each unit of work which committed is told whether its changes are durable.
+https://www.sqlite.org/lang_savepoint.html
+
+Units of work of a batch run one after the other, and see the changes of those before them, as they would have once
+committed: the batch being committed or lost as a whole, the outcome is the same as running them one by one. Each
+caller keeps its own result, only a failing COMMIT failing every unit of work of the batch. On SQLite, that is every
+unit of work which committed within the window, whatever its run: the price of a single commit for all of them.
+
+A unit of work joins before its first statement, or never: one which begun on a connection of its own commits on its
+own, e.g. a chunk of a validation job, which has to look the job up to know its run.
+
+Asynchronous units of work don't join: waiting for the turn, the window and the COMMIT of the batch blocks the thread,
+which would be the thread of the event loop, and the batch runs on a connection of the synchronous engine. They commit
+on their own, e.g. imports.
+"""
+
+
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+
+class Batch:
+    def __init__(self, key: Optional[str], connection: Connection):
+        # The run_id of the group, None when every run shares it, see GroupCommit
+        self.key = key
+        self.connection = connection
+        self.transaction = connection.begin()
+        self.units = 0
+        self.opened = time.monotonic()
+        self.done = threading.Event()
+        # Set when the COMMIT of the batch failed
+        self.error = None  # type: Optional[Exception]
+
+    def begin_savepoint(self, session, transaction):
+        # Begun before the session gets to the connection, which then hands the savepoint over as the transaction
+        # of the session: once the session joined the transaction of the batch, rolling back would roll it back
+        if transaction.parent is None and not self.connection.in_nested_transaction():
+            self.connection.begin_nested()
+
+
+class _Group:
+    def __init__(self):
+        # Held by the unit of work using the connection of the batch
+        self.lock = threading.Lock()
+        self.batch = None  # type: Optional[Batch]
+        # Units of work joining or within the group: it is dropped once none is left
+        self.units = 0
+
+
+class GroupCommit:
+    def __init__(self, engine: Engine, window: float, max_units: int):
+        """
+        window, in seconds, is how long the unit of work opening a batch waits for others to join it before
+        committing. The batch is committed right away once max_units joined it.
+        """
+        self.engine = engine
+        self.window = window
+        self.max_units = max_units
+        # run_id, or None for every run of a SQLite database -> _Group, only looked up under the lock
+        self._groups = {}  # type: dict[Optional[str], _Group]
+        self._per_run = engine.dialect.name != "sqlite"
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.units = 0
+
+    def join(self, session: Session, run_id: str) -> Batch:
+        """
+        Waits for the turn of the unit of work within the group of the run, then binds its session, which mustn't
+        have begun yet, to the batch it joined. Each transaction of the session is a savepoint: it never commits or
+        rolls back the batch itself.
+        """
+        key = run_id if self._per_run else None
+        with self._lock:
+            group = self._groups.setdefault(key, _Group())
+            group.units += 1
+        group.lock.acquire()
+        try:
+            if group.batch is None:
+                group.batch = self._open(key)
+            batch = group.batch
+            session.bind = batch.connection
+            event.listen(session, "after_transaction_create", batch.begin_savepoint)
+        except BaseException:
+            group.lock.release()
+            self._drop(key, group)
+            raise
+        batch.units += 1
+        self.units += 1
+        return batch
+
+    def leave(self, batch: Batch, committed: bool) -> Optional[Exception]:
+        """
+        Called once the session of the unit of work is closed: hands the connection over to the next unit of work.
+        A unit of work which committed then waits for the batch to be, and gets the error of its COMMIT, if any.
+
+        The unit of work which opened the batch commits it once the window elapsed, whether it committed or not.
+        """
+        group = self._groups[batch.key]
+        # Nobody joined the batch while its opener held the connection
+        opener = batch.units == 1
+        full = batch.units >= self.max_units
+        try:
+            # Left by a session which wasn't closed
+            while (nested := batch.connection.get_nested_transaction()) is not None:
+                nested.rollback()
+            if full:
+                self._commit(group, batch)
+        finally:
+            group.lock.release()
+        try:
+            if opener and not full:
+                time.sleep(max(0.0, batch.opened + self.window - time.monotonic()))
+                with group.lock:
+                    if group.batch is batch:
+                        self._commit(group, batch)
+        finally:
+            self._drop(batch.key, group)
+        if not committed:
+            return None
+        batch.done.wait()
+        return batch.error
+
+    def close(self):
+        with self._lock:
+            groups = list(self._groups.values())
+        for group in groups:
+            with group.lock:
+                if group.batch is not None:
+                    self._commit(group, group.batch)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "units": self.units,
+            "units_per_batch": self.units / self.batches if self.batches else 0.0,
+        }
+
+    def _drop(self, key: Optional[str], group: _Group):
+        """
+        Called once a unit of work is done with the group, dropped when none is left: it holds no batch anymore, the
+        opener of a batch being the last to leave it.
+        """
+        with self._lock:
+            group.units -= 1
+            if not group.units:
+                del self._groups[key]
+
+    def _open(self, key: Optional[str]) -> Batch:
+        connection = self.engine.connect()
+        try:
+            batch = Batch(key, connection)
+            if connection.dialect.name == "sqlite":
+                # pysqlite only begins a transaction before an INSERT, UPDATE or DELETE: the first SAVEPOINT would
+                # begin one of its own, committed as soon as it is released. IMMEDIATE takes the write lock right away,
+                # a read transaction failing to become a write one when another connection wrote in the meantime.
+                connection.exec_driver_sql("BEGIN IMMEDIATE")
+        except Exception:
+            # e.g. the database stayed locked by another process for longer than the busy timeout
+            connection.close()
+            raise
+        return batch
+
+    def _commit(self, group: _Group, batch: Batch):
+        try:
+            batch.transaction.commit()
+        except Exception as e:
+            batch.error = e
+            # The connection may be unusable: it isn't given back to the pool
+            batch.connection.invalidate()
+        finally:
+            batch.connection.close()
+            group.batch = None
+            self.batches += 1
+            batch.done.set()
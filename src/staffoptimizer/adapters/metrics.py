@@ -0,0 +1,268 @@
+"""
+Metrics of the units of work, per use case: how many statements they send, how long the database takes to answer,
+how many rows they flush, how long loading the aggregate and committing take.
+
+Statements and rows are counted by SQLAlchemy event listeners, so that neither the repositories nor the services
+need to know about them.
+https://docs.sqlalchemy.org/en/14/core/events.html#sqlalchemy.events.ConnectionEvents
+https://docs.sqlalchemy.org/en/14/orm/events.html#sqlalchemy.orm.SessionEvents
+
+Each unit of work gets its own Recorder, found by the listeners through a context variable: it follows the request
+into the thread running a synchronous endpoint, as well as into the greenlets of the asyncio extension. Finished
+recorders are aggregated into histograms, exposed in the Prometheus text format.
+https://prometheus.io/docs/instrumenting/exposition_formats/
+
+instrument() listens to the statements of an engine, but units of work only record anything once enable() was
+called, by the application when metrics are enabled by its settings.
+"""
+
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+ENABLED = False
+
+SECONDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNTS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000, 10000, 50000)
+
+_use_case = ContextVar("use_case", default="unknown")
+_recorder = ContextVar("recorder", default=None)
+# Recorders finished while serving the current request, for the Server-Timing header
+_finished = ContextVar("finished", default=None)
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: tuple):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, use_case: str, value: float):
+        with self._lock:
+            counts, total = self._series.get(use_case) or ([0] * (len(self.buckets) + 1), 0)
+            # Counts are kept per bucket, and only made cumulative when exposed
+            counts[bisect_left(self.buckets, value)] += 1
+            self._series[use_case] = counts, total + value
+
+    def expose(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {use_case: (list(counts), total) for use_case, (counts, total) in self._series.items()}
+        for use_case, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{use_case="{use_case}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{use_case="{use_case}"}} {total}')
+            lines.append(f'{self.name}_count{{use_case="{use_case}"}} {cumulative}')
+        return lines
+
+
+HISTOGRAMS = {
+    "statements": Histogram("staffoptimizer_uow_statements", "Statements sent per unit of work", COUNTS),
+    "sql": Histogram("staffoptimizer_uow_sql_seconds", "Time spent in the database per unit of work", SECONDS),
+    "rows_flushed": Histogram("staffoptimizer_uow_rows_flushed", "Rows flushed per unit of work", COUNTS),
+    "load": Histogram("staffoptimizer_uow_load_seconds", "Time spent loading aggregates per unit of work", SECONDS),
+    "commit": Histogram("staffoptimizer_uow_commit_seconds", "Latency of the commits", SECONDS),
+    "rollback": Histogram("staffoptimizer_uow_rollback_seconds", "Latency of the rollbacks", SECONDS),
+    "total": Histogram("staffoptimizer_uow_seconds", "Duration of the units of work", SECONDS),
+    # Observed by the message bus, per handler rather than per use case
+    "handler_wait": Histogram(
+        "staffoptimizer_event_handler_wait_seconds", "Time events wait for a worker of the message bus", SECONDS
+    ),
+    "handler": Histogram("staffoptimizer_event_handler_seconds", "Latency of the event handlers", SECONDS),
+}
+
+
+class Recorder:
+    """
+    What a single unit of work did. Durations are in seconds.
+    """
+
+    def __init__(self, use_case: str):
+        self.use_case = use_case
+        self.statements = 0
+        self.rows_flushed = 0
+        self.durations = {"sql": 0.0, "load": 0.0}
+        self._start = time.perf_counter()
+
+    def timing(self, name: str):
+        return _Timing(self, name)
+
+    def finish(self):
+        self.durations["total"] = time.perf_counter() - self._start
+        HISTOGRAMS["statements"].observe(self.use_case, self.statements)
+        HISTOGRAMS["rows_flushed"].observe(self.use_case, self.rows_flushed)
+        for name, duration in self.durations.items():
+            HISTOGRAMS[name].observe(self.use_case, duration)
+
+
+class _Timing:
+    def __init__(self, recorder: Recorder, name: str):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args):
+        durations = self.recorder.durations
+        durations[self.name] = durations.get(self.name, 0.0) + time.perf_counter() - self.start
+
+
+_NOT_RECORDING = nullcontext()
+
+
+def use_case(function):
+    """
+    Names the unit of work run by a service after it, e.g. validate.
+
+    The previous name is restored by hand rather than through a token: a generator, e.g. a service streaming rows,
+    may be resumed by another thread, in another copy of the context.
+    """
+    name = function.__name__
+
+    if inspect.isasyncgenfunction(function):
+
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            previous = _use_case.get()
+            _use_case.set(name)
+            try:
+                async for item in function(*args, **kwargs):
+                    yield item
+            finally:
+                _use_case.set(previous)
+
+    elif inspect.isgeneratorfunction(function):
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            previous = _use_case.get()
+            _use_case.set(name)
+            try:
+                yield from function(*args, **kwargs)
+            finally:
+                _use_case.set(previous)
+
+    elif inspect.iscoroutinefunction(function):
+
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            previous = _use_case.get()
+            _use_case.set(name)
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                _use_case.set(previous)
+
+    else:
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            previous = _use_case.get()
+            _use_case.set(name)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _use_case.set(previous)
+
+    return wrapper
+
+
+def start() -> Optional[Recorder]:
+    """
+    Called by a unit of work when entered. Returns None, at the cost of a single test, when metrics are disabled.
+    """
+    if not ENABLED:
+        return None
+    recorder = Recorder(_use_case.get())
+    _recorder.set(recorder)
+    return recorder
+
+
+def finish(recorder: Optional[Recorder]):
+    if recorder is None:
+        return
+    _recorder.set(None)
+    recorder.finish()
+    finished = _finished.get()
+    if finished is not None:
+        finished.append(recorder)
+
+
+def timing(name: str):
+    """
+    Times a block of code into the current unit of work, e.g. with metrics.timing("load"): ...
+    """
+    recorder = _recorder.get()
+    return _NOT_RECORDING if recorder is None else recorder.timing(name)
+
+
+def collect():
+    """
+    Starts collecting the recorders finished in the current context, e.g. while serving a request.
+    """
+    finished = []
+    _finished.set(finished)
+    return finished
+
+
+def instrument(engine: Engine):
+    """
+    Listens to the statements sent through the engine, recorded once metrics are enabled.
+    """
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    if not event.contains(Session, "after_flush", _after_flush):
+        event.listen(Session, "after_flush", _after_flush)
+
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+
+def reset():
+    for histogram in HISTOGRAMS.values():
+        histogram._series.clear()
+
+
+def expose() -> str:
+    return "\n".join(line for histogram in HISTOGRAMS.values() for line in histogram.expose()) + "\n"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _recorder.get() is not None:
+        context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.statements += 1
+        recorder.durations["sql"] += time.perf_counter() - context._metrics_start
+
+
+def _after_flush(session, flush_context):
+    recorder = _recorder.get()
+    if recorder is not None:
+        recorder.rows_flushed += len(session.new) + len(session.dirty) + len(session.deleted)
@@ -0,0 +1,92 @@
+"""
+Schema migrations for SQLite databases created before the current tables in orm.py.
+
+A dedicated tool such as Alembic would be the way to go as soon as the schema evolves regularly, or when moving to
+another database. Until then, upgrade() brings an existing database up to date: missing tables are created, and tables
+lacking a primary key, a constraint or an index are rebuilt and refilled, following the procedure recommended by SQLite
+which doesn't support adding constraints through ALTER TABLE.
+https://www.sqlite.org/lang_altertable.html#otheralter
+"""
+
+
+from sqlalchemy import inspect
+
+from src.staffoptimizer.adapters import orm, repository
+from src.staffoptimizer.adapters.orm import metadata
+from src.staffoptimizer.domain import model
+
+# Statements filling a column the legacy table didn't have, beyond its server default
+BACKFILLS = {
+    ("users", "role"): [
+        f"UPDATE users SET role = '{orm.USER_ROLES[model.Editor]}' WHERE editor_id IS NOT NULL",
+        f"UPDATE users SET role = '{orm.USER_ROLES[model.ContentStrategist]}' WHERE csid IS NOT NULL",
+        f"UPDATE users SET role = '{orm.USER_ROLES[model.EditorSupervisor]}' WHERE esid IS NOT NULL",
+    ],
+}
+
+
+def upgrade(engine):
+    # pysqlite doesn't open a transaction before DDL statements: BEGIN is emitted explicitly for the upgrade to be
+    # all or nothing.
+    # https://docs.sqlalchemy.org/en/14/dialects/sqlite.html#serializable-isolation-savepoints-transactional-ddl
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        # Renaming a table must not rewrite the foreign keys of the other tables pointing to it
+        connection.exec_driver_sql("PRAGMA legacy_alter_table = ON")
+        try:
+            with connection.begin():
+                connection.exec_driver_sql("BEGIN")
+                inspector = inspect(connection)
+                existing = set(inspector.get_table_names())
+                for table in metadata.sorted_tables:
+                    if table.name not in existing:
+                        table.create(connection)
+                    elif not _up_to_date(inspector, table):
+                        _rebuild(connection, table)
+                # Once every other table is up to date
+                if existing and orm.run_summaries.name not in existing:
+                    _populate_run_summaries(connection)
+        finally:
+            connection.exec_driver_sql("PRAGMA legacy_alter_table = OFF")
+
+
+def _populate_run_summaries(connection):
+    # A read model created on an existing database starts with the summaries of the runs already there
+    connection.execute(
+        orm.run_summaries.insert().from_select(
+            ["run_id", "team", "tasks", "staffed", "unallocated"], repository.summaries()
+        )
+    )
+
+
+def _up_to_date(inspector, table):
+    columns = {column["name"] for column in inspector.get_columns(table.name)}
+    primary_key = inspector.get_pk_constraint(table.name)["constrained_columns"]
+    indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+    constraints = {constraint["name"] for constraint in inspector.get_unique_constraints(table.name)}
+    return (
+        {column.name for column in table.columns} <= columns
+        and primary_key == [column.name for column in table.primary_key]
+        and {index.name for index in table.indexes} <= indexes
+        and {c.name for c in table.constraints if c.name and c.name.startswith("uq_")} <= constraints
+    )
+
+
+def _rebuild(connection, table):
+    """
+    Duplicated rows are collapsed. Rows breaking a uniqueness constraint otherwise, e.g. two tasks sharing a
+    reference within a run, make the upgrade fail and roll back: they need a decision from someone.
+    """
+    legacy = f"_legacy_{table.name}"
+    connection.exec_driver_sql(f"ALTER TABLE {table.name} RENAME TO {legacy}")
+    # Index names are global to the database, they would prevent creating the new ones
+    for index in inspect(connection).get_indexes(legacy):
+        connection.exec_driver_sql(f"DROP INDEX {index['name']}")
+    legacy_columns = {column["name"] for column in inspect(connection).get_columns(legacy)}
+    table.create(connection)
+    columns = ", ".join(column.name for column in table.columns if column.name in legacy_columns)
+    connection.exec_driver_sql(f"INSERT INTO {table.name} ({columns}) SELECT DISTINCT {columns} FROM {legacy}")
+    connection.exec_driver_sql(f"DROP TABLE {legacy}")
+    for column in table.columns:
+        if column.name not in legacy_columns:
+            for statement in BACKFILLS.get((table.name, column.name), []):
+                connection.exec_driver_sql(statement)
@@ -13,27 +13,68 @@ https://docs.sqlalchemy.org/en/14/orm/mapping_api.html?#sqlalchemy.orm.mapper
 """
 
 
-from sqlalchemy import MetaData, Table, Column, Integer, String, ForeignKey
+import sys
+from typing import Optional
+
+from sqlalchemy import (
+    MetaData, Table, Column, Boolean, Integer, String, ForeignKey, Index, UniqueConstraint, TypeDecorator, event, true
+)
 from sqlalchemy.orm import mapper, relationship
 
 from src.staffoptimizer.domain import model
 
 metadata = MetaData()
 
+
+class InternedString(TypeDecorator):
+    """
+    A string column holding few distinct values across many rows, e.g. the team of a task. The driver builds a new
+    str for each row it fetches: interned, the tasks of a run loaded whole share a single copy of each value.
+    https://docs.python.org/3/library/sys.html#sys.intern
+    """
+
+    impl = String
+    cache_ok = True
+
+    def process_result_value(self, value, dialect):
+        return value if value is None else sys.intern(value)
+
+
+# Every index and constraint is named, so that migrations can tell which ones a database already has
 staffoptimizers = Table(
     "staffoptimizers",
     metadata,
-    Column("run_id", String(255)),
+    Column("run_id", String(255), primary_key=True),
+    # Incremented by the units of work rewriting the whole run, see mapper() below
+    Column("version_number", Integer, nullable=False, server_default="0"),
+    # Incremented by every unit of work changing the run, rewrites and appends alike: cached aggregates whose revision
+    # is no longer the one of the database are outdated, see adapters.cache
+    Column("revision", Integer, nullable=False, server_default="0"),
 )
 tasks = Table(
     "tasks",
     metadata,
     Column("id", Integer, primary_key=True, autoincrement=True),
-    Column("run_id", ForeignKey("staffoptimizer_runs.id")),
-    Column("reference", String(255)),
-    Column("status", String(255)),
-    Column("team", String(255)),
+    Column("run_id", InternedString(255), ForeignKey("staffoptimizers.run_id"), nullable=False),
+    Column("reference", String(255), nullable=False),
+    Column("status", Integer),
+    Column("team", InternedString(255)),
+    # Set by the model when the status or the assignments of the task change, cleared once validated
+    Column("needs_validation", Boolean, nullable=False, server_default="1"),
+    # A reference is unique within a run: the database enforces TaskAlreadyExists. Leading with run_id, it also
+    # serves loading all the tasks of a run.
+    UniqueConstraint("run_id", "reference", name="uq_tasks_run_id_reference"),
+    # Walking through the tasks of a run in chunks, see StaffOptimizerRepository.next_chunk
+    Index("ix_tasks_run_id_id", "run_id", "id"),
 )
+# Only the tasks left to validate are indexed: an incremental validation finds them without going through the run.
+# The queries must repeat the WHERE clause of the index, as is, for SQLite to use it. needs_validation is part of the
+# key as well, so that SQLite prefers this index to ix_tasks_run_id_id, lacking statistics to tell them apart.
+TASK_NEEDS_VALIDATION = tasks.c.needs_validation == true()
+Index(
+    "ix_tasks_run_id_needs_validation", tasks.c.run_id, tasks.c.needs_validation, sqlite_where=TASK_NEEDS_VALIDATION
+)
+
 users = Table(
     "users",
     metadata,
@@ -42,31 +83,128 @@ users = Table(
     Column("editor_id", String(255)),
     Column("csid", String(255)),
     Column("esid", String(255)),
+    Column("team", String(255)),
+    Column("capacity", Integer, nullable=False, server_default="1"),
+    # Discriminator of the single table inheritance, see start_mappers()
+    Column("role", String(50), nullable=False, server_default="user"),
+    Index("ix_users_editor_id", "editor_id", unique=True),
+    Index("ix_users_role", "role"),
 )
 assignments = Table(
     "assignments",
     metadata,
     Column("id", Integer, primary_key=True, autoincrement=True),
-    Column("task_id", ForeignKey("tasks.id")),
-    Column("user_id", ForeignKey("users.id")),
+    Column("task_id", ForeignKey("tasks.id"), nullable=False),
+    Column("user_id", ForeignKey("users.id"), nullable=False),
+    UniqueConstraint("task_id", "user_id", name="uq_assignments_task_id_user_id"),
+    Index("ix_assignments_user_id", "user_id"),
 )
 
+# Read model: counts of tasks per team of each run, refreshed by the services changing them, see views.py. Not
+# mapped, it is only ever read and written through SQL.
+run_summaries = Table(
+    "run_summaries",
+    metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("run_id", ForeignKey("staffoptimizers.run_id"), nullable=False),
+    Column("team", String(255)),
+    Column("tasks", Integer, nullable=False),
+    Column("staffed", Integer, nullable=False),
+    Column("unallocated", Integer, nullable=False),
+    UniqueConstraint("run_id", "team", name="uq_run_summaries_run_id_team"),
+)
+
+# Validations run in the background, in chunks of tasks, see services.run_validation. Not mapped either. A run has at
+# most one job queued or running at a time: SQLite enforces it through a partial index.
+# https://www.sqlite.org/partialindex.html
+ACTIVE_JOB_STATUSES = ("queued", "running")
+validation_jobs = Table(
+    "validation_jobs",
+    metadata,
+    Column("id", String(36), primary_key=True),
+    Column("run_id", ForeignKey("staffoptimizers.run_id"), nullable=False),
+    Column("status", String(20), nullable=False),
+    Column("tasks", Integer, nullable=False),
+    # Progress, committed with each chunk: a job interrupted by a restart resumes after last_task_id
+    Column("validated", Integer, nullable=False, server_default="0"),
+    Column("staffed", Integer, nullable=False, server_default="0"),
+    Column("unallocated", Integer, nullable=False, server_default="0"),
+    Column("last_task_id", Integer, nullable=False, server_default="0"),
+    Column("error", String(255)),
+)
+Index(
+    "ix_validation_jobs_active_run_id",
+    validation_jobs.c.run_id,
+    unique=True,
+    sqlite_where=validation_jobs.c.status.in_(ACTIVE_JOB_STATUSES),
+)
+
+
+USER_ROLES = {
+    model.User: "user",
+    model.Editor: "editor",
+    model.ContentStrategist: "content_strategist",
+    model.EditorSupervisor: "editor_supervisor",
+}
+
+
+def violated_constraint(message: str) -> Optional[str]:
+    """
+    Name of the uniqueness constraint an error of the driver is about. PostgreSQL names it, SQLite only lists its
+    columns, e.g. "UNIQUE constraint failed: tasks.run_id, tasks.reference". None for an unnamed one, e.g. a primary
+    key.
+    """
+    for table in metadata.tables.values():
+        for constraint in table.constraints:
+            if isinstance(constraint, UniqueConstraint) and constraint.name:
+                columns = ", ".join(f"{table.name}.{column.name}" for column in constraint.columns)
+                if f'"{constraint.name}"' in message or message.endswith(f"UNIQUE constraint failed: {columns}"):
+                    return constraint.name
+    return None
+
 
 def start_mappers():
-    users_mapper = mapper(model.User, users)
+    """
+    All users are stored in the same table, the role column telling which class a row is loaded as: a query can
+    then tell editors apart from other users, and the ORM returns instances of the right class.
+    https://docs.sqlalchemy.org/en/14/orm/inheritance.html#single-table-inheritance
+    """
+    users_mapper = mapper(
+        model.User, users, polymorphic_on=users.c.role, polymorphic_identity=USER_ROLES[model.User]
+    )
+    for user_class in (model.Editor, model.ContentStrategist, model.EditorSupervisor):
+        mapper(user_class, inherits=users_mapper, polymorphic_identity=USER_ROLES[user_class])
     tasks_mapper = mapper(
         model.Task,
         tasks,
         properties={
+            # status and team are domain properties keeping the StaffOptimizer indexes up to date
+            "_status": tasks.c.status,
+            "_team": tasks.c.team,
             "_assignments": relationship(
                 users_mapper,
                 secondary=assignments,
-                collection_class=set,
-            )
+                collection_class=model.Assignments,
+            ),
         },
     )
+    # The UPDATE of the version of a run only matches the row if nobody rewrote it since it was loaded, otherwise the
+    # commit fails with a StaleDataError.
+    # https://docs.sqlalchemy.org/en/14/orm/versioning.html#programmatic-or-conditional-version-counters
     mapper(
         model.StaffOptimizer,
         staffoptimizers,
-        properties={"tasks": relationship(tasks_mapper)},
+        version_id_col=staffoptimizers.c.version_number,
+        version_id_generator=False,
+        properties={
+            "tasks": relationship(tasks_mapper, collection_class=model.Tasks, order_by=tasks.c.id),
+            # Unknown to the domain, only read by the repository
+            "_revision": staffoptimizers.c.revision,
+        },
     )
+    event.listen(model.StaffOptimizer, "load", _receive_load)
+
+
+def _receive_load(so, _):
+    # Loaded objects are built without calling __init__
+    so.events = []
@@ -17,6 +17,18 @@ https://blog.ploeh.dk/2013/12/03/layers-onions-ports-adapters-its-all-the-same/
 """
 
 
+import uuid
+from functools import wraps
+from itertools import chain, groupby
+from operator import itemgetter
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+from sqlalchemy import and_, case, delete, exists, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import contains_eager, raiseload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+
+from src.staffoptimizer.adapters import cache, metrics, orm, sharding
 from src.staffoptimizer.domain import model
 
 
@@ -52,12 +64,415 @@ class SQLAlchemyRepository(AbstractRepository):
         return self.session.query(self.entity).all()
 
 
+def _routed(method):
+    """
+    Routes the session to the shard of the run given as first argument, see sharding.py.
+    """
+    @wraps(method)
+    def routed(self, run_id, *args, **kwargs):
+        sharding.route(self.session, run_id)
+        return method(self, run_id, *args, **kwargs)
+
+    return routed
+
+
+def _insert(session, table):
+    """
+    The INSERT of the dialect of the session, taking an ON CONFLICT clause: SQLite and PostgreSQL share its syntax.
+    https://docs.sqlalchemy.org/en/14/dialects/sqlite.html#insert-on-conflict-upsert
+    """
+    dialects = {"sqlite": sqlite, "postgresql": postgresql}
+    return dialects[session.get_bind().dialect.name].insert(table)
+
+
+def _load_run_only(query, **_):
+    # Walking through the tasks would load the whole run: better fail loudly
+    return query.options(raiseload(model.StaffOptimizer.tasks))
+
+
+def _load_tasks_and_assignments(query, **_):
+    return query.options(
+        selectinload(model.StaffOptimizer.tasks).selectinload(model.Task._assignments)
+    )
+
+
+def _load_referenced_tasks(query, reference=None, references=(), **_):
+    """
+    Only the tasks matching the references get into the tasks collection. The aggregate must then not be asked
+    about the whole run, e.g. its staffed_tasks.
+    """
+    references = [reference] if reference is not None else list(references)
+    return query.outerjoin(
+        model.StaffOptimizer.tasks.and_(model.Task.reference.in_(references))
+    ).options(
+        contains_eager(model.StaffOptimizer.tasks).selectinload(model.Task._assignments)
+    )
+
+
+def _load_tasks_to_validate(query, **_):
+    """
+    Only the tasks changed since they were last validated, found through a partial index: the cost follows the
+    number of changes rather than the size of the run.
+    """
+    return query.outerjoin(
+        model.StaffOptimizer.tasks.and_(orm.TASK_NEEDS_VALIDATION)
+    ).options(
+        contains_eager(model.StaffOptimizer.tasks).selectinload(model.Task._assignments)
+    )
+
+
+# Loading strategy per use case: by default the tasks and their assignments are lazily loaded, firing one query
+# per task as soon as the whole run is walked through (the N+1 problem).
+# https://docs.sqlalchemy.org/en/14/orm/loading_relationships.html
+LOADING_PROFILES = {
+    "add_task": _load_referenced_tasks,
+    "add_tasks": _load_run_only,
+    "assign": _load_referenced_tasks,
+    "assign_many": _load_referenced_tasks,
+    "export_tasks": _load_run_only,
+    "optimize": _load_tasks_and_assignments,
+    "validate": _load_tasks_and_assignments,
+    "validate_in_database": _load_run_only,
+    "validate_changes": _load_tasks_to_validate,
+}
+# Profiles loading the whole aggregate, the only ones served by, and filling, the cache of aggregates
+CACHED_PROFILES = {"optimize", "validate"}
+# Profiles of the use cases rewriting the whole aggregate, whose commit fails if the run was rewritten meanwhile.
+# Appending tasks or assigning editors doesn't conflict with another change, see increment_versions().
+REWRITING_PROFILES = {"optimize", "validate", "validate_in_database"}
+# Profiles of the use cases only reading the run, which don't join a group commit
+READING_PROFILES = {"export_tasks"}
+
+
+def _has_editor():
+    """
+    SQL counterpart of looking for an Editor among the assignments of a task.
+    """
+    assignments, users = orm.assignments, orm.users
+    return (
+        exists()
+        .where(assignments.c.task_id == orm.tasks.c.id)
+        .where(assignments.c.user_id == users.c.id)
+        .where(users.c.role == orm.USER_ROLES[model.Editor])
+    )
+
+
+def summaries(run_id=None):
+    """
+    Rows of the run_summaries read model, computed from the tasks of a run, or of every run. Staffed and unallocated
+    follow Task.staffed and Task.unallocated.
+    """
+    tasks = orm.tasks
+    reviewed = tasks.c.status > model.Status.READY_FOR_STAFFING.value
+    has_editor = _has_editor()
+    query = select(
+        tasks.c.run_id,
+        tasks.c.team,
+        func.count().label("tasks"),
+        func.sum(case((and_(reviewed, has_editor), 1), else_=0)).label("staffed"),
+        func.sum(case((and_(reviewed, ~has_editor), 1), else_=0)).label("unallocated"),
+    ).group_by(tasks.c.run_id, tasks.c.team)
+    return query if run_id is None else query.where(tasks.c.run_id == run_id)
+
+
+def _exported_tasks(run_id):
+    """
+    One row per assignment of a task, or a single one for a task without any. The rows of a task follow each other
+    and can be grouped on the fly: tasks come in the order of the (run_id, reference) unique index, so that the
+    database doesn't have to sort the whole run before sending its first row.
+    """
+    tasks, assignments, users = orm.tasks, orm.assignments, orm.users
+    return (
+        select(tasks.c.id, tasks.c.reference, tasks.c.status, tasks.c.team, users.c.editor_id)
+        .select_from(tasks.outerjoin(assignments).outerjoin(users))
+        .where(tasks.c.run_id == run_id)
+        .order_by(tasks.c.reference)
+    )
+
+
+def _with_editor_ids(rows):
+    for _, task_rows in groupby(rows, key=itemgetter(0)):
+        _, reference, status, team, editor_id = first = next(task_rows)
+        editor_ids = [editor_id for *_, editor_id in chain([first], task_rows) if editor_id is not None]
+        yield reference, status, team, editor_ids
+
+
 class StaffOptimizerRepository(SQLAlchemyRepository):
-    def __init__(self, session):
+    def __init__(
+        self,
+        session,
+        cache: Optional[cache.AggregateCache] = None,
+        before_writing: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        before_writing is called with the run_id before loading a run to change it, e.g. to join a group commit.
+        """
         super().__init__(session, model.StaffOptimizer)
+        self.cache = cache
+        self.before_writing = before_writing
+        # Aggregates added or loaded by the unit of work, those among them loaded whole, and those rewritten
+        self.seen = set()
+        self._whole = set()
+        self._rewritten = set()
+
+    def add(self, so: model.StaffOptimizer):
+        sharding.route(self.session, so.run_id)
+        super().add(so)
+        self.seen.add(so)
+
+    @_routed
+    def get(self, run_id, profile=None, **criteria) -> model.StaffOptimizer:
+        if self.before_writing is not None and profile not in READING_PROFILES:
+            self.before_writing(run_id)
+        with metrics.timing("load"):
+            so = self._cached(run_id) if self.cache is not None and profile in CACHED_PROFILES else None
+            if so is None:
+                query = self.session.query(self.entity).filter_by(run_id=run_id)
+                if profile is not None:
+                    query = LOADING_PROFILES[profile](query, **criteria)
+                so = query.one_or_none()
+        if so is not None:
+            self.seen.add(so)
+            if profile in CACHED_PROFILES:
+                self._whole.add(so)
+            if profile in REWRITING_PROFILES:
+                self._rewritten.add(so)
+        return so
+
+    @_routed
+    def get_or_create(self, run_id, profile=None, **criteria) -> model.StaffOptimizer:
+        """
+        The run, created first if new. Units of work adding the first tasks of a run at the same time both insert it:
+        ON CONFLICT DO NOTHING lets the second one use the row of the first, rather than fail on its primary key.
+        """
+        so = self.get(run_id, profile, **criteria)
+        if so is None:
+            self.session.execute(
+                _insert(self.session, orm.staffoptimizers).values(run_id=run_id).on_conflict_do_nothing()
+            )
+            so = self.get(run_id, profile, **criteria)
+        return so
+
+    def _cached(self, run_id) -> Optional[model.StaffOptimizer]:
+        so = self.cache.checkout(run_id, lambda: self._revision(run_id))
+        if so is not None:
+            # The whole aggregate, its tasks and their users, joins the session without loading the tasks again
+            self.session.add(so)
+            self._refresh_users(run_id)
+        return so
+
+    def _revision(self, run_id) -> Optional[int]:
+        staffoptimizers = orm.staffoptimizers
+        return self.session.execute(
+            select(staffoptimizers.c.revision).where(staffoptimizers.c.run_id == run_id)
+        ).scalar_one_or_none()
+
+    def _refresh_users(self, run_id):
+        """
+        Users changed since the aggregate was cached, e.g. their capacity, don't change the revision of the run: the
+        users assigned to its tasks are read again, a single SELECT overwriting the attributes of the cached ones.
+        """
+        tasks, assignments = orm.tasks, orm.assignments
+        assigned = (
+            select(assignments.c.user_id)
+            .join(tasks, assignments.c.task_id == tasks.c.id)
+            .where(tasks.c.run_id == run_id)
+        )
+        self.session.query(model.User).filter(orm.users.c.id.in_(assigned)).populate_existing().all()
+
+    def increment_versions(self):
+        """
+        Called by the unit of work before committing. The version of an aggregate rewritten whole is incremented, its
+        UPDATE failing the commit if another unit of work rewrote the run in the meantime. Appends and assignments
+        don't check anything: whatever the unit of work, the revision of each run it changed is incremented in place.
+        https://docs.sqlalchemy.org/en/14/orm/versioning.html
+        """
+        if not self.seen:
+            return
+        for so in self._rewritten:
+            so.version_number += 1
+        # Pending aggregates are inserted first, and version conflicts raised before any other write
+        self.session.flush()
+        staffoptimizers = orm.staffoptimizers
+        changed = staffoptimizers.c.run_id.in_([so.run_id for so in self.seen])
+        self.session.execute(
+            update(staffoptimizers).where(changed).values(revision=staffoptimizers.c.revision + 1)
+        )
+        for so in self._whole:
+            # The revision the cached copy is up to date with, unless another unit of work changed the run since it
+            # was loaded: the database is then ahead, and the copy found outdated once checked out
+            set_committed_value(so, "_revision", so._revision + 1)
+
+    def cache_aggregates(self):
+        """
+        Called by the unit of work once committed and closed. Only an aggregate loaded whole goes back to the cache,
+        and only when it is the single one of the unit of work: aggregates loaded together share their users, which
+        couldn't be attached to two sessions at once. The others are dropped from the cache, being outdated.
+        """
+        if self.cache is None:
+            return
+        for so in self.seen:
+            if so in self._whole and len(self.seen) == 1:
+                self.cache.checkin(so, so._revision)
+            else:
+                self.cache.discard(so.run_id)
+
+    @_routed
+    def references(self, run_id, among=None) -> set[str]:
+        """
+        Only the reference column is fetched: checking a batch for duplicates doesn't need the whole aggregate.
+        With among, only the references of the batch are looked for, instead of every reference of the run.
+        """
+        query = select(orm.tasks.c.reference).where(orm.tasks.c.run_id == run_id)
+        if among is not None:
+            query = query.where(orm.tasks.c.reference.in_(list(among)))
+        return {reference for reference, in self.session.execute(query)}
+
+    def add_tasks(self, so: model.StaffOptimizer, tasks: list[model.Task], batch_size=1000):
+        """
+        Bulk path bypassing the unit of work of the Session: rows are sent through a core INSERT, one executemany
+        per batch, instead of being flushed object by object.
+        https://docs.sqlalchemy.org/en/14/tutorial/dbapi_transactions.html#sending-multiple-parameters
+        """
+        sharding.route(self.session, so.run_id)
+        # The StaffOptimizer row may still be pending: the tasks rows reference it
+        self.session.flush()
+        rows = [
+            {"run_id": so.run_id, "reference": t.reference, "status": t.status, "team": t.team}
+            for t in tasks
+        ]
+        for start in range(0, len(rows), batch_size):
+            self.session.execute(orm.tasks.insert(), rows[start:start + batch_size])
+
+    @_routed
+    def list_unallocated(self, run_id) -> list[model.Task]:
+        """
+        The unallocated tasks of a run, filtered by the database instead of hydrating the whole run.
+        """
+        return (
+            self.session.query(model.Task)
+            .filter(orm.tasks.c.run_id == run_id)
+            .filter(orm.tasks.c.status > model.Status.READY_FOR_STAFFING.value)
+            .filter(~_has_editor())
+            .all()
+        )
+
+    @_routed
+    def stream_tasks(self, run_id, batch_size=1000) -> Iterator[tuple[str, int, str, list[str]]]:
+        """
+        (reference, status, team, editor ids) of each task of the run, read through a server-side cursor, batch_size
+        rows at a time: exporting a run doesn't hydrate it, whatever its size.
+        https://docs.sqlalchemy.org/en/14/core/connections.html#using-server-side-cursors-a-k-a-stream-results
+        """
+        result = self.session.execute(_exported_tasks(run_id).execution_options(stream_results=True))
+        yield from _with_editor_ids(result.yield_per(batch_size))
+
+    @_routed
+    def count_tasks(self, run_id) -> int:
+        return self.session.execute(
+            select(func.count()).select_from(orm.tasks).where(orm.tasks.c.run_id == run_id)
+        ).scalar_one()
+
+    @_routed
+    def has_tasks(self, run_id) -> bool:
+        # EXISTS stops at the first task, where COUNT goes through the whole run
+        return self.session.execute(select(exists().where(orm.tasks.c.run_id == run_id))).scalar_one()
+
+    @_routed
+    def refresh_summary(self, run_id):
+        """
+        Recomputes the read model of the run, within the unit of work changing it: a single GROUP BY over the tasks of
+        the run, so that reading the summary is a single indexed SELECT however often it's polled.
+        """
+        # Pending changes must be visible to the INSERT ... SELECT
+        self.session.flush()
+        run_summaries = orm.run_summaries
+        self.session.execute(delete(run_summaries).where(run_summaries.c.run_id == run_id))
+        self.session.execute(
+            run_summaries.insert().from_select(
+                ["run_id", "team", "tasks", "staffed", "unallocated"], summaries(run_id)
+            )
+        )
+
+    @_routed
+    def update_summary(self, run_id, deltas: dict[Optional[str], tuple[int, int, int]]):
+        """
+        Patches the read model of the run with the (tasks, staffed, unallocated) deltas of each team: an UPDATE per
+        team changed, whatever the size of the run. A team new to the run first gets a row of zeros, inserted with
+        ON CONFLICT DO NOTHING: units of work adding the first tasks of a team at the same time then both update the
+        row of the first one. NULL teams never conflict, as NULLs aren't equal to each other in a unique constraint.
+        """
+        run_summaries = orm.run_summaries
+        for team, (tasks, staffed, unallocated) in deltas.items():
+            if not (tasks or staffed or unallocated):
+                continue
+            same_team = run_summaries.c.team.is_(None) if team is None else run_summaries.c.team == team
+            statement = (
+                update(run_summaries)
+                .where(run_summaries.c.run_id == run_id, same_team)
+                .values(
+                    tasks=run_summaries.c.tasks + tasks,
+                    staffed=run_summaries.c.staffed + staffed,
+                    unallocated=run_summaries.c.unallocated + unallocated,
+                )
+            )
+            if not self.session.execute(statement).rowcount:
+                # The StaffOptimizer row may still be pending
+                self.session.flush()
+                self.session.execute(
+                    _insert(self.session, run_summaries)
+                    .values(run_id=run_id, team=team, tasks=0, staffed=0, unallocated=0)
+                    .on_conflict_do_nothing()
+                )
+                self.session.execute(statement)
+
+    @_routed
+    def next_chunk(self, run_id, after: int, size: int) -> tuple[int, Optional[int]]:
+        """
+        Number and last id of the next size tasks of the run, in the order of their ids, following the task whose id
+        is after. Walking through the primary key rather than using OFFSET, each chunk costs the same.
+        """
+        tasks = orm.tasks
+        chunk = (
+            select(tasks.c.id)
+            .where(tasks.c.run_id == run_id, tasks.c.id > after)
+            .order_by(tasks.c.id)
+            .limit(size)
+            .subquery()
+        )
+        count, last = self.session.execute(select(func.count(), func.max(chunk.c.id))).one()
+        return count, last
 
-    def get(self, run_id) -> model.StaffOptimizer:
-        return self.session.query(self.entity).filter_by(run_id=run_id).one()
+    @_routed
+    def update_statuses_in_bulk(
+        self, run_id, staffed_status, unallocated_status, after: int = None, upto: int = None
+    ) -> tuple[int, int]:
+        """
+        Set-based counterpart of flipping the status of each hydrated task: the database computes which tasks are
+        staffed or unallocated, and both transitions are applied by one UPDATE each, whatever the size of the run.
+        Returns the number of staffed and unallocated tasks. With after and upto, only the tasks whose id is within
+        (after, upto] are updated, see next_chunk. Either way, the tasks updated no longer need to be validated.
+
+        The UPDATE statements don't go through the identity map, objects of the run already loaded in the session
+        are stale until the next commit expires them. The StaffOptimizer of the run is expected to be loaded, only
+        its row: its revision, incremented by the commit, outdates the cached copies of the run.
+        """
+        tasks = orm.tasks
+        has_editor = _has_editor()
+        in_run = tasks.c.run_id == run_id
+        if after is not None:
+            in_run = and_(in_run, tasks.c.id > after, tasks.c.id <= upto)
+        reviewed = and_(in_run, tasks.c.status > model.Status.READY_FOR_STAFFING.value)
+        # Staffed tasks keep a status above READY_FOR_STAFFING, the second statement can't catch them
+        staffed = self.session.execute(
+            update(tasks).where(reviewed, has_editor).values(status=staffed_status, needs_validation=False)
+        )
+        unallocated = self.session.execute(
+            update(tasks).where(reviewed, ~has_editor).values(status=unallocated_status, needs_validation=False)
+        )
+        # Tasks waiting for staffing are left as they are
+        self.session.execute(update(tasks).where(in_run, orm.TASK_NEEDS_VALIDATION).values(needs_validation=False))
+        return staffed.rowcount, unallocated.rowcount
 
 
 class UserRepository(SQLAlchemyRepository):
@@ -70,5 +485,186 @@ class UserRepository(SQLAlchemyRepository):
         """
         raise NotImplementedError
 
-    def get_editor(self, editor_id):
-        return self.session.query(self.entity).filter_by(editor_id=editor_id).one()
+    def get_editor(self, editor_id) -> model.Editor:
+        return self.session.query(model.Editor).filter_by(editor_id=editor_id).one_or_none()
+
+    def list_editors(self) -> list[model.Editor]:
+        return self.session.query(model.Editor).all()
+
+    def get_editors(self, editor_ids) -> list[model.Editor]:
+        """
+        One query for the whole batch: unknown editor ids are simply missing from the result.
+        """
+        return self.session.query(model.Editor).filter(model.Editor.editor_id.in_(list(editor_ids))).all()
+
+
+class ValidationJobRepository:
+    """
+    Jobs are bookkeeping rather than domain objects: plain rows, read and written through SQL.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    @_routed
+    def add(self, run_id, tasks: int) -> str:
+        job_id = uuid.uuid4().hex
+        self.session.execute(
+            orm.validation_jobs.insert().values(id=job_id, run_id=run_id, status="queued", tasks=tasks)
+        )
+        return job_id
+
+    def get(self, job_id):
+        """
+        Looked for on every shard, unless the session is routed already: the session is then routed to the shard of
+        the job.
+        """
+        jobs = orm.validation_jobs
+        query = select(jobs).where(jobs.c.id == job_id)
+        for arguments in sharding.bind_arguments(self.session):
+            job = self.session.execute(query, bind_arguments=arguments).one_or_none()
+            if job is not None:
+                sharding.route(self.session, job.run_id)
+                return job
+        return None
+
+    def active(self, run_id=None) -> list:
+        """
+        Jobs queued or running, of a run or of every run.
+        """
+        jobs = orm.validation_jobs
+        query = select(jobs).where(jobs.c.status.in_(orm.ACTIVE_JOB_STATUSES))
+        if run_id is not None:
+            sharding.route(self.session, run_id)
+            query = query.where(jobs.c.run_id == run_id)
+        return [
+            job
+            for arguments in sharding.bind_arguments(self.session)
+            for job in self.session.execute(query, bind_arguments=arguments).all()
+        ]
+
+    def update(self, job_id, **values):
+        """
+        Validated, staffed and unallocated given as deltas are added to the counts of the job.
+        """
+        jobs = orm.validation_jobs
+        if len(sharding.bind_arguments(self.session)) > 1:
+            # Routes the session to the shard of the job
+            self.get(job_id)
+        values = {
+            name: jobs.c[name] + value if name in ("validated", "staffed", "unallocated") else value
+            for name, value in values.items()
+        }
+        self.session.execute(update(jobs).where(jobs.c.id == job_id).values(**values))
+
+
+class AsyncSQLAlchemyRepository:
+    """
+    Asynchronous counterpart of SQLAlchemyRepository, on top of an AsyncSession.
+
+    Rather than writing every query twice, each method hands the synchronous repository over to
+    AsyncSession.run_sync: the synchronous code runs in a greenlet, while the I/O underneath goes through the asyncio
+    driver without blocking the event loop, see "Running Synchronous Methods and Functions under asyncio".
+    https://docs.sqlalchemy.org/en/14/orm/extensions/asyncio.html
+
+    Lazy loading isn't available with asyncio: whatever is touched outside of the repository must be eagerly loaded,
+    hence a loading profile is expected by get().
+    """
+
+    repository_class = SQLAlchemyRepository
+
+    def __init__(self, session, **kwargs):
+        self.session = session
+        # Built once, so that it keeps track of what the unit of work loaded
+        self.sync = self.repository_class(session.sync_session, **kwargs)
+
+    def add(self, entry):
+        self.sync.add(entry)
+
+    async def _run(self, method, *args, **kwargs):
+        return await self.session.run_sync(lambda _: getattr(self.sync, method)(*args, **kwargs))
+
+
+class AsyncStaffOptimizerRepository(AsyncSQLAlchemyRepository):
+    repository_class = StaffOptimizerRepository
+
+    async def get(self, run_id, profile, **criteria) -> model.StaffOptimizer:
+        return await self._run("get", run_id, profile, **criteria)
+
+    async def get_or_create(self, run_id, profile, **criteria) -> model.StaffOptimizer:
+        return await self._run("get_or_create", run_id, profile, **criteria)
+
+    @property
+    def seen(self) -> set[model.StaffOptimizer]:
+        return self.sync.seen
+
+    async def increment_versions(self):
+        await self._run("increment_versions")
+
+    def cache_aggregates(self):
+        self.sync.cache_aggregates()
+
+    async def references(self, run_id, among=None) -> set[str]:
+        return await self._run("references", run_id, among)
+
+    async def add_tasks(self, so: model.StaffOptimizer, tasks: list[model.Task]):
+        return await self._run("add_tasks", so, tasks)
+
+    async def stream_tasks(self, run_id, batch_size=1000) -> AsyncIterator[tuple[str, int, str, list[str]]]:
+        """
+        Rows can't be handed over to the synchronous repository one at a time: they are streamed by the AsyncSession,
+        and grouped batch by batch, the tasks straddling two batches being carried over.
+        """
+        sharding.route(self.session, run_id)
+        result = await self.session.stream(_exported_tasks(run_id))
+        carried_over = []
+        async for rows in result.partitions(batch_size):
+            rows = carried_over + rows
+            # The last task of the batch may have more assignments in the next one
+            last_task_id = rows[-1][0]
+            carried_over = [row for row in rows if row[0] == last_task_id]
+            for task in _with_editor_ids(row for row in rows if row[0] != last_task_id):
+                yield task
+        for task in _with_editor_ids(carried_over):
+            yield task
+
+    async def count_tasks(self, run_id) -> int:
+        return await self._run("count_tasks", run_id)
+
+    async def has_tasks(self, run_id) -> bool:
+        return await self._run("has_tasks", run_id)
+
+    async def refresh_summary(self, run_id):
+        return await self._run("refresh_summary", run_id)
+
+    async def update_summary(self, run_id, deltas: dict[Optional[str], tuple[int, int, int]]):
+        return await self._run("update_summary", run_id, deltas)
+
+    async def update_statuses_in_bulk(self, run_id, staffed_status, unallocated_status) -> tuple[int, int]:
+        return await self._run("update_statuses_in_bulk", run_id, staffed_status, unallocated_status)
+
+
+class AsyncValidationJobRepository(AsyncSQLAlchemyRepository):
+    repository_class = ValidationJobRepository
+
+    async def add(self, run_id, tasks: int) -> str:
+        return await self._run("add", run_id, tasks)
+
+    async def get(self, job_id):
+        return await self._run("get", job_id)
+
+    async def active(self, run_id=None) -> list:
+        return await self._run("active", run_id)
+
+
+class AsyncUserRepository(AsyncSQLAlchemyRepository):
+    repository_class = UserRepository
+
+    async def get_editor(self, editor_id) -> model.Editor:
+        return await self._run("get_editor", editor_id)
+
+    async def get_editors(self, editor_ids) -> list[model.Editor]:
+        return await self._run("get_editors", editor_ids)
+
+    async def list_editors(self) -> list[model.Editor]:
+        return await self._run("list_editors")
@@ -0,0 +1,105 @@
+"""
+Horizontal sharding: runs are spread over several databases, the shards, each taking the writes of its runs only. A
+hash of the run_id tells which shard holds a run, its tasks, their assignments, its summary and its validation jobs.
+https://docs.sqlalchemy.org/en/14/orm/examples.html#module-examples.sharding
+
+A unit of work changes a single run, the aggregate being the boundary of its transaction: its session is routed to
+the shard of the first run_id the repositories are given, every statement of the session then going to that shard.
+Services don't know about shards, the repositories route the session. Statements run before the session is routed
+go to the first shard, e.g. looking a validation job up by its id, which is then looked for on every shard.
+
+Users are replicated: every shard holds all of them, so that assignments keep pointing to a row of the same database,
+and loading a task along with its editors stays a join. They are written to the first shard, the directory, and
+replicate_users() copies them to the others.
+
+The shard of a run depends on the number of shards: adding one moves runs, which would have to be copied over.
+"""
+
+
+import zlib
+from typing import Optional, Sequence
+
+from sqlalchemy import bindparam, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from src.staffoptimizer.adapters import orm
+
+
+class RunOnAnotherShard(Exception):
+    """
+    The unit of work was given runs held by two shards, whose changes couldn't be committed as a whole.
+    """
+
+
+def shard_of(run_id: str, shards: int) -> int:
+    # crc32 rather than hash(), which changes with every process unless PYTHONHASHSEED is set
+    return zlib.crc32(run_id.encode()) % shards
+
+
+class ShardedSession(Session):
+    def __init__(self, shards: Sequence[Engine], **kwargs):
+        super().__init__(**kwargs)
+        self.shards = list(shards)
+        # Index of the shard the session is routed to
+        self.shard: Optional[int] = None
+
+    def route(self, run_id: str):
+        shard = shard_of(run_id, len(self.shards))
+        if self.shard is None:
+            self.shard = shard
+        elif shard != self.shard:
+            raise RunOnAnotherShard(f"{run_id} isn't held by shard {self.shard}")
+
+    def get_bind(self, mapper=None, clause=None, shard=None, **kwargs):
+        """
+        shard, given through the bind_arguments of execute(), sends a single statement to another shard.
+        """
+        if shard is None:
+            shard = self.shard if self.shard is not None else 0
+        return self.shards[shard]
+
+    def close(self):
+        super().close()
+        self.shard = None
+
+
+def route(session, run_id: str):
+    """
+    Routes the session to the shard of the run, unless the database isn't sharded.
+    """
+    # The AsyncSession runs the statements through its synchronous session
+    session = getattr(session, "sync_session", session)
+    if isinstance(session, ShardedSession):
+        session.route(run_id)
+
+
+def bind_arguments(session) -> list[dict]:
+    """
+    The bind_arguments of a statement sent to every shard one after the other, a single one when the session is
+    routed already or the database isn't sharded.
+    """
+    session = getattr(session, "sync_session", session)
+    if not isinstance(session, ShardedSession) or session.shard is not None:
+        return [{}]
+    return [{"shard": shard} for shard in range(len(session.shards))]
+
+
+def replicate_users(shards: Sequence[Engine]):
+    """
+    Copies the users of the directory, the first shard, to the other shards: missing users are inserted, the others
+    updated. Users removed from the directory stay on the other shards, their assignments still pointing to them.
+    """
+    directory, *replicas = shards
+    users = orm.users
+    with directory.connect() as connection:
+        rows = [dict(row._mapping) for row in connection.execute(select(users))]
+    for engine in replicas:
+        with engine.begin() as connection:
+            present = set(connection.execute(select(users.c.id)).scalars())
+            missing = [row for row in rows if row["id"] not in present]
+            if missing:
+                connection.execute(users.insert(), missing)
+            changed = [{"user_id": row["id"], **row} for row in rows if row["id"] in present]
+            if changed:
+                connection.execute(users.update().where(users.c.id == bindparam("user_id")), changed)
@@ -0,0 +1,118 @@
+"""
+Composition root: the message bus of the process and the pool running background jobs are built here, from the
+settings, with the dependencies they need, rather than by the entrypoints or the services.
+https://www.cosmicpython.com/book/chapter_13_dependency_injection.html
+
+Like the engines of adapters.database, both are built on first use and shut down with the application. Validation
+jobs are persisted: those interrupted by a shutdown are resumed by resume_validations() on the next start.
+
+validate_many() fans runs out across a pool of processes instead, for batches of runs validated in memory, which is
+CPU bound: each process builds its own engine, nothing is shared with the parent but the settings.
+"""
+
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterable, Optional
+
+from src.staffoptimizer.adapters import database, orm, sharding
+from src.staffoptimizer.config import Settings, get_settings
+from src.staffoptimizer.service_layer import messagebus, services, unit_of_work
+
+logger = logging.getLogger(__name__)
+
+_bus = None  # type: Optional[messagebus.MessageBus]
+_jobs = None  # type: Optional[ThreadPoolExecutor]
+_stopping = threading.Event()
+
+
+def bus() -> messagebus.MessageBus:
+    global _bus
+    if _bus is None:
+        settings = get_settings()
+        # Handlers get a unit of work of their own, on the engine shared by the whole process
+        _bus = messagebus.MessageBus(
+            unit_of_work.SQLAlchemyUnitOfWork,
+            workers=settings.event_workers,
+            max_pending=settings.event_max_pending,
+        )
+    return _bus
+
+
+def submit_validation(job_id: str):
+    """
+    Runs a validation job on the pool. Threads are enough: the work is done by the database, which releases the GIL
+    while it runs the UPDATE statements.
+    """
+    global _jobs
+    if _jobs is None:
+        _jobs = ThreadPoolExecutor(get_settings().job_workers, thread_name_prefix="jobs")
+    _jobs.submit(_run_validation, job_id)
+
+
+def _run_validation(job_id: str):
+    try:
+        uow = unit_of_work.SQLAlchemyUnitOfWork(bus=bus())
+        services.run_validation(job_id, uow, get_settings().validation_chunk_size, stopping=_stopping)
+    except Exception:
+        # The job is marked as failed, the pool would otherwise keep the exception to itself
+        logger.exception("Validation job %s failed", job_id)
+
+
+def resume_validations():
+    for job_id in services.pending_validations(unit_of_work.SQLAlchemyUnitOfWork()):
+        submit_validation(job_id)
+
+
+def replicate_users():
+    """
+    Copies the users of the directory to the other shards, once users were added or changed, see adapters.sharding.
+    Nothing to do without shards.
+    """
+    sharding.replicate_users(database.shards())
+
+
+def validate_many(
+    run_ids: Iterable[str], in_database: bool = False, processes: int = None, settings: Settings = None
+) -> dict[str, Optional[str]]:
+    """
+    Validates the runs on a pool of processes, see services.validate_many. Processes are spawned rather than forked:
+    a forked process would inherit the connections opened by the parent.
+    """
+    settings = settings or get_settings()
+    processes = processes or settings.validation_processes or os.cpu_count()
+    with ProcessPoolExecutor(
+        processes, mp_context=multiprocessing.get_context("spawn"), initializer=_start_worker, initargs=(settings,)
+    ) as pool:
+        return services.validate_many(run_ids, _worker_uow, pool, in_database)
+
+
+def _start_worker(settings: Settings):
+    global _bus
+    orm.start_mappers()
+    # Each run is validated once: caching its aggregate would only hold memory
+    database.configure(settings.copy(update={"aggregate_cache_max_tasks": 0}))
+    # The process is the unit of parallelism already, handlers run right after the commit of the run
+    _bus = messagebus.MessageBus(unit_of_work.SQLAlchemyUnitOfWork, workers=0)
+
+
+def _worker_uow() -> unit_of_work.SQLAlchemyUnitOfWork:
+    return unit_of_work.SQLAlchemyUnitOfWork(bus=bus())
+
+
+def shutdown():
+    """
+    Running jobs stop after their current chunk, then handlers still queued are done.
+    """
+    global _bus, _jobs
+    if _jobs is not None:
+        _stopping.set()
+        _jobs.shutdown(wait=True, cancel_futures=True)
+        _jobs = None
+        _stopping.clear()
+    if _bus is not None:
+        _bus.shutdown()
+        _bus = None
@@ -0,0 +1,70 @@
+"""
+Settings of the application, read from the environment (prefixed by STAFFOPTIMIZER_) or from a .env file.
+https://pydantic-docs.helpmanual.io/usage/settings/
+"""
+
+
+from functools import lru_cache
+from typing import Optional
+
+from pydantic import BaseSettings
+
+
+class Settings(BaseSettings):
+    database_url: str = "sqlite:///staffoptimizer.sqlite"
+    # Derived from database_url when not set, e.g. sqlite+aiosqlite:// for sqlite://
+    async_database_url: Optional[str] = None
+
+    # Runs spread over several databases by a hash of their run_id, see adapters.sharding, instead of database_url.
+    # The first one holds the users, copied to the others. Given as a JSON list, e.g. ["sqlite:///a.sqlite", ...]
+    shard_urls: list[str] = []
+
+    # Connections kept open by the pool, and how many more can be opened under load
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30
+    # Checks a connection is alive before handing it over, at the cost of a round trip
+    pool_pre_ping: bool = True
+    pool_recycle: int = 3600
+
+    # https://www.sqlite.org/pragma.html
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 30_000
+
+    # Endpoints of async_router rather than those of router. Off by default: the synchronous endpoints served more
+    # requests, with a lower tail latency, under benchmarks.bench_concurrency.
+    async_endpoints: bool = False
+
+    # Statements, timings and rows of the units of work, exposed at /metrics and in the Server-Timing header
+    # by the application. Off by default: recording costs a few listeners per statement.
+    metrics_enabled: bool = False
+
+    # Group commit, see adapters.group_commit: units of work changing a run within the window share a single commit,
+    # up to group_commit_max_units of them. Only the synchronous endpoints use it, asynchronous units of work
+    # committing on their own. 0 disables it, each unit of work committing on its own.
+    group_commit_window_ms: float = 0
+    group_commit_max_units: int = 64
+
+    # Tasks held in memory by the cache of aggregates, a hydrated task taking a few kilobytes. 0 disables the cache.
+    aggregate_cache_max_tasks: int = 100_000
+
+    # Threads running the handlers of the domain events, and how many handlers may wait or run before publishing
+    # blocks the writers
+    event_workers: int = 4
+    event_max_pending: int = 1000
+
+    # Validations run in the background: threads running them, and tasks validated per commit
+    job_workers: int = 2
+    validation_chunk_size: int = 10_000
+    # Processes validating runs side by side, see bootstrap.validate_many. One per CPU when not set.
+    validation_processes: Optional[int] = None
+
+    class Config:
+        env_prefix = "STAFFOPTIMIZER_"
+        env_file = ".env"
+
+
+@lru_cache()
+def get_settings() -> Settings:
+    return Settings()
@@ -0,0 +1,40 @@
+"""
+Domain events: facts about what happened to a run, recorded by the StaffOptimizer aggregate while a service changes
+it. Once the unit of work has committed, they are handed over to the message bus, which runs whatever has to follow,
+e.g. recomputing a summary, without the service having to know about it, nor the request having to wait for it.
+https://www.cosmicpython.com/book/chapter_08_events_and_message_bus.html
+
+Events are plain data, named in the past tense.
+"""
+
+
+from dataclasses import dataclass
+from typing import Optional
+
+
+class Event:
+    pass
+
+
+@dataclass(frozen=True)
+class TaskAdded(Event):
+    run_id: str
+    reference: str
+    status: int
+    team: Optional[str]
+
+
+@dataclass(frozen=True)
+class TaskAssigned(Event):
+    run_id: str
+    reference: str
+    editor_id: str
+
+
+@dataclass(frozen=True)
+class RunValidated(Event):
+    run_id: str
+    staffed: int
+    unallocated: int
+    # Only the tasks changed since the last validation were validated, and counted
+    incremental: bool = False
@@ -19,11 +19,18 @@ naturally inside a stateful model class. Instead, a stateless class or function
 """
 
 
-from enum import Enum
-from typing import Optional
+from collections import defaultdict
+from enum import IntEnum
+from typing import Iterable, Optional
 
+from src.staffoptimizer.domain import events
+
+
+class Status(IntEnum):
+    """
+    Stored as the int it stands for, and compared as one: a task loaded with status 2 is in REVIEW_STAFFING.
+    """
 
-class Status(Enum):
     READY_FOR_STAFFING = 1
     REVIEW_STAFFING = 2
     READY_TO_EDIT = 3
@@ -53,20 +60,76 @@ class EditorSupervisor(User):
 
 
 class Editor(User):
-    def __init__(self, name: str, editor_id: str):
+    def __init__(self, name: str, editor_id: str, team: Optional[str] = None, capacity: int = 1):
         super().__init__(name)
         # Next step here : implement Value Object & Entity pattern
         # This will help to better identify model objects.
         # A good approach when dealing with Entities is to get an identifier close to the real identification of the
         # object in the domain. For instance : registration_number (matricule)
         self.editor_id = editor_id
+        self.team = team
+        # Number of tasks the editor can handle within a StaffOptimizer run
+        self.capacity = capacity
+
+
+class Assignments:
+    """
+    The users assigned to a task. The number of editors among them is maintained on every add/remove, so that
+    staffed and unallocated don't have to scan the assignments.
+
+    Being the collection class of the relationship, it is also filled through add() when the ORM loads a task:
+    the count is rebuilt on hydration without the model knowing about it.
+
+    A task has one or two users at most, and a run hundreds of thousands of tasks: they are kept in a tuple rather
+    than a set, a set taking 216 bytes even empty. No __slots__ here: the ORM instruments the class with a
+    _sa_adapter class attribute, set on each instance, which a slot of the same name can't hold.
+    """
+
+    __emulates__ = set
+
+    def __init__(self, users: Iterable[User] = ()):
+        self._users = ()  # type: tuple[User, ...]
+        self.editors = 0
+        for user in users:
+            self.add(user)
+
+    def add(self, user: User):
+        if user not in self._users:
+            self._users += (user,)
+            self.editors += isinstance(user, Editor)
+
+    def remove(self, user: User):
+        if user not in self._users:
+            raise KeyError(user)
+        self._users = tuple(u for u in self._users if u is not user)
+        self.editors -= isinstance(user, Editor)
+
+    def discard(self, user: User):
+        # Not delegating to remove(): once instrumented by the ORM, both would fire a remove event
+        if user in self._users:
+            self._users = tuple(u for u in self._users if u is not user)
+            self.editors -= isinstance(user, Editor)
+
+    def __iter__(self):
+        return iter(self._users)
+
+    def __len__(self):
+        return len(self._users)
+
+    def __contains__(self, user):
+        return user in self._users
 
 
 class Task:
+    # Mapped attributes live in __dict__, which the ORM needs, as well as weak references. _tasks, the collection of
+    # the StaffOptimizer holding this task, told about every status or team change, doesn't: as a slot, setting it
+    # on a loaded task doesn't grow the __dict__ filled by the ORM. It is only set once the task joins a collection.
+    __slots__ = ("_tasks", "__dict__", "__weakref__")
+
     def __init__(
         self,
         ref: str,  # title is the reference ATM
-        status: str,
+        status: int,
         team: str,
         run_id: Optional[str] = None,
     ):
@@ -74,20 +137,48 @@ class Task:
         self.status = status
         self.team = team
         self.run_id = run_id
-        self._assignments = set()  # type: set[User]
+        self._assignments = Assignments()
+        # Whether the status or the assignments changed since the task was last validated, see
+        # StaffOptimizer.validate
+        self.needs_validation = True
+
+    @property
+    def status(self):
+        return self._status
+
+    @status.setter
+    def status(self, status):
+        previous, self._status = getattr(self, "_status", None), status
+        if status != previous:
+            self.needs_validation = True
+        tasks = getattr(self, "_tasks", None)
+        if tasks is not None:
+            tasks.reindex(self, "status", previous)
+
+    @property
+    def team(self):
+        return self._team
+
+    @team.setter
+    def team(self, team):
+        previous, self._team = getattr(self, "_team", None), team
+        tasks = getattr(self, "_tasks", None)
+        if tasks is not None:
+            tasks.reindex(self, "team", previous)
 
     def assign(self, user: User):
-        self._assignments.add(user)
+        if user not in self._assignments:
+            self._assignments.add(user)
+            self.needs_validation = True
 
     def unassign(self, user: User):
         if user in self._assignments:
             self._assignments.remove(user)
+            self.needs_validation = True
 
     @property
     def staffed(self):
-        return self.status > Status.READY_FOR_STAFFING.value and any(
-            isinstance(user, Editor) for user in self._assignments
-        )
+        return self.status > Status.READY_FOR_STAFFING.value and self._assignments.editors > 0
 
     @property
     def unallocated(self):
@@ -99,28 +190,168 @@ class Task:
         Dedicated meeting where all these actors sit around the same table to discuss about
         it is crucial !
         """
-        return self.status > Status.READY_FOR_STAFFING.value and not any(
-            isinstance(user, Editor) for user in self._assignments
-        )
+        return self.status > Status.READY_FOR_STAFFING.value and self._assignments.editors == 0
+
+    @property
+    def needs_editor(self):
+        return self._assignments.editors == 0
 
     @property
     def computed_by_so(self):
         return self.run_id is not None
 
 
+class Tasks:
+    """
+    The tasks of a StaffOptimizer, indexed by reference, status and team so that finding a task never means
+    scanning the whole run. A run may hold tens of thousands of tasks.
+
+    SQLAlchemy accepts any class exposing append/remove/__iter__ as a relationship collection, so the model doesn't
+    need to know about the ORM to be loaded into it.
+    https://docs.sqlalchemy.org/en/14/orm/collections.html#custom-collection-implementations
+    """
+
+    __emulates__ = list
+
+    def __init__(self, tasks: Iterable[Task] = ()):
+        self._by_reference = {}  # type: dict[str, Task]
+        # Dicts are used as insertion-ordered sets
+        self._indexes = {
+            "status": defaultdict(dict),
+            "team": defaultdict(dict),
+        }  # type: dict[str, dict[object, dict[Task, None]]]
+        for task in tasks:
+            self.append(task)
+
+    def append(self, task: Task):
+        if task.reference in self._by_reference:
+            raise ValueError(f"Duplicate task reference {task.reference}")
+        self._by_reference[task.reference] = task
+        for attribute, index in self._indexes.items():
+            index[getattr(task, attribute)][task] = None
+        task._tasks = self
+
+    def extend(self, tasks: Iterable[Task]):
+        for task in tasks:
+            self.append(task)
+
+    def remove(self, task: Task):
+        del self._by_reference[task.reference]
+        for attribute, index in self._indexes.items():
+            self._discard(index, getattr(task, attribute), task)
+        task._tasks = None
+
+    def reindex(self, task: Task, attribute: str, previous):
+        index = self._indexes[attribute]
+        self._discard(index, previous, task)
+        index[getattr(task, attribute)][task] = None
+
+    @staticmethod
+    def _discard(index, key, task: Task):
+        bucket = index.get(key)
+        if bucket is not None:
+            bucket.pop(task, None)
+            if not bucket:
+                del index[key]
+
+    def get(self, reference: str) -> Optional[Task]:
+        return self._by_reference.get(reference)
+
+    def statuses(self) -> list:
+        return list(self._indexes["status"])
+
+    def with_status(self, status) -> list[Task]:
+        return list(self._indexes["status"].get(status, ()))
+
+    def in_team(self, team: str) -> list[Task]:
+        return list(self._indexes["team"].get(team, ()))
+
+    def __iter__(self):
+        return iter(list(self._by_reference.values()))
+
+    def __len__(self):
+        return len(self._by_reference)
+
+    def __contains__(self, task):
+        return self._by_reference.get(getattr(task, "reference", None)) is task
+
+
 class StaffOptimizer:
-    def __init__(self, run_id: str, tasks: list[Task]):
+    """
+    The aggregate root of a run: its tasks are only changed through it, so that it records the events of the run,
+    tasks included. Collecting the events of each task would mean walking the whole run at every commit.
+    """
+
+    def __init__(self, run_id: str, tasks: list[Task], version_number: int = 0):
         self.run_id = run_id
-        self.tasks = tasks
+        self.tasks = Tasks(tasks)
+        # Incremented each time the run is changed, see adapters.cache
+        self.version_number = version_number
+        self.events = []  # type: list[events.Event]
+
+    def get_task(self, reference: str) -> Optional[Task]:
+        return self.tasks.get(reference)
+
+    def add_task(self, task: Task):
+        self.tasks.append(task)
+        self.events.append(events.TaskAdded(self.run_id, task.reference, task.status, task.team))
+
+    def added_in_bulk(self, tasks: Iterable[Task]):
+        """
+        Tasks inserted by the repository without going through the tasks collection, which isn't loaded.
+        """
+        self.events.extend(events.TaskAdded(self.run_id, t.reference, t.status, t.team) for t in tasks)
 
     def assign(self, editor: Editor, task: Task):
         task.assign(editor)
+        self.events.append(events.TaskAssigned(self.run_id, task.reference, editor.editor_id))
         return task.reference
 
+    def validate(self, incremental: bool = False):
+        """
+        Staffed tasks are ready to be edited, unallocated ones go back to staffing.
+
+        Validating a task twice gives the same status: only the tasks which changed since they were last validated
+        need it again. With incremental, the tasks collection holds only those, see services.validate.
+        """
+        staffed, unallocated = self.staffed_tasks, self.unallocated_tasks
+        for task in staffed:
+            task.status = Status.READY_TO_EDIT.value
+        for task in unallocated:
+            task.status = Status.READY_FOR_STAFFING.value
+        for task in self.tasks:
+            # Setting it anyway would have the ORM check every task of the run for changes when flushing
+            if task.needs_validation:
+                task.needs_validation = False
+        self.validated(len(staffed), len(unallocated), incremental)
+
+    def validated(self, staffed: int, unallocated: int, incremental: bool = False):
+        """
+        Also called once the statuses have been updated by the database instead, see services.validate.
+        """
+        self.events.append(events.RunValidated(self.run_id, staffed, unallocated, incremental))
+
+    def workload(self) -> dict[Editor, int]:
+        """
+        Number of tasks of the run assigned to each editor.
+        """
+        load = defaultdict(int)
+        for task in self.tasks:
+            for user in task._assignments:
+                if isinstance(user, Editor):
+                    load[user] += 1
+        return load
+
+    def _candidate_tasks(self):
+        # Neither staffed nor unallocated can hold for a task still waiting for staffing
+        for status in self.tasks.statuses():
+            if status > Status.READY_FOR_STAFFING.value:
+                yield from self.tasks.with_status(status)
+
     @property
     def staffed_tasks(self):
-        return [task for task in self.tasks if task.staffed]
+        return [task for task in self._candidate_tasks() if task.staffed]
 
     @property
     def unallocated_tasks(self):
-        return [task for task in self.tasks if task.unallocated]
+        return [task for task in self._candidate_tasks() if task.unallocated]
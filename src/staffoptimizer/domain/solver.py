@@ -0,0 +1,67 @@
+"""
+Domain service computing the staffing of a StaffOptimizer run: which editor should handle which task.
+
+An allocation is optimal when it staffs as many tasks as the editors' capacity allows and, among those, assigns as
+many tasks as possible to an editor of the same team. This is a min-cost assignment whose cost is 0 within a team
+and 1 across teams. With such costs, no cost matrix nor Hungarian algorithm is needed: filling each team's capacity
+with its own tasks first, then spreading the leftovers over the remaining capacity, reaches the optimum
+(matching within team t staffs min(tasks of t, capacity of t) tasks, and the leftovers min(tasks left, capacity left)).
+It runs in O((tasks + editors) log editors), a run of 10k tasks and 1k editors takes milliseconds.
+
+Within these constraints, a task goes to the editor with the most capacity left, to spread the load.
+"""
+
+
+import heapq
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from src.staffoptimizer.domain.model import Editor, Task
+
+
+def allocate(
+    tasks: Iterable[Task],
+    editors: Iterable[Editor],
+    workload: Optional[dict[Editor, int]] = None,
+) -> list[tuple[Editor, Task]]:
+    """
+    workload is the number of tasks each editor already handles, counted against its capacity.
+    """
+    workload = workload or {}
+    editors = list(editors)
+    remaining = [editor.capacity - workload.get(editor, 0) for editor in editors]
+
+    teams = defaultdict(list)
+    for index, editor in enumerate(editors):
+        if editor.team is not None and remaining[index] > 0:
+            teams[editor.team].append((-remaining[index], editor.editor_id, index))
+    for heap in teams.values():
+        heapq.heapify(heap)
+
+    allocation = []
+    leftovers = []
+    for task in tasks:
+        heap = teams.get(task.team)
+        if heap:
+            allocation.append((editors[_take(heap, remaining)], task))
+        else:
+            leftovers.append(task)
+
+    anyone = [(-left, editors[index].editor_id, index) for index, left in enumerate(remaining) if left > 0]
+    heapq.heapify(anyone)
+    for task in leftovers:
+        if not anyone:
+            break
+        allocation.append((editors[_take(anyone, remaining)], task))
+    return allocation
+
+
+def _take(heap, remaining) -> int:
+    """
+    Pops the editor with the most capacity left, pushing it back while it has some.
+    """
+    _, editor_id, index = heapq.heappop(heap)
+    remaining[index] -= 1
+    if remaining[index] > 0:
+        heapq.heappush(heap, (-remaining[index], editor_id, index))
+    return index
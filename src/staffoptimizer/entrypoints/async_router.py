@@ -0,0 +1,191 @@
+"""
+Asynchronous flavour of the endpoints of router: coroutines awaiting the asynchronous services, so that a request
+waiting for the database doesn't hold one of the threads Starlette runs synchronous endpoints in.
+"""
+
+
+import codecs
+import json
+from typing import AsyncIterable, AsyncIterator, Callable
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+
+from src.staffoptimizer import bootstrap, views
+from src.staffoptimizer.entrypoints.router import (
+    MEDIA_TYPES,
+    AssignmentIn,
+    TaskExport,
+    TaskFormat,
+    TaskIn,
+    _accepted,
+    get_job_runner,
+)
+from src.staffoptimizer.service_layer import async_services, services, unit_of_work
+
+router = APIRouter()
+
+
+def get_uow() -> unit_of_work.AbstractAsyncUnitOfWork:
+    return unit_of_work.AsyncSQLAlchemyUnitOfWork(bus=bootstrap.bus())
+
+
+@router.post("/validate", status_code=status.HTTP_200_OK)
+async def validate_staffing(
+    run_id,
+    background: bool = False,
+    incremental: bool = False,
+    uow: unit_of_work.AbstractAsyncUnitOfWork = Depends(get_uow),
+    run_job: Callable[[str], None] = Depends(get_job_runner),
+):
+    if not background:
+        try:
+            await async_services.validate(run_id, uow, incremental=incremental)
+        except unit_of_work.ConcurrentUpdate as e:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+        return None
+    job_id, created = await async_services.start_validation(run_id, uow)
+    if created:
+        run_job(job_id)
+    return _accepted(job_id)
+
+
+@router.get("/validate/jobs/{job_id}", status_code=status.HTTP_200_OK)
+async def validation_job(job_id: str, uow: unit_of_work.AbstractAsyncUnitOfWork = Depends(get_uow)):
+    job = await views.async_validation_job(job_id, uow)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown job {job_id}")
+    return job
+
+
+@router.post("/tasks", status_code=status.HTTP_201_CREATED)
+async def add_tasks(
+    run_id: str, tasks: list[TaskIn], uow: unit_of_work.AbstractAsyncUnitOfWork = Depends(get_uow)
+):
+    rejected = await async_services.add_tasks(run_id, [(t.ref, t.status, t.team) for t in tasks], uow)
+    return {
+        "run_id": run_id,
+        "added": len(tasks) - len(rejected),
+        "rejected": [
+            {"index": index, "ref": ref, "error": error} for index, ref, error in rejected
+        ],
+    }
+
+
+@router.post("/assignments", status_code=status.HTTP_200_OK)
+async def assign_many(
+    run_id: str, assignments: list[AssignmentIn], uow: unit_of_work.AbstractAsyncUnitOfWork = Depends(get_uow)
+):
+    try:
+        outcomes = await async_services.assign_many(run_id, [(a.editor_id, a.ref) for a in assignments], uow)
+    except services.SORunNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return {
+        "run_id": run_id,
+        "assignments": [
+            {"editor_id": a.editor_id, "ref": a.ref, "error": error} for a, error in zip(assignments, outcomes)
+        ],
+    }
+
+
+@router.post("/optimize", status_code=status.HTTP_200_OK)
+async def optimize(run_id: str, uow: unit_of_work.AbstractAsyncUnitOfWork = Depends(get_uow)):
+    try:
+        allocation = await async_services.optimize(run_id, uow)
+    except services.SORunNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except unit_of_work.ConcurrentUpdate as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {
+        "run_id": run_id,
+        "assignments": [{"editor_id": editor_id, "ref": ref} for editor_id, ref in allocation],
+    }
+
+
+@router.get("/summary", status_code=status.HTTP_200_OK)
+async def run_summary(run_id: str, uow: unit_of_work.AbstractAsyncUnitOfWork = Depends(get_uow)):
+    summary = await views.async_run_summary(run_id, uow)
+    if summary is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No task in run {run_id}")
+    return summary
+
+
+async def _encode(first, tasks, export: TaskExport):
+    if chunk := export.write(first):
+        yield chunk
+    async for task in tasks:
+        if chunk := export.write(task):
+            yield chunk
+    yield export.flush()
+
+
+@router.get("/tasks", status_code=status.HTTP_200_OK)
+async def export_tasks(
+    run_id: str,
+    format: TaskFormat = TaskFormat.ndjson,
+    uow: unit_of_work.AbstractAsyncUnitOfWork = Depends(get_uow),
+):
+    tasks = async_services.export_tasks(run_id, uow)
+    try:
+        first = await tasks.__anext__()
+    except StopAsyncIteration:
+        return StreamingResponse(iter([TaskExport(format).flush()]), media_type=MEDIA_TYPES[format])
+    except services.SORunNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return StreamingResponse(_encode(first, tasks, TaskExport(format)), media_type=MEDIA_TYPES[format])
+
+
+class ProgressResponse(StreamingResponse):
+    """
+    Streamed while the body of the request is still being read. StreamingResponse would meanwhile listen for the
+    client disconnecting, competing with the endpoint for the messages of the request.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def _lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    # A chunk may end in the middle of a line, or even of a UTF-8 character
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in chunks:
+        *lines, pending = (pending + decoder.decode(chunk)).split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    if pending := pending + decoder.decode(b"", final=True):
+        yield pending.rstrip("\r")
+
+
+async def _progress(run_id: str, batches) -> AsyncIterator[str]:
+    imported = rejected = 0
+    try:
+        async for imported, rejected_lines in batches:
+            rejected += len(rejected_lines)
+            yield json.dumps({
+                "imported": imported,
+                "rejected": [{"line": line, "ref": ref, "error": error} for line, ref, error in rejected_lines],
+            }) + "\n"
+    except services.TaskAlreadyExists:
+        # Too late for an HTTP status: the batches before were committed, and already reported
+        yield json.dumps({"error": services.TaskAlreadyExists.__name__}) + "\n"
+    yield json.dumps({"run_id": run_id, "imported": imported, "rejected": rejected}) + "\n"
+
+
+@router.post("/tasks/import", status_code=status.HTTP_200_OK)
+async def import_tasks(
+    run_id: str,
+    request: Request,
+    format: TaskFormat = TaskFormat.csv,
+    uow: unit_of_work.AbstractAsyncUnitOfWork = Depends(get_uow),
+):
+    """
+    The raw body of the request is the file, read as it is received: e.g.
+    curl --data-binary @tasks.csv "localhost:8000/tasks/import?run_id=KB9&format=csv"
+    A line of NDJSON is sent back after each batch: tasks imported so far, and the lines of the batch rejected.
+    Only served asynchronously, the body being read as it comes.
+    """
+    batches = async_services.import_tasks(run_id, _lines(request.stream()), format.value, uow)
+    return ProgressResponse(_progress(run_id, batches), media_type=MEDIA_TYPES[TaskFormat.ndjson])
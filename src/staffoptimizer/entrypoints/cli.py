@@ -0,0 +1,43 @@
+"""
+Command line entrypoint, for what is run in batches rather than requested through the API, e.g. validating every run
+at the end of a planning cycle. Like FastAPI, it only parses its input and calls the services, through bootstrap.
+
+    python -m src.staffoptimizer.entrypoints.cli validate-many KB9 CR7 [--processes 8] [--in-database]
+
+Without run ids, they are read from the standard input, one per line. Prints the outcome of each run, and exits with
+1 when one of them failed.
+
+    python -m src.staffoptimizer.entrypoints.cli replicate-users
+
+Copies the users of the first shard to the others, see adapters.sharding, once users were added or changed.
+"""
+
+
+import argparse
+import sys
+
+from src.staffoptimizer import bootstrap
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog="staffoptimizer")
+    commands = parser.add_subparsers(dest="command", required=True)
+    validate_many = commands.add_parser("validate-many", help="validate runs side by side, on a pool of processes")
+    validate_many.add_argument("run_ids", nargs="*", metavar="run_id")
+    validate_many.add_argument("--processes", type=int, help="one per CPU by default")
+    validate_many.add_argument("--in-database", action="store_true", help="for runs of tens of thousands of tasks")
+    commands.add_parser("replicate-users", help="copy the users of the first shard to the others")
+    arguments = parser.parse_args(argv)
+
+    if arguments.command == "replicate-users":
+        bootstrap.replicate_users()
+        return 0
+    run_ids = arguments.run_ids or [line.strip() for line in sys.stdin if line.strip()]
+    errors = bootstrap.validate_many(run_ids, arguments.in_database, arguments.processes)
+    for run_id, error in errors.items():
+        print(f"{run_id}\tvalidated" if error is None else f"{run_id}\tfailed\t{error}")
+    return int(any(errors.values()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+"""
+Metrics of the units of work, scraped by Prometheus from /metrics, and reported to the client of each request through
+the Server-Timing header, which the network panel of browsers displays.
+https://developer.mozilla.org/en-US/docs/Web/HTTP/Headers/Server-Timing
+"""
+
+
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src.staffoptimizer import bootstrap
+from src.staffoptimizer.adapters import database, metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def expose_metrics():
+    exposed = metrics.expose()
+    cache = database.aggregate_cache()
+    if cache is not None:
+        exposed += "\n".join(cache.expose()) + "\n"
+    exposed += "\n".join(bootstrap.bus().expose()) + "\n"
+    return PlainTextResponse(exposed, media_type="text/plain; version=0.0.4")
+
+
+class ServerTimingMiddleware:
+    """
+    Plain ASGI middleware: adds the header to the response without buffering its body.
+    https://www.starlette.io/middleware/#pure-asgi-middleware
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        finished = metrics.collect()
+
+        async def send_with_server_timing(message):
+            if message["type"] == "http.response.start":
+                header = server_timing(finished, time.perf_counter() - start)
+                message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_server_timing)
+
+
+def server_timing(recorders: list[metrics.Recorder], total: float) -> str:
+    """
+    Durations of the units of work run by the request are summed up, e.g.
+    sql;desc="3 statements";dur=1.204, load;dur=0.870, commit;dur=0.312, rollback;dur=0.011, app;dur=4.518
+    """
+    statements = sum(recorder.statements for recorder in recorders)
+    durations = {}
+    for recorder in recorders:
+        for name, duration in recorder.durations.items():
+            durations[name] = durations.get(name, 0.0) + duration
+    entries = []
+    for name, duration in durations.items():
+        if name == "sql":
+            entries.append(f'sql;desc="{statements} statements";dur={duration * 1000:.3f}')
+        elif name != "total":
+            entries.append(f"{name};dur={duration * 1000:.3f}")
+    entries.append(f"app;dur={total * 1000:.3f}")
+    return ", ".join(entries)
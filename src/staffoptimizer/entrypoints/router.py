@@ -6,16 +6,202 @@ Thin FastAPI endpoints: their only responsibility is doing "web stuff" such as :
 """
 
 
-from fastapi import APIRouter, status
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import csv
+import io
+import json
+from enum import Enum
+from itertools import chain
+from typing import Callable
 
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from src.staffoptimizer import bootstrap, views
 from src.staffoptimizer.service_layer import services, unit_of_work
 
 router = APIRouter()
-get_session = sessionmaker(bind=create_engine("sqlite:///:memory:"))
+
+
+def get_uow() -> unit_of_work.AbstractUnitOfWork:
+    """
+    Injected as a dependency, so that the unit of work can be overridden, e.g. by tests.
+    https://fastapi.tiangolo.com/advanced/testing-dependencies/
+    """
+    return unit_of_work.SQLAlchemyUnitOfWork(bus=bootstrap.bus())
+
+
+def get_job_runner() -> Callable[[str], None]:
+    """
+    Runs a validation job in the background, given its id.
+    """
+    return bootstrap.submit_validation
 
 
 @router.post("/validate", status_code=status.HTTP_200_OK)
-def validate_staffing(run_id):
-    services.validate(run_id, unit_of_work.SQLAlchemyUnitOfWork())
+def validate_staffing(
+    run_id,
+    background: bool = False,
+    incremental: bool = False,
+    uow: unit_of_work.AbstractUnitOfWork = Depends(get_uow),
+    run_job: Callable[[str], None] = Depends(get_job_runner),
+):
+    """
+    With background, the run is validated by a job, for runs too large to be validated within a request: 202 is
+    answered right away, with the id of the job to follow at /validate/jobs/{job_id}. With incremental, only the tasks
+    changed since they were last validated are, see services.validate.
+    """
+    if not background:
+        try:
+            services.validate(run_id, uow, incremental=incremental)
+        except unit_of_work.ConcurrentUpdate as e:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+        return None
+    job_id, created = services.start_validation(run_id, uow)
+    if created:
+        run_job(job_id)
+    return _accepted(job_id)
+
+
+def _accepted(job_id: str) -> JSONResponse:
+    return JSONResponse(
+        {"job_id": job_id}, status_code=status.HTTP_202_ACCEPTED, headers={"Location": f"/validate/jobs/{job_id}"}
+    )
+
+
+@router.get("/validate/jobs/{job_id}", status_code=status.HTTP_200_OK)
+def validation_job(job_id: str, uow: unit_of_work.AbstractUnitOfWork = Depends(get_uow)):
+    job = views.validation_job(job_id, uow)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown job {job_id}")
+    return job
+
+
+class TaskIn(BaseModel):
+    ref: str
+    status: int
+    team: str
+
+
+@router.post("/tasks", status_code=status.HTTP_201_CREATED)
+def add_tasks(run_id: str, tasks: list[TaskIn], uow: unit_of_work.AbstractUnitOfWork = Depends(get_uow)):
+    rejected = services.add_tasks(run_id, [(t.ref, t.status, t.team) for t in tasks], uow)
+    return {
+        "run_id": run_id,
+        "added": len(tasks) - len(rejected),
+        "rejected": [
+            {"index": index, "ref": ref, "error": error} for index, ref, error in rejected
+        ],
+    }
+
+
+class AssignmentIn(BaseModel):
+    editor_id: str
+    ref: str
+
+
+@router.post("/assignments", status_code=status.HTTP_200_OK)
+def assign_many(
+    run_id: str, assignments: list[AssignmentIn], uow: unit_of_work.AbstractUnitOfWork = Depends(get_uow)
+):
+    try:
+        outcomes = services.assign_many(run_id, [(a.editor_id, a.ref) for a in assignments], uow)
+    except services.SORunNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return {
+        "run_id": run_id,
+        "assignments": [
+            {"editor_id": a.editor_id, "ref": a.ref, "error": error} for a, error in zip(assignments, outcomes)
+        ],
+    }
+
+
+@router.post("/optimize", status_code=status.HTTP_200_OK)
+def optimize(run_id: str, uow: unit_of_work.AbstractUnitOfWork = Depends(get_uow)):
+    try:
+        allocation = services.optimize(run_id, uow)
+    except services.SORunNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except unit_of_work.ConcurrentUpdate as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {
+        "run_id": run_id,
+        "assignments": [{"editor_id": editor_id, "ref": ref} for editor_id, ref in allocation],
+    }
+
+
+@router.get("/summary", status_code=status.HTTP_200_OK)
+def run_summary(run_id: str, uow: unit_of_work.AbstractUnitOfWork = Depends(get_uow)):
+    summary = views.run_summary(run_id, uow)
+    if summary is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No task in run {run_id}")
+    return summary
+
+
+class TaskFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+MEDIA_TYPES = {TaskFormat.ndjson: "application/x-ndjson", TaskFormat.csv: "text/csv"}
+
+
+class TaskExport:
+    """
+    Encodes the exported tasks, chunk_size lines at a time: each chunk becomes a message of the response, rather
+    than one message per line.
+    """
+
+    def __init__(self, format: TaskFormat, chunk_size=500):
+        self.format = format
+        self.chunk_size = chunk_size
+        self.buffer = io.StringIO()
+        self.lines = 0
+        self._csv = csv.writer(self.buffer, lineterminator="\n")
+        if format is TaskFormat.csv:
+            self._csv.writerow(["ref", "status", "team", "editor_ids"])
+
+    def write(self, task) -> str:
+        """
+        Returns a chunk once chunk_size lines are buffered, otherwise an empty string.
+        """
+        ref, task_status, team, editor_ids = task
+        if self.format is TaskFormat.csv:
+            self._csv.writerow([ref, task_status, team, ";".join(editor_ids)])
+        else:
+            self.buffer.write(
+                json.dumps({"ref": ref, "status": task_status, "team": team, "editor_ids": editor_ids}) + "\n"
+            )
+        self.lines += 1
+        return self.flush() if self.lines % self.chunk_size == 0 else ""
+
+    def flush(self) -> str:
+        chunk = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return chunk
+
+
+def _encode(tasks, export: TaskExport):
+    for task in tasks:
+        if chunk := export.write(task):
+            yield chunk
+    yield export.flush()
+
+
+@router.get("/tasks", status_code=status.HTTP_200_OK)
+def export_tasks(
+    run_id: str, format: TaskFormat = TaskFormat.ndjson, uow: unit_of_work.AbstractUnitOfWork = Depends(get_uow)
+):
+    """
+    Streamed while read from the database: memory doesn't grow with the size of the run.
+    https://fastapi.tiangolo.com/advanced/custom-response/#streamingresponse
+    """
+    tasks = services.export_tasks(run_id, uow)
+    try:
+        # Pulling the first task opens the unit of work: an unknown run can still be answered with a 404
+        first = next(tasks, None)
+    except services.SORunNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    tasks = chain([first], tasks) if first is not None else iter(())
+    return StreamingResponse(_encode(tasks, TaskExport(format)), media_type=MEDIA_TYPES[format])
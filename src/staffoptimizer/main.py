@@ -1,10 +1,37 @@
 from fastapi import FastAPI
 
-from src.staffoptimizer.adapters import orm
-from src.staffoptimizer.entrypoints.router import router
+from src.staffoptimizer import bootstrap, config
+from src.staffoptimizer.adapters import database, orm
+from src.staffoptimizer.adapters import metrics as uow_metrics
+from src.staffoptimizer.entrypoints import async_router, metrics, router
 
 orm.start_mappers()
 app = FastAPI()
 
-app.include_router(router)
+if config.get_settings().async_endpoints:
+    app.include_router(async_router.router)
+else:
+    app.include_router(router.router)
+    # Only served asynchronously, the body being read as it comes
+    app.add_api_route("/tasks/import", async_router.import_tasks, methods=["POST"])
+if config.get_settings().metrics_enabled:
+    uow_metrics.enable()
+    app.include_router(metrics.router)
+    app.add_middleware(metrics.ServerTimingMiddleware)
 
+
+@app.on_event("startup")
+def build_engines():
+    # Built once, the engines and their pools of connections are reused by every request
+    database.configure(config.get_settings())
+    # A new database file gets its tables, an existing one is migrated
+    database.upgrade_schema()
+    # Validations interrupted by the last shutdown
+    bootstrap.resume_validations()
+
+
+@app.on_event("shutdown")
+async def dispose_engines():
+    # Queued handlers still need the engines
+    bootstrap.shutdown()
+    await database.dispose()
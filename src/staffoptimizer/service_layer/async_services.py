@@ -0,0 +1,238 @@
+"""
+Asynchronous versions of the services, driven by an AbstractAsyncUnitOfWork: while waiting for the database, the
+event loop goes on serving other requests instead of holding a thread.
+
+Only the way data is fetched and committed differs from the synchronous services, the decisions taken on the domain
+model are shared with them.
+"""
+from typing import AsyncIterable, AsyncIterator, Optional
+
+from src.staffoptimizer.domain.model import Status
+
+from . import unit_of_work
+from ..adapters import metrics
+from .services import (
+    HungerStrike,
+    SORunNotFound,
+    TaskAlreadyExists,
+    EditorNotFound,
+    UNIQUE_REFERENCE,
+    _SummaryChanges,
+    _TaskLines,
+    _append_task,
+    _new_lines,
+    _parse_lines,
+    _new_tasks,
+    _assignable_task,
+    _assign_pairs,
+    _apply_solver,
+    _validate_changes,
+    _validate_statuses,
+)
+
+
+@metrics.use_case
+async def add_task(
+    ref: str,
+    status: str,
+    team: str,
+    run_id: Optional[str],
+    uow: unit_of_work.AbstractAsyncUnitOfWork,
+):
+    try:
+        async with uow:
+            so = await uow.so.get_or_create(run_id, profile="add_task", reference=ref)
+            summary = _SummaryChanges()
+            summary.add(_append_task(so, ref, status, team))
+            await uow.so.update_summary(run_id, summary.deltas)
+            await uow.commit()
+    except unit_of_work.IntegrityViolation as e:
+        if e.constraint != UNIQUE_REFERENCE:
+            raise
+        raise TaskAlreadyExists from e
+    return run_id
+
+
+@metrics.use_case
+async def add_tasks(
+    run_id: str,
+    tasks: list[tuple[str, int, str]],
+    uow: unit_of_work.AbstractAsyncUnitOfWork,
+) -> list[tuple[int, str, str]]:
+    try:
+        async with uow:
+            so = await uow.so.get_or_create(run_id, profile="add_tasks")
+            references = await uow.so.references(run_id, among={ref for ref, _, _ in tasks})
+            new_tasks, rejected = _new_tasks(tasks, references)
+            await uow.so.add_tasks(so, new_tasks)
+            so.added_in_bulk(new_tasks)
+            await uow.so.update_summary(run_id, _SummaryChanges(added=new_tasks).deltas)
+            await uow.commit()
+    except unit_of_work.IntegrityViolation as e:
+        if e.constraint != UNIQUE_REFERENCE:
+            raise
+        raise TaskAlreadyExists from e
+    return rejected
+
+
+@metrics.use_case
+async def import_tasks(
+    run_id: str,
+    lines: AsyncIterable[str],
+    format: str,
+    uow: unit_of_work.AbstractAsyncUnitOfWork,
+    batch_size: int = 1000,
+) -> AsyncIterator[tuple[int, list[tuple[int, str, str]]]]:
+    parser = _TaskLines(format)
+    imported = 0
+    async for batch in _batches(_numbered(lines), batch_size):
+        tasks, rejected = _parse_lines(parser, batch)
+        try:
+            async with uow:
+                so = await uow.so.get_or_create(run_id, profile="add_tasks")
+                references = await uow.so.references(run_id, among={ref for _, ref, _, _ in tasks})
+                new_tasks, duplicates = _new_lines(tasks, references)
+                await uow.so.add_tasks(so, new_tasks)
+                so.added_in_bulk(new_tasks)
+                await uow.so.update_summary(run_id, _SummaryChanges(added=new_tasks).deltas)
+                await uow.commit()
+        except unit_of_work.IntegrityViolation as e:
+            if e.constraint != UNIQUE_REFERENCE:
+                raise
+            raise TaskAlreadyExists from e
+        imported += len(new_tasks)
+        yield imported, sorted(rejected + duplicates)
+
+
+async def _numbered(lines: AsyncIterable[str]):
+    number = 0
+    async for line in lines:
+        number += 1
+        yield number, line
+
+
+async def _batches(items: AsyncIterable, size: int):
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@metrics.use_case
+async def assign(
+    editor_id: str,
+    ref: str,
+    run_id: str,
+    uow: unit_of_work.AbstractAsyncUnitOfWork,
+) -> str:
+    async with uow:
+        so = await uow.so.get(run_id, profile="assign", reference=ref)
+        task = _assignable_task(so, run_id, ref)
+        editor = await uow.user.get_editor(editor_id)
+        if editor is None:
+            raise EditorNotFound(f"Invalid reference {editor_id}")
+        summary = _SummaryChanges(changing=[task])
+        taskref = so.assign(editor, task)
+        await uow.so.update_summary(run_id, summary.changed().deltas)
+        await uow.commit()
+    return taskref
+
+
+@metrics.use_case
+async def assign_many(
+    run_id: str,
+    pairs: list[tuple[str, str]],
+    uow: unit_of_work.AbstractAsyncUnitOfWork,
+) -> list[Optional[str]]:
+    async with uow:
+        so = await uow.so.get(run_id, profile="assign_many", references={ref for _, ref in pairs})
+        if so is None:
+            raise SORunNotFound(f"Invalid run_id {run_id}")
+        editors = await uow.user.get_editors({editor_id for editor_id, _ in pairs})
+        summary = _SummaryChanges(changing=so.tasks)
+        outcomes = _assign_pairs(so, editors, pairs)
+        await uow.so.update_summary(run_id, summary.changed().deltas)
+        await uow.commit()
+    return outcomes
+
+
+@metrics.use_case
+async def optimize(run_id: str, uow: unit_of_work.AbstractAsyncUnitOfWork) -> list[tuple[str, str]]:
+    async with uow:
+        so = await uow.so.get(run_id, profile="optimize")
+        if so is None:
+            raise SORunNotFound(f"Invalid run_id {run_id}")
+        editors = await uow.user.list_editors()
+        summary = _SummaryChanges(changing=[task for task in so.tasks if task.needs_editor])
+        assigned = _apply_solver(so, editors)
+        await uow.so.update_summary(run_id, summary.changed().deltas)
+        await uow.commit()
+    return assigned
+
+
+@metrics.use_case
+async def validate(
+    run_id: str, uow: unit_of_work.AbstractAsyncUnitOfWork, in_database: bool = False, incremental: bool = False
+):
+    async with uow:
+        if incremental and not in_database:
+            so = await uow.so.get(run_id, profile="validate_changes")
+            if so is None:
+                raise SORunNotFound(f"Invalid run_id {run_id}")
+            if not await uow.so.has_tasks(run_id):
+                raise HungerStrike("Not a single task to run in the StaffOptimizer")
+            await uow.so.update_summary(run_id, _validate_changes(so))
+        elif in_database:
+            # Only its row, for its version and to record the event
+            so = await uow.so.get(run_id, profile="validate_in_database")
+            if so is None:
+                raise SORunNotFound(f"Invalid run_id {run_id}")
+            if not await uow.so.has_tasks(run_id):
+                raise HungerStrike("Not a single task to run in the StaffOptimizer")
+            so.validated(
+                *await uow.so.update_statuses_in_bulk(
+                    run_id,
+                    staffed_status=Status.READY_TO_EDIT.value,
+                    unallocated_status=Status.READY_FOR_STAFFING.value,
+                )
+            )
+        else:
+            so = await uow.so.get(run_id, profile="validate")
+            if so is None:
+                raise SORunNotFound(f"Invalid run_id {run_id}")
+            _validate_statuses(so)
+        await uow.commit()
+
+    return run_id
+
+
+@metrics.use_case
+async def start_validation(run_id: str, uow: unit_of_work.AbstractAsyncUnitOfWork) -> tuple[str, bool]:
+    try:
+        async with uow:
+            tasks = await uow.so.count_tasks(run_id)
+            if not tasks:
+                raise HungerStrike("Not a single task to run in the StaffOptimizer")
+            if active := await uow.jobs.active(run_id):
+                return active[0].id, False
+            job_id = await uow.jobs.add(run_id, tasks)
+            await uow.commit()
+    except unit_of_work.IntegrityViolation:
+        async with uow:
+            return (await uow.jobs.active(run_id))[0].id, False
+    return job_id, True
+
+
+@metrics.use_case
+async def export_tasks(
+    run_id: str, uow: unit_of_work.AbstractAsyncUnitOfWork
+) -> AsyncIterator[tuple[str, int, str, list[str]]]:
+    async with uow:
+        if await uow.so.get(run_id, profile="export_tasks") is None:
+            raise SORunNotFound(f"Invalid run_id {run_id}")
+        async for task in uow.so.stream_tasks(run_id):
+            yield task
@@ -0,0 +1,28 @@
+"""
+Handlers of the domain events, run by the message bus once the unit of work which recorded the event has committed.
+Each handler gets its own unit of work: what it does is neither part of the transaction of the service, nor of the
+response to the request.
+"""
+
+
+from __future__ import annotations
+
+from src.staffoptimizer.domain import events
+
+from . import unit_of_work
+from ..adapters import metrics
+
+
+@metrics.use_case
+def refresh_summary(event: events.RunValidated, uow: unit_of_work.AbstractUnitOfWork):
+    """
+    Every task of the run may have changed: the summary is recomputed rather than patched. Until then, the summary
+    still shows the run as it was before being validated.
+
+    An incremental validation patches the summary itself, the few tasks it changes being at hand.
+    """
+    if event.incremental:
+        return
+    with uow:
+        uow.so.refresh_summary(event.run_id)
+        uow.commit()
@@ -0,0 +1,120 @@
+"""
+In-process message bus, dispatching the events collected by the units of work to their handlers.
+https://www.cosmicpython.com/book/chapter_09_all_messagebus.html
+
+Handlers run on a bounded pool of worker threads, the request having been answered as soon as the unit of work
+committed. At most max_pending handlers wait or run at once: beyond that, publishing blocks until one of them is done,
+slowing the writers down rather than letting the queue grow without limit (backpressure). With workers=0, handlers
+run right away in the thread publishing the events, e.g. for tests.
+
+A failing handler is logged and counted, it doesn't fail the service, which has committed already.
+"""
+
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
+
+from src.staffoptimizer.domain import events
+
+from . import handlers
+from ..adapters import metrics
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {
+    events.TaskAdded: [],
+    events.TaskAssigned: [],
+    events.RunValidated: [handlers.refresh_summary],
+}  # type: dict[type[events.Event], list[Callable]]
+
+
+class MessageBus:
+    def __init__(self, uow_factory: Callable, handlers: dict = None, workers: int = 4, max_pending: int = 1000):
+        self.uow_factory = uow_factory
+        self.handlers = HANDLERS if handlers is None else handlers
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="messagebus") if workers else None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self.pending = 0
+        self.handled = 0
+        self.failed = 0
+        self.waits = 0
+
+    def publish(self, new_events: Iterable[events.Event], block: bool = True) -> list[tuple]:
+        """
+        Queues the handlers of each event. Without block, nothing waits for a free slot: the (event, handler) pairs
+        left are returned, to be submitted by a thread allowed to block, see AsyncSQLAlchemyUnitOfWork.
+        """
+        calls = [(event, handler) for event in new_events for handler in self.handlers.get(type(event), ())]
+        return self.submit(calls, block)
+
+    def submit(self, calls: list[tuple], block: bool = True) -> list[tuple]:
+        for index, (event, handler) in enumerate(calls):
+            if not self._slots.acquire(blocking=False):
+                if not block:
+                    return calls[index:]
+                with self._lock:
+                    self.waits += 1
+                self._slots.acquire()
+            with self._lock:
+                self.pending += 1
+            if self._executor is None:
+                self._handle(event, handler, time.perf_counter())
+            else:
+                self._executor.submit(self._handle, event, handler, time.perf_counter())
+        return []
+
+    def _handle(self, event: events.Event, handler: Callable, queued_at: float):
+        start = time.perf_counter()
+        failed = False
+        try:
+            handler(event, self.uow_factory())
+        except Exception:
+            failed = True
+            logger.exception("Handling %s with %s failed", event, handler.__name__)
+        finally:
+            if metrics.ENABLED:
+                metrics.HISTOGRAMS["handler_wait"].observe(handler.__name__, start - queued_at)
+                metrics.HISTOGRAMS["handler"].observe(handler.__name__, time.perf_counter() - start)
+            self._slots.release()
+            with self._idle:
+                self.pending -= 1
+                self.handled += 1
+                self.failed += failed
+                self._idle.notify_all()
+
+    def join(self, timeout: float = None) -> bool:
+        """
+        Waits until every handler queued is done, e.g. before reading what they wrote.
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self.pending == 0, timeout)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pending": self.pending, "handled": self.handled, "failed": self.failed, "waits": self.waits}
+
+    def expose(self) -> list[str]:
+        """
+        Statistics in the Prometheus text format, see adapters.metrics.
+        """
+        stats = self.stats()
+        lines = []
+        for name, kind, documentation in (
+            ("pending", "gauge", "Event handlers waiting for a worker or running"),
+            ("handled_total", "counter", "Event handlers run"),
+            ("failed_total", "counter", "Event handlers which raised an exception"),
+            ("waits_total", "counter", "Events published while the bus was full, the publisher waiting for a slot"),
+        ):
+            metric = f"staffoptimizer_messagebus_{name}"
+            value = stats[name.replace("_total", "")]
+            lines += [f"# HELP {metric} {documentation}", f"# TYPE {metric} {kind}", f"{metric} {value}"]
+        return lines
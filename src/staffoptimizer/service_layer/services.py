@@ -14,12 +14,19 @@ Things that could be related to an API, CLI or tests !
 Using primitive data types allows the service layer’s clients (tests and FastAPI) to be decoupled from the model
 layer. If the domain model is refactored, this will have no impact on the orchestration layer.
 """
-from typing import Optional
+import csv
+import inspect
+import json
+import threading
+from concurrent.futures import Executor
+from itertools import islice
+from typing import Callable, Iterable, Iterator, Optional
 
 from src.staffoptimizer.domain.model import Status, StaffOptimizer
 
 from . import unit_of_work
-from ..domain import model
+from ..adapters import metrics
+from ..domain import model, solver
 
 
 class HungerStrike(Exception):
@@ -46,6 +53,14 @@ class EditorNotFound(Exception):
     pass
 
 
+# The uniqueness of a reference within a run, see adapters.orm: other integrity violations aren't duplicated tasks
+UNIQUE_REFERENCE = "uq_tasks_run_id_reference"
+
+class InvalidTask(Exception):
+    pass
+
+
+@metrics.use_case
 def add_task(
     ref: str,
     status: str,
@@ -53,18 +68,86 @@ def add_task(
     run_id: Optional[str],
     uow: unit_of_work.AbstractUnitOfWork,
 ):
-    with uow:
-        so = uow.so.get(run_id)
-        if so is None:
-            so = StaffOptimizer(run_id, tasks=[])
-            uow.so.add(so)
-        if next((t for t in so.tasks if t.reference == ref), None):
-            raise TaskAlreadyExists
-        so.tasks.append(model.Task(ref, status, team))
-        uow.commit()
+    try:
+        with uow:
+            so = uow.so.get_or_create(run_id, profile="add_task", reference=ref)
+            summary = _SummaryChanges()
+            summary.add(_append_task(so, ref, status, team))
+            uow.so.update_summary(run_id, summary.deltas)
+            uow.commit()
+    except unit_of_work.IntegrityViolation as e:
+        if e.constraint != UNIQUE_REFERENCE:
+            raise
+        # Another unit of work added the same reference in the meantime
+        raise TaskAlreadyExists from e
     return run_id
 
 
+@metrics.use_case
+def add_tasks(
+    run_id: str,
+    tasks: list[tuple[str, int, str]],
+    uow: unit_of_work.AbstractUnitOfWork,
+) -> list[tuple[int, str, str]]:
+    """
+    Batch counterpart of add_task: one unit of work and one commit for the whole batch.
+    A rejected row doesn't abort the batch, it is reported as (index, reference, error) instead.
+    """
+    try:
+        with uow:
+            so = uow.so.get_or_create(run_id, profile="add_tasks")
+            references = uow.so.references(run_id, among={ref for ref, _, _ in tasks})
+            new_tasks, rejected = _new_tasks(tasks, references)
+            uow.so.add_tasks(so, new_tasks)
+            so.added_in_bulk(new_tasks)
+            uow.so.update_summary(run_id, _SummaryChanges(added=new_tasks).deltas)
+            uow.commit()
+    except unit_of_work.IntegrityViolation as e:
+        if e.constraint != UNIQUE_REFERENCE:
+            raise
+        # Another unit of work added some of these references in the meantime: the whole batch is rolled back
+        raise TaskAlreadyExists from e
+    return rejected
+
+
+@metrics.use_case
+def import_tasks(
+    run_id: str,
+    lines: Iterable[str],
+    format: str,
+    uow: unit_of_work.AbstractUnitOfWork,
+    batch_size: int = 1000,
+) -> Iterator[tuple[int, list[tuple[int, str, str]]]]:
+    """
+    Imports the tasks of an upload, e.g. a CSV file with a ref,status,team header, or NDJSON: a JSON object per line.
+    Lines are consumed batch_size at a time, each batch being committed by its own unit of work, so that neither
+    the file nor the run has to fit in memory.
+
+    Yields after each batch the number of tasks imported so far, and the lines of the batch which were rejected
+    as (line number, reference, error), numbered from 1.
+    """
+    parser = _TaskLines(format)
+    imported = 0
+    for batch in _batches(enumerate(lines, 1), batch_size):
+        tasks, rejected = _parse_lines(parser, batch)
+        try:
+            with uow:
+                so = uow.so.get_or_create(run_id, profile="add_tasks")
+                references = uow.so.references(run_id, among={ref for _, ref, _, _ in tasks})
+                new_tasks, duplicates = _new_lines(tasks, references)
+                uow.so.add_tasks(so, new_tasks)
+                so.added_in_bulk(new_tasks)
+                uow.so.update_summary(run_id, _SummaryChanges(added=new_tasks).deltas)
+                uow.commit()
+        except unit_of_work.IntegrityViolation as e:
+            if e.constraint != UNIQUE_REFERENCE:
+                raise
+            raise TaskAlreadyExists from e
+        imported += len(new_tasks)
+        yield imported, sorted(rejected + duplicates)
+
+
+@metrics.use_case
 def assign(
     editor_id: str,
     ref: str,
@@ -72,34 +155,407 @@ def assign(
     uow: unit_of_work.AbstractUnitOfWork,
 ) -> str:
     with uow:
-        so = uow.so.get(run_id)
-        if so is None:
-            raise SORunNotFound(f"Invalid run_id {run_id}")
-        task = next((t for t in so.tasks if t.reference == ref), None)
-        if task is None:
-            raise TaskNotFound(f"Invalid reference {ref}")
-        if task.staffed:
-            raise TaskAlreadyStaffed
+        so = uow.so.get(run_id, profile="assign", reference=ref)
+        task = _assignable_task(so, run_id, ref)
         # TODO: Is it really the proper way to do this ?
         editor = uow.user.get_editor(editor_id)
         if editor is None:
             raise EditorNotFound(f"Invalid reference {editor_id}")
+        summary = _SummaryChanges(changing=[task])
         taskref = so.assign(editor, task)
+        uow.so.update_summary(run_id, summary.changed().deltas)
         uow.commit()
     return taskref
 
 
-def validate(run_id: str, uow: unit_of_work.AbstractUnitOfWork):
+@metrics.use_case
+def assign_many(
+    run_id: str,
+    pairs: list[tuple[str, str]],
+    uow: unit_of_work.AbstractUnitOfWork,
+) -> list[Optional[str]]:
+    """
+    Batch counterpart of assign, for the (editor_id, reference) pairs of a staffing run: editors are resolved at
+    once and every assignment is committed in the same unit of work. The outcome of each pair is returned in order:
+    None when assigned, otherwise the name of the error, which doesn't prevent the other pairs from being assigned.
+    """
+    with uow:
+        so = uow.so.get(run_id, profile="assign_many", references={ref for _, ref in pairs})
+        if so is None:
+            raise SORunNotFound(f"Invalid run_id {run_id}")
+        editors = uow.user.get_editors({editor_id for editor_id, _ in pairs})
+        summary = _SummaryChanges(changing=so.tasks)
+        outcomes = _assign_pairs(so, editors, pairs)
+        uow.so.update_summary(run_id, summary.changed().deltas)
+        uow.commit()
+    return outcomes
+
+
+@metrics.use_case
+def optimize(run_id: str, uow: unit_of_work.AbstractUnitOfWork) -> list[tuple[str, str]]:
+    """
+    Staffs the tasks of the run lacking an editor, as computed by the solver, then hands them over for review.
+    Returns the (editor_id, reference) pairs assigned.
+    """
+    with uow:
+        so = uow.so.get(run_id, profile="optimize")
+        if so is None:
+            raise SORunNotFound(f"Invalid run_id {run_id}")
+        summary = _SummaryChanges(changing=[task for task in so.tasks if task.needs_editor])
+        assigned = _apply_solver(so, uow.user.list_editors())
+        uow.so.update_summary(run_id, summary.changed().deltas)
+        uow.commit()
+    return assigned
+
+
+@metrics.use_case
+def validate(
+    run_id: str, uow: unit_of_work.AbstractUnitOfWork, in_database: bool = False, incremental: bool = False
+):
+    """
+    With in_database, statuses are computed and updated by the database instead of hydrating the whole run:
+    meant for runs of tens of thousands of tasks. With incremental, only the tasks whose status or assignments
+    changed since they were last validated are loaded and validated: meant for runs validated again and again. Every
+    mode gives the same statuses, in_database validating the whole run, and raises the same errors: SORunNotFound for
+    an unknown run, HungerStrike for a run without a single task.
+    """
+    with uow:
+        if incremental and not in_database:
+            so = uow.so.get(run_id, profile="validate_changes")
+            if so is None:
+                raise SORunNotFound(f"Invalid run_id {run_id}")
+            # Only the changed tasks are loaded: whether the run has any is asked to the database
+            if not uow.so.has_tasks(run_id):
+                raise HungerStrike("Not a single task to run in the StaffOptimizer")
+            # The summary is patched right away rather than recomputed from the whole run
+            uow.so.update_summary(run_id, _validate_changes(so))
+        elif in_database:
+            # Only its row, for its version and to record the event. Loaded first, to join a group commit
+            so = uow.so.get(run_id, profile="validate_in_database")
+            if so is None:
+                raise SORunNotFound(f"Invalid run_id {run_id}")
+            if not uow.so.has_tasks(run_id):
+                raise HungerStrike("Not a single task to run in the StaffOptimizer")
+            so.validated(
+                *uow.so.update_statuses_in_bulk(
+                    run_id,
+                    staffed_status=Status.READY_TO_EDIT.value,
+                    unallocated_status=Status.READY_FOR_STAFFING.value,
+                )
+            )
+        else:
+            so = uow.so.get(run_id, profile="validate")
+            if so is None:
+                raise SORunNotFound(f"Invalid run_id {run_id}")
+            _validate_statuses(so)
+        uow.commit()
+
+    return run_id
+
+
+def validate_many(
+    run_ids: Iterable[str],
+    uow_factory: Callable[[], unit_of_work.AbstractUnitOfWork],
+    executor: Executor,
+    in_database: bool = False,
+) -> dict[str, Optional[str]]:
+    """
+    Validates each run in its own unit of work, built by uow_factory wherever the executor runs it, e.g. in another
+    process, see bootstrap.validate_many. A run failing doesn't stop the others: returns the error of each run, None
+    for the runs validated.
+    """
+    futures = {
+        run_id: executor.submit(_validate_run, run_id, uow_factory, in_database) for run_id in dict.fromkeys(run_ids)
+    }
+    errors = {}
+    for run_id, future in futures.items():
+        try:
+            future.result()
+            errors[run_id] = None
+        except Exception as e:
+            errors[run_id] = f"{type(e).__name__}: {e}"
+    return errors
+
+
+@metrics.use_case
+def start_validation(run_id: str, uow: unit_of_work.AbstractUnitOfWork) -> tuple[str, bool]:
+    """
+    Queues a validation of the run, to be run in the background by run_validation. A run being validated already
+    isn't queued twice: the job validating it is returned instead. Returns the job id, and whether it is a new job.
+    """
+    try:
+        with uow:
+            tasks = uow.so.count_tasks(run_id)
+            if not tasks:
+                raise HungerStrike("Not a single task to run in the StaffOptimizer")
+            if active := uow.jobs.active(run_id):
+                return active[0].id, False
+            job_id = uow.jobs.add(run_id, tasks)
+            uow.commit()
+    except unit_of_work.IntegrityViolation:
+        # Another request queued a job for the run in the meantime
+        with uow:
+            return uow.jobs.active(run_id)[0].id, False
+    return job_id, True
+
+
+@metrics.use_case
+def run_validation(
+    job_id: str,
+    uow: unit_of_work.AbstractUnitOfWork,
+    chunk_size: int = 10_000,
+    stopping: Optional[threading.Event] = None,
+):
+    """
+    Validates the run of the job in the database, chunk_size tasks at a time, each chunk being committed along with
+    the progress of the job: the run is never locked for long, and a job interrupted, e.g. by a restart, resumes
+    where it stopped. Validating a task twice changes nothing, the chunk being interrupted can be validated again.
+    RunValidated is recorded with the last chunk.
+
+    Once stopping is set, the job stops after the current chunk, still running, to be resumed.
+    """
+    with uow:
+        uow.jobs.update(job_id, status="running")
+        uow.commit()
+    try:
+        while not _validate_chunk(job_id, uow, chunk_size):
+            if stopping is not None and stopping.is_set():
+                return
+    except Exception as e:
+        with uow:
+            uow.jobs.update(job_id, status="failed", error=f"{type(e).__name__}: {e}"[:255])
+            uow.commit()
+        raise
+
+
+@metrics.use_case
+def pending_validations(uow: unit_of_work.AbstractUnitOfWork) -> list[str]:
+    """
+    Jobs queued or running, e.g. when the application stopped, to be run again.
+    """
+    with uow:
+        return [job.id for job in uow.jobs.active()]
+
+
+@metrics.use_case
+def export_tasks(run_id: str, uow: unit_of_work.AbstractUnitOfWork) -> Iterator[tuple[str, int, str, list[str]]]:
+    """
+    Read-only use case, streaming (reference, status, team, editor ids) for each task of the run. The unit of work
+    stays open while the rows are being consumed, SORunNotFound is raised when the first one is asked for.
+    """
     with uow:
-        so = uow.so.get(run_id)
-        if not so.tasks:
-            raise HungerStrike("Not a single task to run in the StaffOptimizer")
+        if uow.so.get(run_id, profile="export_tasks") is None:
+            raise SORunNotFound(f"Invalid run_id {run_id}")
+        yield from uow.so.stream_tasks(run_id)
+
+
+# The decisions below only deal with the domain model: they are shared with the asynchronous services, which
+# only differ in the way data is fetched and committed.
+
+
+def _append_task(so: StaffOptimizer, ref: str, status: str, team: str) -> model.Task:
+    if so.get_task(ref):
+        raise TaskAlreadyExists
+    task = model.Task(ref, status, team)
+    so.add_task(task)
+    return task
+
+
+class _SummaryChanges:
+    """
+    What a service changes to the run_summaries read model, team by team, as (tasks, staffed, unallocated) deltas:
+    the counts of the tasks about to change are taken out, and put back once they have changed. The summary is then
+    patched instead of being recomputed from the whole run.
+    """
+
+    def __init__(self, added=(), changing=()):
+        self.deltas = {}
+        self.changing = list(changing)
+        for task in self.changing:
+            self._count(task, -1)
+        for task in added:
+            self.add(task)
+
+    def add(self, task: model.Task):
+        self._count(task, 1)
+
+    def changed(self) -> "_SummaryChanges":
+        for task in self.changing:
+            self._count(task, 1)
+        return self
+
+    def _count(self, task: model.Task, sign: int):
+        tasks, staffed, unallocated = self.deltas.get(task.team, (0, 0, 0))
+        self.deltas[task.team] = (tasks + sign, staffed + sign * task.staffed, unallocated + sign * task.unallocated)
+
+
+def _new_tasks(tasks: list[tuple[str, int, str]], references: set[str]):
+    new_tasks = []
+    rejected = []
+    for index, (ref, status, team) in enumerate(tasks):
+        if ref in references:
+            rejected.append((index, ref, TaskAlreadyExists.__name__))
+            continue
+        references.add(ref)
+        new_tasks.append(model.Task(ref, status, team))
+    return new_tasks, rejected
+
+
+# Fields expected by an import: the arguments of Task without a default value, i.e. ref, status and team
+TASK_FIELDS = [
+    name
+    for name, parameter in list(inspect.signature(model.Task).parameters.items())
+    if parameter.default is inspect.Parameter.empty
+]
+
+
+class _TaskLines:
+    """
+    Turns the lines of an upload into the arguments of Task. Only one line is looked at at a time: a CSV field can't
+    span several lines.
+    """
 
-        for task in so.staffed_tasks:
-            task.status = Status.READY_TO_EDIT.value
-        for task in so.unallocated_tasks:
-            task.status = Status.READY_FOR_STAFFING.value
+    def __init__(self, format: str):
+        if format not in ("csv", "ndjson"):
+            raise ValueError(f"Unknown format {format}")
+        self.format = format
+        self.header = None
 
+    def parse(self, line: str) -> Optional[tuple[str, int, str]]:
+        """
+        None for the lines without a task: blank lines and the CSV header.
+        """
+        if not line.strip():
+            return None
+        if self.format == "ndjson":
+            try:
+                fields = json.loads(line)
+            except ValueError as e:
+                raise InvalidTask(f"Invalid JSON: {e}")
+            if not isinstance(fields, dict):
+                raise InvalidTask("A JSON object is expected")
+        elif self.header is None:
+            self.header = next(csv.reader([line]))
+            if missing := [name for name in TASK_FIELDS if name not in self.header]:
+                raise InvalidTask(f"Missing columns {', '.join(missing)}")
+            return None
+        else:
+            fields = dict(zip(self.header, next(csv.reader([line]))))
+        return _task_arguments(fields)
+
+
+def _task_arguments(fields: dict) -> tuple[str, int, str]:
+    if missing := [name for name in TASK_FIELDS if fields.get(name) in (None, "")]:
+        raise InvalidTask(f"Missing {', '.join(missing)}")
+    try:
+        status = Status(int(fields["status"])).value
+    except (TypeError, ValueError):
+        # TypeError for a JSON list or object
+        raise InvalidTask(f"Invalid status {fields['status']}")
+    return str(fields["ref"]), status, str(fields["team"])
+
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    items = iter(items)
+    while batch := list(islice(items, size)):
+        yield batch
+
+
+def _parse_lines(parser: _TaskLines, numbered_lines: list[tuple[int, str]]):
+    tasks, rejected = [], []
+    for number, line in numbered_lines:
+        try:
+            arguments = parser.parse(line)
+        except InvalidTask as e:
+            rejected.append((number, None, f"{InvalidTask.__name__}: {e}"))
+            continue
+        if arguments is not None:
+            tasks.append((number, *arguments))
+    return tasks, rejected
+
+
+def _new_lines(tasks: list[tuple[int, str, int, str]], references: set[str]):
+    new_tasks, rejected = _new_tasks([arguments for _, *arguments in tasks], references)
+    return new_tasks, [(tasks[index][0], ref, error) for index, ref, error in rejected]
+
+
+def _assignable_task(so: Optional[StaffOptimizer], run_id: str, ref: str) -> model.Task:
+    if so is None:
+        raise SORunNotFound(f"Invalid run_id {run_id}")
+    task = so.get_task(ref)
+    if task is None:
+        raise TaskNotFound(f"Invalid reference {ref}")
+    if task.staffed:
+        raise TaskAlreadyStaffed
+    return task
+
+
+def _assign_pairs(so: StaffOptimizer, editors: list[model.Editor], pairs: list[tuple[str, str]]):
+    editors = {editor.editor_id: editor for editor in editors}
+    outcomes = []
+    for editor_id, ref in pairs:
+        task = so.get_task(ref)
+        if task is None:
+            outcomes.append(TaskNotFound.__name__)
+        elif task.staffed:
+            outcomes.append(TaskAlreadyStaffed.__name__)
+        elif editor_id not in editors:
+            outcomes.append(EditorNotFound.__name__)
+        else:
+            so.assign(editors[editor_id], task)
+            outcomes.append(None)
+    return outcomes
+
+
+def _apply_solver(so: StaffOptimizer, editors: list[model.Editor]):
+    tasks = [task for task in so.tasks if task.needs_editor]
+    assigned = []
+    for editor, task in solver.allocate(tasks, editors, so.workload()):
+        assigned.append((editor.editor_id, so.assign(editor, task)))
+        task.status = Status.REVIEW_STAFFING.value
+    return assigned
+
+
+def _validate_chunk(job_id: str, uow: unit_of_work.AbstractUnitOfWork, chunk_size: int) -> bool:
+    """
+    Validates the next chunk of the job, True once the whole run is. Looking the job up begins the session: chunks
+    commit on their own, they don't join a group commit.
+    """
+    with uow:
+        job = uow.jobs.get(job_id)
+        # Its row, for its version to be checked and incremented by every chunk
+        so = uow.so.get(job.run_id, profile="validate_in_database")
+        count, last_task_id = uow.so.next_chunk(job.run_id, after=job.last_task_id, size=chunk_size)
+        if not count:
+            so.validated(job.staffed, job.unallocated)
+            uow.jobs.update(job_id, status="done")
+            uow.commit()
+            return True
+        staffed, unallocated = uow.so.update_statuses_in_bulk(
+            job.run_id,
+            staffed_status=Status.READY_TO_EDIT.value,
+            unallocated_status=Status.READY_FOR_STAFFING.value,
+            after=job.last_task_id,
+            upto=last_task_id,
+        )
+        uow.jobs.update(
+            job_id, validated=count, staffed=staffed, unallocated=unallocated, last_task_id=last_task_id
+        )
         uow.commit()
+    return False
+
+
+def _validate_run(run_id: str, uow_factory: Callable[[], unit_of_work.AbstractUnitOfWork], in_database: bool):
+    validate(run_id, uow_factory(), in_database)
+
+
+def _validate_changes(so: StaffOptimizer) -> dict:
+    summary = _SummaryChanges(changing=so.tasks)
+    so.validate(incremental=True)
+    return summary.changed().deltas
+
 
-    return so.run_id
+def _validate_statuses(so: StaffOptimizer):
+    if not so.tasks:
+        raise HungerStrike("Not a single task to run in the StaffOptimizer")
+    so.validate()
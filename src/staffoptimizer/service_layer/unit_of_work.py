@@ -13,10 +13,49 @@ service-layer use cases runs in a single unit of work that succeeds or fails as
 
 from __future__ import annotations
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import asyncio
+from typing import Optional
 
-from src.staffoptimizer.adapters import repository
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+
+from src.staffoptimizer.adapters import database, metrics, orm, repository
+from src.staffoptimizer.domain import events
+from src.staffoptimizer.service_layer import messagebus
+
+
+class IntegrityViolation(Exception):
+    """
+    The database refused the changes of the unit of work, e.g. because of a uniqueness constraint.
+    """
+
+    def __init__(self, message: str, constraint: Optional[str] = None):
+        super().__init__(message)
+        # Name of the uniqueness constraint violated, when known
+        self.constraint = constraint
+
+
+class ConcurrentUpdate(Exception):
+    """
+    Another unit of work rewrote the run since it was loaded: committing would have overwritten its changes. Only
+    validating or optimizing a run rewrites it, appending tasks and assigning editors never raise it.
+    """
+
+
+class GroupCommitFailed(Exception):
+    """
+    The unit of work committed, but the batch it was committed into couldn't be: its changes were lost, along with
+    those of every other unit of work of the batch.
+    """
+
+
+def _translated(exc):
+    # Services shouldn't have to know about SQLAlchemy exceptions
+    if isinstance(exc, IntegrityError):
+        return IntegrityViolation(str(exc.orig), orm.violated_constraint(str(exc.orig)))
+    if isinstance(exc, StaleDataError):
+        return ConcurrentUpdate(str(exc))
+    return None
 
 
 class AbstractUnitOfWork:
@@ -29,6 +68,16 @@ class AbstractUnitOfWork:
     def __exit__(self, *args):
         self.rollback()
 
+    def collect_new_events(self) -> list[events.Event]:
+        """
+        Takes the events recorded by the aggregates the unit of work went through, once committed.
+        """
+        new_events = []
+        for so in self.so.seen:
+            new_events += so.events
+            so.events.clear()
+        return new_events
+
     def commit(self):
         raise NotImplementedError
 
@@ -36,29 +85,160 @@ class AbstractUnitOfWork:
         raise NotImplementedError
 
 
-DEFAULT_SESSION_FACTORY = sessionmaker(bind=create_engine("sqlite:///:memory:"))
-
-
 class SQLAlchemyUnitOfWork(AbstractUnitOfWork):
     """
     A simpler abstraction over the SQLAlchemy Session object has been introduced in order to "narrow" the interface
     between the ORM and our code. This helps to keep us loosely coupled.
     """
-    def __init__(self, session_factory=DEFAULT_SESSION_FACTORY):
+    def __init__(self, session_factory=None, cache=None, bus=None, group=None):
+        # By default, sessions come from the engine shared by the whole process, or are routed to the shard of their
+        # run when the database is sharded, see adapters.sharding, and so do cached aggregates and the group commit
+        if session_factory is None:
+            session_factory, cache = database.session_factory(), database.aggregate_cache()
+            group = database.group_commit()
         self.session_factory = session_factory
+        self.cache = cache
+        # Without a message bus, the handlers of the events run right after the commit, in the thread of the unit of
+        # work, each with a unit of work of its own
+        self.bus = bus
+        # With a group commit, units of work changing a run side by side share a single commit, see
+        # adapters.group_commit
+        self.group = group
 
     def __enter__(self):
-        self.session = self.session_factory()
-        self.so = repository.StaffOptimizerRepository(self.session)
+        self.recorder = metrics.start()
+        self.session, self.batch = self.session_factory(), None
+        if self.cache is not None:
+            # Committed aggregates go back to the cache as they are, rather than expired
+            self.session.expire_on_commit = False
+        self.so = repository.StaffOptimizerRepository(
+            self.session, cache=self.cache, before_writing=self._join if self.group is not None else None
+        )
         self.user = repository.UserRepository(self.session)
+        self.jobs = repository.ValidationJobRepository(self.session)
+        self.committed = False
+        self.events = []
         return super().__enter__()
 
-    def __exit__(self, *args):
-        super().__exit__(*args)
-        self.session.close()
+    def __exit__(self, exc_type, exc, traceback):
+        # Anything done after the commit is rolled back, and the aggregates with it
+        committed = self.committed and not self.session.in_transaction()
+        error = None
+        try:
+            super().__exit__(exc_type, exc, traceback)
+            self.session.close()
+        finally:
+            if self.batch is not None:
+                # Changes are only durable once the whole batch is committed
+                with metrics.timing("commit"):
+                    error = self.group.leave(self.batch, committed)
+        if committed and error is None:
+            self.so.cache_aggregates()
+        metrics.finish(self.recorder)
+        if translated := _translated(exc):
+            raise translated from exc
+        if error is not None and exc is None:
+            raise GroupCommitFailed(str(error)) from error
+        # Handlers only start once the connection of the unit of work is back in the pool
+        if self.events:
+            bus = self.bus or messagebus.MessageBus(
+                lambda: SQLAlchemyUnitOfWork(self.session_factory, cache=self.cache), workers=0
+            )
+            bus.publish(self.events)
+
+    def _join(self, run_id):
+        # Only once, and before the session begins on a connection of its own, otherwise it commits on its own
+        if self.batch is None and not self.session.in_transaction():
+            self.batch = self.group.join(self.session, run_id)
 
     def commit(self):
-        self.session.commit()
+        self.so.increment_versions()
+        with metrics.timing("commit"):
+            self.session.commit()
+        self.committed = True
+        self.events += self.collect_new_events()
 
     def rollback(self):
-        self.session.rollback()
+        with metrics.timing("rollback"):
+            self.session.rollback()
+
+
+class AbstractAsyncUnitOfWork:
+    """
+    Asynchronous flavour of the unit of work, for the services of async_services: I/O is awaited instead of
+    blocking a thread while the database answers.
+    """
+
+    async def __aenter__(self) -> AbstractAsyncUnitOfWork:
+        return self
+
+    async def __aexit__(self, *args):
+        await self.rollback()
+
+    def collect_new_events(self) -> list[events.Event]:
+        return AbstractUnitOfWork.collect_new_events(self)
+
+    async def commit(self):
+        raise NotImplementedError
+
+    async def rollback(self):
+        raise NotImplementedError
+
+
+class AsyncSQLAlchemyUnitOfWork(AbstractAsyncUnitOfWork):
+    """
+    Built on the asyncio extension of SQLAlchemy, aiosqlite being the driver used with SQLite. It never joins a group
+    commit, whose batches block the threads waiting for them, see adapters.group_commit.
+    https://docs.sqlalchemy.org/en/14/orm/extensions/asyncio.html
+    """
+    def __init__(self, session_factory=None, cache=None, bus=None):
+        if session_factory is None:
+            session_factory, cache = database.async_session_factory(), database.aggregate_cache()
+        self.session_factory = session_factory
+        self.cache = cache
+        self.bus = bus
+
+    async def __aenter__(self):
+        self.recorder = metrics.start()
+        self.session = self.session_factory()
+        self.so = repository.AsyncStaffOptimizerRepository(self.session, cache=self.cache)
+        self.user = repository.AsyncUserRepository(self.session)
+        self.jobs = repository.AsyncValidationJobRepository(self.session)
+        self.committed = False
+        self.events = []
+        return await super().__aenter__()
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        committed = self.committed and not self.session.in_transaction()
+        await super().__aexit__(exc_type, exc, traceback)
+        await self.session.close()
+        if committed:
+            self.so.cache_aggregates()
+        metrics.finish(self.recorder)
+        if translated := _translated(exc):
+            raise translated from exc
+        if self.events and self.bus is not None:
+            # Waiting for a free slot of a full bus would block the event loop: only a thread of the default
+            # executor waits for it
+            left = self.bus.publish(self.events, block=False)
+            if left:
+                await asyncio.get_running_loop().run_in_executor(None, self.bus.submit, left)
+        elif self.events:
+            # Handlers are synchronous: they run right after the commit on the synchronous session underneath, which
+            # goes through the asyncio driver as the unit of work did
+            await self.session.run_sync(
+                lambda session: messagebus.MessageBus(
+                    lambda: SQLAlchemyUnitOfWork(lambda: session), workers=0
+                ).publish(self.events)
+            )
+
+    async def commit(self):
+        await self.so.increment_versions()
+        with metrics.timing("commit"):
+            await self.session.commit()
+        self.committed = True
+        self.events += self.collect_new_events()
+
+    async def rollback(self):
+        with metrics.timing("rollback"):
+            await self.session.rollback()
@@ -0,0 +1,82 @@
+"""
+Query side of CQRS (Command-Query Responsibility Segregation): reads don't need the domain model. Its job is to
+enforce the rules of the writes, whereas answering a dashboard only takes a few counts, which hydrating the whole
+StaffOptimizer aggregate would be a costly way to compute.
+
+So the services changing the tasks of a run also patch its rows of a denormalized read model, run_summaries, a
+validated run being recomputed by the handler of RunValidated, and the functions below read it with plain SQL,
+through the unit of work, without ever instantiating a domain object.
+https://www.cosmicpython.com/book/chapter_12_cqrs.html
+"""
+
+
+from typing import Optional
+
+from sqlalchemy import select
+
+from src.staffoptimizer.adapters import metrics, orm, sharding
+from src.staffoptimizer.service_layer import unit_of_work
+
+
+def _summary_query(run_id: str):
+    summaries = orm.run_summaries
+    return (
+        select(summaries.c.team, summaries.c.tasks, summaries.c.staffed, summaries.c.unallocated)
+        .where(summaries.c.run_id == run_id)
+        .order_by(summaries.c.team)
+    )
+
+
+def _as_summary(run_id: str, rows) -> Optional[dict]:
+    teams = [dict(row._mapping) for row in rows]
+    if not teams:
+        return None
+    return {
+        "run_id": run_id,
+        "tasks": sum(team["tasks"] for team in teams),
+        "staffed": sum(team["staffed"] for team in teams),
+        "unallocated": sum(team["unallocated"] for team in teams),
+        "teams": teams,
+    }
+
+
+@metrics.use_case
+def run_summary(run_id: str, uow: unit_of_work.AbstractUnitOfWork) -> Optional[dict]:
+    """
+    Tasks, staffed and unallocated tasks of the run, per team and in total. None for a run without any task.
+    """
+    with uow:
+        sharding.route(uow.session, run_id)
+        return _as_summary(run_id, uow.session.execute(_summary_query(run_id)).all())
+
+
+@metrics.use_case
+async def async_run_summary(run_id: str, uow: unit_of_work.AbstractAsyncUnitOfWork) -> Optional[dict]:
+    async with uow:
+        sharding.route(uow.session, run_id)
+        return _as_summary(run_id, (await uow.session.execute(_summary_query(run_id))).all())
+
+
+def _as_job(row) -> Optional[dict]:
+    if row is None:
+        return None
+    job = dict(row._mapping)
+    job["job_id"] = job.pop("id")
+    del job["last_task_id"]
+    return job
+
+
+@metrics.use_case
+def validation_job(job_id: str, uow: unit_of_work.AbstractUnitOfWork) -> Optional[dict]:
+    """
+    Status and progress of a validation run in the background: tasks validated so far out of the tasks of the run,
+    staffed and unallocated among them. None for an unknown job.
+    """
+    with uow:
+        return _as_job(uow.jobs.get(job_id))
+
+
+@metrics.use_case
+async def async_validation_job(job_id: str, uow: unit_of_work.AbstractAsyncUnitOfWork) -> Optional[dict]:
+    async with uow:
+        return _as_job(await uow.jobs.get(job_id))
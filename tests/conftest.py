@@ -1,5 +1,8 @@
+from contextlib import contextmanager
+
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, clear_mappers
 
 from src.staffoptimizer.adapters.orm import metadata, start_mappers
@@ -7,13 +10,100 @@ from src.staffoptimizer.adapters.orm import metadata, start_mappers
 
 @pytest.fixture
 def in_memory_db():
-    engine = create_engine("sqlite:///:test:")
+    engine = create_engine("sqlite:///:memory:")
     metadata.create_all(engine)
     return engine
 
 
 @pytest.fixture
-def session(in_memory_db):
+def mappers():
     start_mappers()
-    yield sessionmaker(bind=in_memory_db)()
+    yield
     clear_mappers()
+
+
+@pytest.fixture
+def session_factory(in_memory_db, mappers):
+    return sessionmaker(bind=in_memory_db)
+
+
+@pytest.fixture
+def file_db(tmp_path):
+    """
+    Needed as soon as several connections are involved (threads, asyncio): each connection to an in-memory database
+    gets its own empty database.
+    """
+    # Like the engines of adapters.database, connections may be handed over between threads
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'staffoptimizer.sqlite'}", connect_args={"check_same_thread": False}
+    )
+    metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def async_session_factory(file_db, mappers):
+    return sessionmaker(
+        bind=create_async_engine(f"sqlite+aiosqlite:///{file_db.url.database}"),
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+
+
+@pytest.fixture
+def session(session_factory):
+    return session_factory()
+
+
+@pytest.fixture
+def assert_selects(in_memory_db):
+    """
+    Pins the number of SELECT statements sent to the database, e.g.
+    with assert_selects(3):
+        services.validate(...)
+    """
+
+    @contextmanager
+    def assert_selects(expected):
+        selects = []
+
+        def count(conn, cursor, statement, *args):
+            if statement.lstrip().upper().startswith("SELECT"):
+                selects.append(statement)
+
+        event.listen(in_memory_db, "before_cursor_execute", count)
+        try:
+            yield selects
+        finally:
+            event.remove(in_memory_db, "before_cursor_execute", count)
+        assert len(selects) == expected, "\n\n".join(selects)
+
+    return assert_selects
+
+
+@pytest.fixture
+def assigned_run():
+    """
+    Inserts run KB9, whose tasks have no, two and one assignments, through the given session.
+    Returns the tasks as exported, by reference: (reference, status, team, editor ids).
+    """
+
+    def assigned_run(session):
+        session.execute(
+            "INSERT INTO users (id, name, editor_id, role) VALUES "
+            "(1, 'Medhi', 'MB13', 'editor'), (2, 'Fred', 'FLS92', 'editor')"
+        )
+        session.execute("INSERT INTO staffoptimizers (run_id) VALUES ('KB9')")
+        session.execute(
+            "INSERT INTO tasks (id, run_id, reference, status, team) VALUES (1, 'KB9', 'Midgar', 2, 'Kosovo'), "
+            "(2, 'KB9', 'Chocobo farm', 2, 'Kosovo'), (3, 'KB9', 'Nibelheim', 1, NULL)"
+        )
+        session.execute("INSERT INTO assignments (task_id, user_id) VALUES (2, 1), (2, 2), (3, 2)")
+        session.commit()
+        return [
+            ("Chocobo farm", 2, "Kosovo", ["MB13", "FLS92"]),
+            ("Midgar", 2, "Kosovo", []),
+            ("Nibelheim", 1, None, ["FLS92"]),
+        ]
+
+    return assigned_run
@@ -0,0 +1,172 @@
+import importlib
+import json
+import sys
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import clear_mappers, sessionmaker
+
+from src.staffoptimizer import config
+from src.staffoptimizer.adapters import database
+from src.staffoptimizer.entrypoints import async_router, router
+from src.staffoptimizer.service_layer import async_services, services, unit_of_work
+
+
+@pytest.fixture
+def run_job(file_db):
+    # Jobs are run right away, before the response is sent
+    return lambda job_id: services.run_validation(
+        job_id, unit_of_work.SQLAlchemyUnitOfWork(sessionmaker(bind=file_db)), chunk_size=1
+    )
+
+
+@pytest.fixture
+def sync_client(file_db, mappers, run_job):
+    app = FastAPI()
+    app.include_router(router.router)
+    app.dependency_overrides[router.get_uow] = lambda: unit_of_work.SQLAlchemyUnitOfWork(sessionmaker(bind=file_db))
+    app.dependency_overrides[router.get_job_runner] = lambda: run_job
+    return TestClient(app)
+
+
+@pytest.fixture
+def async_client(async_session_factory, run_job):
+    app = FastAPI()
+    app.include_router(async_router.router)
+    app.dependency_overrides[async_router.get_uow] = lambda: unit_of_work.AsyncSQLAlchemyUnitOfWork(
+        async_session_factory
+    )
+    app.dependency_overrides[router.get_job_runner] = lambda: run_job
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("client", ["sync_client", "async_client"])
+def test_add_tasks_then_validate(client, request):
+    client = request.getfixturevalue(client)
+    tasks = [{"ref": "Midgar", "status": 2, "team": "Kosovo"}, {"ref": "Midgar", "status": 2, "team": "Kosovo"}]
+
+    response = client.post("/tasks", params={"run_id": "KB9"}, json=tasks)
+
+    assert response.status_code == 201
+    assert response.json() == {
+        "run_id": "KB9",
+        "added": 1,
+        "rejected": [{"index": 1, "ref": "Midgar", "error": "TaskAlreadyExists"}],
+    }
+    assert client.post("/validate", params={"run_id": "KB9"}).status_code == 200
+    assert client.post("/optimize", params={"run_id": "CR7"}).status_code == 404
+
+
+@pytest.mark.parametrize("client", ["sync_client", "async_client"])
+def test_a_run_rewritten_meanwhile_is_a_conflict(client, request, monkeypatch):
+    client = request.getfixturevalue(client)
+
+    def rewritten(run_id, *args, **kwargs):
+        raise unit_of_work.ConcurrentUpdate(run_id)
+
+    async def async_rewritten(run_id, *args, **kwargs):
+        rewritten(run_id)
+
+    for module, validate in ((services, rewritten), (async_services, async_rewritten)):
+        monkeypatch.setattr(module, "validate", validate)
+        monkeypatch.setattr(module, "optimize", validate)
+
+    assert client.post("/validate", params={"run_id": "KB9"}).status_code == 409
+    assert client.post("/optimize", params={"run_id": "KB9"}).status_code == 409
+
+
+@pytest.mark.parametrize("client", ["sync_client", "async_client"])
+def test_export_tasks(client, request, file_db, assigned_run):
+    client = request.getfixturevalue(client)
+    assigned_run(sessionmaker(bind=file_db)())
+
+    ndjson = client.get("/tasks", params={"run_id": "KB9"})
+    exported_csv = client.get("/tasks", params={"run_id": "KB9", "format": "csv"})
+
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in ndjson.text.splitlines()][0] == {
+        "ref": "Chocobo farm", "status": 2, "team": "Kosovo", "editor_ids": ["MB13", "FLS92"]
+    }
+    assert exported_csv.text.splitlines() == [
+        "ref,status,team,editor_ids",
+        "Chocobo farm,2,Kosovo,MB13;FLS92",
+        "Midgar,2,Kosovo,",
+        "Nibelheim,1,,FLS92",
+    ]
+    assert client.get("/tasks", params={"run_id": "CR7"}).status_code == 404
+
+
+def test_import_tasks_streams_progress(async_client):
+    upload = "ref,status,team\r\n" + "".join(f"Task {i},2,Kosovo\r\n" for i in range(1500)) + "Task 3,2,Kosovo\r\n"
+
+    response = async_client.post("/tasks/import", params={"run_id": "KB9", "format": "csv"}, data=upload.encode())
+
+    assert response.status_code == 200
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        # The header is the first line of the first batch
+        {"imported": 999, "rejected": []},
+        {"imported": 1500, "rejected": [{"line": 1502, "ref": "Task 3", "error": "TaskAlreadyExists"}]},
+        {"run_id": "KB9", "imported": 1500, "rejected": 1},
+    ]
+    assert len(async_client.get("/tasks", params={"run_id": "KB9"}).text.splitlines()) == 1500
+
+
+@pytest.mark.parametrize("client", ["sync_client", "async_client"])
+def test_run_summary(client, request):
+    client = request.getfixturevalue(client)
+    client.post("/tasks", params={"run_id": "KB9"}, json=[{"ref": "Midgar", "status": 2, "team": "Kosovo"}])
+
+    response = client.get("/summary", params={"run_id": "KB9"})
+
+    assert response.json() == {
+        "run_id": "KB9",
+        "tasks": 1,
+        "staffed": 0,
+        "unallocated": 1,
+        "teams": [{"team": "Kosovo", "tasks": 1, "staffed": 0, "unallocated": 1}],
+    }
+    assert client.get("/summary", params={"run_id": "CR7"}).status_code == 404
+
+
+@pytest.mark.parametrize("client", ["sync_client", "async_client"])
+def test_validate_in_the_background(client, request):
+    client = request.getfixturevalue(client)
+    tasks = [{"ref": "Midgar", "status": 2, "team": "Kosovo"}, {"ref": "Chocobo farm", "status": 2, "team": "Kosovo"}]
+    client.post("/tasks", params={"run_id": "KB9"}, json=tasks)
+
+    response = client.post("/validate", params={"run_id": "KB9", "background": True})
+
+    assert response.status_code == 202
+    job = client.get(response.headers["location"]).json()
+    assert job == {
+        "job_id": response.json()["job_id"],
+        "run_id": "KB9",
+        "status": "done",
+        "tasks": 2,
+        "validated": 2,
+        "staffed": 0,
+        "unallocated": 2,
+        "error": None,
+    }
+    assert client.get("/validate/jobs/unknown").status_code == 404
+
+
+def test_the_app_boots_on_an_empty_database_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("STAFFOPTIMIZER_DATABASE_URL", f"sqlite:///{tmp_path / 'new.sqlite'}")
+    config.get_settings.cache_clear()
+    # The engines built by the startup of the app are restored once the test is done
+    for name in ("_session_factory", "_async_session_factory", "_aggregate_cache", "_group_commit", "_engines"):
+        monkeypatch.setattr(database, name, getattr(database, name))
+    # Imported afresh, the app maps the model when imported
+    monkeypatch.delitem(sys.modules, "src.staffoptimizer.main", raising=False)
+    try:
+        main = importlib.import_module("src.staffoptimizer.main")
+        # Entering the client runs the startup hooks, resuming the validations of the previous run
+        with TestClient(main.app) as client:
+            tasks = [{"ref": "Midgar", "status": 2, "team": "Kosovo"}]
+            assert client.post("/tasks", params={"run_id": "KB9"}, json=tasks).status_code == 201
+            assert client.get("/summary", params={"run_id": "KB9"}).json()["tasks"] == 1
+    finally:
+        clear_mappers()
+        config.get_settings.cache_clear()
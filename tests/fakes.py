@@ -0,0 +1,89 @@
+"""
+In-memory fakes of the repositories and of the unit of work, for the tests of the service layer and for the
+benchmarks comparing the services with and without a database, see benchmarks/suite.py.
+https://www.cosmicpython.com/book/chapter_06_uow.html#_fake_unit_of_work_for_testing
+"""
+
+
+from src.staffoptimizer.adapters import repository
+from src.staffoptimizer.domain import model
+from src.staffoptimizer.service_layer import unit_of_work
+
+
+class FakeSORepository(repository.AbstractRepository):
+    def __init__(self, so):
+        self._so = set(so)
+        self.summarized = set()
+
+    @property
+    def seen(self):
+        return self._so
+
+    def add(self, so):
+        self._so.add(so)
+
+    def get(self, run_id, profile=None, **criteria):
+        return next((so for so in self._so if so.run_id == run_id), None)
+
+    def get_or_create(self, run_id, profile=None, **criteria):
+        so = self.get(run_id)
+        if so is None:
+            so = model.StaffOptimizer(run_id, tasks=[])
+            self.add(so)
+        return so
+
+    def references(self, run_id, among=None):
+        so = self.get(run_id)
+        references = {t.reference for t in so.tasks} if so else set()
+        return references if among is None else references & set(among)
+
+    def has_tasks(self, run_id):
+        return bool(self.references(run_id))
+
+    def add_tasks(self, so, tasks):
+        so.tasks.extend(tasks)
+
+    def refresh_summary(self, run_id):
+        self.summarized.add(run_id)
+
+    def update_summary(self, run_id, deltas):
+        self.summarized.add(run_id)
+
+
+class FakeUserRepository(repository.AbstractRepository):
+    def __init__(self, user):
+        self._user = set()
+        # By editor_id, like the unique index of the users table: benchmarks involve thousands of editors
+        self._editors = {}
+        for u in user:
+            self.add(u)
+
+    def add(self, user):
+        self._user.add(user)
+        if isinstance(user, model.Editor):
+            self._editors[user.editor_id] = user
+
+    def get(self, ref):
+        pass
+
+    def get_editor(self, editor_id):
+        return self._editors.get(editor_id)
+
+    def list_editors(self):
+        return list(self._editors.values())
+
+    def get_editors(self, editor_ids):
+        return [self._editors[editor_id] for editor_id in editor_ids if editor_id in self._editors]
+
+
+class FakeUnitOfWork(unit_of_work.AbstractUnitOfWork):
+    def __init__(self):
+        self.so = FakeSORepository([])
+        self.user = FakeUserRepository([])
+        self.committed = False
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
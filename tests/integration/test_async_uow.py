@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+from sqlalchemy.orm import Session, sessionmaker
+
+from src.staffoptimizer.adapters import repository
+from src.staffoptimizer.domain import model
+from src.staffoptimizer.domain.model import Status
+from src.staffoptimizer.service_layer import async_services, messagebus, services, unit_of_work
+
+
+async def add_editors(session_factory, *editors):
+    async with session_factory() as session:
+        session.add_all(editors)
+        await session.commit()
+
+
+async def statuses(session_factory):
+    async with session_factory() as session:
+        return dict((await session.execute("SELECT reference, status FROM tasks")).all())
+
+
+def test_staffing_a_run_asynchronously(async_session_factory):
+    async def scenario():
+        await add_editors(async_session_factory, model.Editor("Medhi", "MB13"))
+        uow = unit_of_work.AsyncSQLAlchemyUnitOfWork(async_session_factory)
+        await async_services.add_task("Midgar", Status.REVIEW_STAFFING.value, "Kosovo", "KB9", uow)
+        rejected = await async_services.add_tasks(
+            "KB9",
+            [("Chocobo farm", Status.REVIEW_STAFFING.value, "Kosovo"), ("Midgar", 2, "Kosovo")],
+            uow,
+        )
+        assert rejected == [(1, "Midgar", "TaskAlreadyExists")]
+        assert await async_services.assign("MB13", "Midgar", "KB9", uow) == "Midgar"
+        with pytest.raises(services.TaskAlreadyStaffed):
+            await async_services.assign("MB13", "Midgar", "KB9", uow)
+        assert await async_services.validate("KB9", uow) == "KB9"
+        return await statuses(async_session_factory)
+
+    assert asyncio.run(scenario()) == {
+        "Midgar": Status.READY_TO_EDIT.value,
+        "Chocobo farm": Status.READY_FOR_STAFFING.value,
+    }
+
+
+def test_optimize_and_validate_in_database_asynchronously(async_session_factory):
+    async def scenario():
+        await add_editors(async_session_factory, model.Editor("Medhi", "MB13", team="Kosovo", capacity=1))
+        uow = unit_of_work.AsyncSQLAlchemyUnitOfWork(async_session_factory)
+        await async_services.add_tasks("KB9", [("Midgar", 1, "Kosovo"), ("Chocobo farm", 1, "Kosovo")], uow)
+        assert await async_services.optimize("KB9", uow) == [("MB13", "Midgar")]
+        assert await async_services.assign_many("KB9", [("MB13", "Nibelheim")], uow) == ["TaskNotFound"]
+        await async_services.validate("KB9", uow, in_database=True)
+        return await statuses(async_session_factory)
+
+    assert asyncio.run(scenario()) == {
+        "Midgar": Status.READY_TO_EDIT.value,
+        "Chocobo farm": Status.READY_FOR_STAFFING.value,
+    }
+
+
+def test_validate_an_unknown_run_asynchronously(async_session_factory):
+    uow = unit_of_work.AsyncSQLAlchemyUnitOfWork(async_session_factory)
+
+    with pytest.raises(services.SORunNotFound):
+        asyncio.run(async_services.validate("KB9", uow))
+
+
+def test_stream_tasks_asynchronously(file_db, async_session_factory, assigned_run):
+    expected = assigned_run(Session(bind=file_db))
+
+    async def scenario():
+        async with async_session_factory() as session:
+            repo = repository.AsyncStaffOptimizerRepository(session)
+            return [task async for task in repo.stream_tasks("KB9", batch_size=1)]
+
+    assert asyncio.run(scenario()) == expected
+
+
+def test_summary_is_refreshed_by_a_worker_once_validated(async_session_factory, file_db):
+    bus = messagebus.MessageBus(lambda: unit_of_work.SQLAlchemyUnitOfWork(sessionmaker(bind=file_db)), workers=2)
+
+    async def scenario():
+        uow = unit_of_work.AsyncSQLAlchemyUnitOfWork(async_session_factory, bus=bus)
+        await async_services.add_tasks("KB9", [("Midgar", Status.REVIEW_STAFFING.value, "Kosovo")], uow)
+        await async_services.validate("KB9", uow)
+
+    asyncio.run(scenario())
+    assert bus.join(timeout=5)
+    bus.shutdown()
+    assert file_db.execute("SELECT team, tasks, staffed, unallocated FROM run_summaries").all() == [
+        ("Kosovo", 1, 0, 0)
+    ]
@@ -0,0 +1,138 @@
+import asyncio
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from src.staffoptimizer.adapters.cache import AggregateCache
+from src.staffoptimizer.domain import model
+from src.staffoptimizer.domain.model import Status
+from src.staffoptimizer.service_layer import async_services, services, unit_of_work
+
+
+def statuses(session_factory):
+    return dict(session_factory().execute("SELECT reference, status FROM tasks").all())
+
+
+def test_validating_again_is_served_by_the_cache(session_factory, assert_selects):
+    cache = AggregateCache(max_tasks=100)
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory, cache=cache)
+    services.add_tasks("KB9", [("Midgar", Status.REVIEW_STAFFING.value, "Kosovo")], uow)
+    services.validate("KB9", uow)
+
+    # The revision of the run, and the users assigned to its tasks
+    with assert_selects(2):
+        services.validate("KB9", uow)
+
+    assert cache.stats()["hits"] == 1
+    assert statuses(session_factory) == {"Midgar": Status.READY_FOR_STAFFING.value}
+
+
+def test_aggregate_changed_elsewhere_is_reloaded(session_factory):
+    cache = AggregateCache(max_tasks=100)
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory, cache=cache)
+    services.add_tasks("KB9", [("Midgar", Status.REVIEW_STAFFING.value, "Kosovo")], uow)
+    services.validate("KB9", uow)
+
+    # As if another process had added a task
+    elsewhere = unit_of_work.SQLAlchemyUnitOfWork(session_factory)
+    services.add_task("Chocobo farm", Status.REVIEW_STAFFING.value, "Kosovo", "KB9", elsewhere)
+    services.validate("KB9", uow)
+
+    assert cache.stats()["stale"] == 1
+    assert statuses(session_factory)["Chocobo farm"] == Status.READY_FOR_STAFFING.value
+
+
+def test_editors_of_a_cached_aggregate_are_up_to_date(session_factory):
+    cache = AggregateCache(max_tasks=100)
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory, cache=cache)
+    session = session_factory()
+    session.add(model.Editor("Medhi", "MB13"))
+    session.commit()
+    services.add_task("Midgar", Status.REVIEW_STAFFING.value, "Kosovo", "KB9", uow)
+    services.assign("MB13", "Midgar", "KB9", uow)
+    services.validate("KB9", uow)
+
+    # Changing a user doesn't change the runs it is assigned to
+    session.execute("UPDATE users SET capacity = 7")
+    session.commit()
+    with uow:
+        so = uow.so.get("KB9", profile="validate")
+        [editor] = so.get_task("Midgar")._assignments
+        capacity = editor.capacity
+
+    assert cache.stats()["hits"] == 1
+    assert capacity == 7
+
+
+def test_concurrent_rewrites_of_a_run_fail_the_commit(file_db, mappers):
+    session_factory = sessionmaker(bind=file_db)
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory)
+    services.add_tasks("KB9", [("Midgar", Status.REVIEW_STAFFING.value, "Kosovo")], uow)
+
+    with pytest.raises(unit_of_work.ConcurrentUpdate):
+        with uow:
+            so = uow.so.get("KB9", profile="validate")
+            services.validate("KB9", unit_of_work.SQLAlchemyUnitOfWork(session_factory))
+            so.get_task("Midgar").status = Status.READY_TO_EDIT.value
+            uow.commit()
+
+    assert statuses(session_factory)["Midgar"] == Status.READY_FOR_STAFFING.value
+
+
+def test_concurrent_appends_to_a_run_are_both_committed(file_db, mappers):
+    session_factory = sessionmaker(bind=file_db)
+    cache = AggregateCache(max_tasks=100)
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory, cache=cache)
+    services.add_tasks("KB9", [("Midgar", Status.REVIEW_STAFFING.value, "Kosovo")], uow)
+    services.validate("KB9", uow)
+
+    with uow:
+        so = uow.so.get("KB9", profile="add_task", reference="Chocobo farm")
+        services.add_task("Gold Saucer", 2, "Kosovo", "KB9", unit_of_work.SQLAlchemyUnitOfWork(session_factory))
+        so.add_task(model.Task("Chocobo farm", 2, "Kosovo"))
+        uow.commit()
+
+    services.validate("KB9", uow)
+    assert statuses(session_factory) == {
+        reference: Status.READY_FOR_STAFFING.value for reference in ("Midgar", "Gold Saucer", "Chocobo farm")
+    }
+
+
+def test_least_recently_used_aggregates_are_evicted():
+    cache = AggregateCache(max_tasks=3)
+    runs = {
+        run_id: model.StaffOptimizer(run_id, [model.Task(f"Task {i}", 2, "Kosovo") for i in range(size)])
+        for run_id, size in (("KB9", 2), ("CR7", 1), ("FF7", 1), ("FF8", 4))
+    }
+    cache.checkin(runs["KB9"], 0)
+    cache.checkin(runs["CR7"], 0)
+    cache.checkin(cache.checkout("KB9", lambda: 0), 0)
+    cache.checkin(runs["FF7"], 0)
+    # Larger than the whole cache
+    cache.checkin(runs["FF8"], 0)
+
+    assert cache.checkout("CR7", lambda: 0) is None
+    assert cache.checkout("FF7", lambda: 1) is None
+    assert cache.checkout("KB9", lambda: 0) is runs["KB9"]
+    assert cache.stats() == {
+        "hits": 2,
+        "misses": 2,
+        "stale": 1,
+        "evictions": 1,
+        "hit_rate": 0.5,
+        "aggregates": 0,
+        "tasks": 0,
+    }
+
+
+def test_cache_is_shared_by_asynchronous_units_of_work(async_session_factory):
+    cache = AggregateCache(max_tasks=100)
+
+    async def scenario():
+        uow = unit_of_work.AsyncSQLAlchemyUnitOfWork(async_session_factory, cache=cache)
+        await async_services.add_tasks("KB9", [("Midgar", Status.REVIEW_STAFFING.value, "Kosovo")], uow)
+        await async_services.validate("KB9", uow)
+        await async_services.validate("KB9", uow)
+
+    asyncio.run(scenario())
+    assert (cache.stats()["hits"], cache.stats()["aggregates"]) == (1, 1)
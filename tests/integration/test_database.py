@@ -0,0 +1,76 @@
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy.pool import QueuePool
+
+from src.staffoptimizer.adapters import database, metrics, sharding
+from src.staffoptimizer.config import Settings
+
+
+def test_file_database_is_pooled_with_pragmas(tmp_path):
+    engine = database.build_engine(
+        Settings(database_url=f"sqlite:///{tmp_path / 'so.sqlite'}", pool_size=3, sqlite_synchronous="OFF")
+    )
+
+    assert isinstance(engine.pool, QueuePool)
+    assert engine.pool.size() == 3
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+        assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 0
+
+
+def test_connections_are_reused(tmp_path):
+    engine = database.build_engine(Settings(database_url=f"sqlite:///{tmp_path / 'so.sqlite'}"))
+    with engine.connect() as connection:
+        first = connection.connection.dbapi_connection
+    with engine.connect() as connection:
+        assert connection.connection.dbapi_connection is first
+
+
+def test_building_an_engine_doesnt_enable_metrics(tmp_path):
+    database.build_engine(Settings(database_url=f"sqlite:///{tmp_path / 'so.sqlite'}", metrics_enabled=True))
+
+    assert not metrics.ENABLED
+
+
+def test_in_memory_database_is_shared_across_threads():
+    engine = database.build_engine(Settings(database_url="sqlite://"))
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE runs (run_id VARCHAR)")
+
+    def insert():
+        with engine.begin() as connection:
+            connection.exec_driver_sql("INSERT INTO runs VALUES ('KB9')")
+
+    thread = threading.Thread(target=insert)
+    thread.start()
+    thread.join()
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT run_id FROM runs").all() == [("KB9",)]
+
+
+def test_async_engine_is_derived_from_the_database_url(tmp_path):
+    engine = database.build_async_engine(Settings(database_url=f"sqlite:///{tmp_path / 'so.sqlite'}"))
+    assert engine.url.drivername == "sqlite+aiosqlite"
+
+    async def journal_mode():
+        async with engine.connect() as connection:
+            return (await connection.exec_driver_sql("PRAGMA journal_mode")).scalar()
+
+    assert asyncio.run(journal_mode()) == "wal"
+
+
+def test_sessions_are_sharded_across_the_shard_urls(tmp_path, monkeypatch):
+    # configure() sets the engines shared by the process: they are restored once the test is done
+    for name in ("_session_factory", "_async_session_factory", "_aggregate_cache", "_group_commit", "_engines"):
+        monkeypatch.setattr(database, name, getattr(database, name))
+    urls = [f"sqlite:///{tmp_path / f'shard{i}.sqlite'}" for i in range(2)]
+    database.configure(Settings(shard_urls=urls, metrics_enabled=False))
+
+    assert [str(engine.url) for engine in database.shards()] == urls
+    assert isinstance(database.session_factory()(), sharding.ShardedSession)
+    assert isinstance(database.async_session_factory()().sync_session, sharding.ShardedSession)
+    asyncio.run(database.dispose())
+    with pytest.raises(ValueError):
+        database.configure(Settings(shard_urls=urls, group_commit_window_ms=2))
@@ -0,0 +1,143 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from src.staffoptimizer.adapters.group_commit import GroupCommit
+from src.staffoptimizer.domain import model
+from src.staffoptimizer.domain.model import Status
+from src.staffoptimizer.service_layer import services, unit_of_work
+
+REVIEW_STAFFING = Status.REVIEW_STAFFING.value
+
+
+def side_by_side(*functions):
+    """
+    Runs the functions in threads of their own, all starting at once, and returns what each returned or raised.
+    """
+    barrier = threading.Barrier(len(functions))
+
+    def run(function):
+        barrier.wait()
+        try:
+            return function()
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(len(functions)) as pool:
+        return list(pool.map(run, functions))
+
+
+def references(engine):
+    with engine.connect() as connection:
+        return set(connection.execute("SELECT reference FROM tasks").scalars())
+
+
+def test_units_of_work_changing_a_run_side_by_side_share_a_commit(file_db, mappers):
+    group = GroupCommit(file_db, window=0.5, max_units=100)
+    commits = []
+    event.listen(file_db, "commit", commits.append)
+
+    def add_task(i):
+        uow = unit_of_work.SQLAlchemyUnitOfWork(sessionmaker(bind=file_db), group=group)
+        return services.add_task(f"Task {i}", REVIEW_STAFFING, "Kosovo", "KB9", uow)
+
+    outcomes = side_by_side(*(lambda i=i: add_task(i) for i in range(8)))
+
+    assert not [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+    assert references(file_db) == {f"Task {i}" for i in range(8)}
+    assert len(commits) == 1
+    assert group.stats() == {"batches": 1, "units": 8, "units_per_batch": 8.0}
+
+
+def test_units_of_work_reading_a_run_dont_wait_for_its_group(file_db, mappers):
+    group = GroupCommit(file_db, window=0.5, max_units=100)
+    session_factory = sessionmaker(bind=file_db)
+    services.add_task("Midgar", REVIEW_STAFFING, "Kosovo", "KB9", unit_of_work.SQLAlchemyUnitOfWork(session_factory))
+    exported = []
+    reader = threading.Thread(
+        target=lambda: exported.extend(
+            services.export_tasks("KB9", unit_of_work.SQLAlchemyUnitOfWork(session_factory, group=group))
+        )
+    )
+
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory, group=group)
+    with uow:
+        # The group of the run is held until the unit of work is done
+        uow.so.get("KB9", profile="assign", reference="Midgar")
+        reader.start()
+        reader.join(timeout=5)
+        assert not reader.is_alive()
+
+    assert exported == [("Midgar", REVIEW_STAFFING, "Kosovo", [])]
+    assert group.stats()["units"] == 1
+
+
+def test_a_failing_unit_of_work_only_loses_its_own_changes(file_db, mappers):
+    group = GroupCommit(file_db, window=0.5, max_units=100)
+    session_factory = sessionmaker(bind=file_db)
+    services.add_task("Midgar", REVIEW_STAFFING, "Kosovo", "KB9", unit_of_work.SQLAlchemyUnitOfWork(session_factory))
+
+    def add_task(reference):
+        uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory, group=group)
+        services.add_task(reference, REVIEW_STAFFING, "Kosovo", "KB9", uow)
+
+    def add_midgar_again():
+        # As if another request had added the task since references were checked
+        uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory, group=group)
+        with uow:
+            so = uow.so.get("KB9", profile="add_tasks")
+            uow.so.add_tasks(so, [model.Task("Midgar", REVIEW_STAFFING, "Kosovo")])
+            uow.commit()
+
+    outcomes = side_by_side(lambda: add_task("Chocobo farm"), add_midgar_again, lambda: add_task("Nibelheim"))
+
+    assert outcomes[0] is None and outcomes[2] is None
+    assert isinstance(outcomes[1], unit_of_work.IntegrityViolation)
+    assert references(file_db) == {"Midgar", "Chocobo farm", "Nibelheim"}
+    assert group.stats()["batches"] == 1
+
+
+def test_every_unit_of_work_of_a_batch_failing_to_commit_fails_whatever_its_run(file_db, mappers):
+    @event.listens_for(file_db, "connect")
+    def enforce_foreign_keys(dbapi_connection, _):
+        dbapi_connection.execute("PRAGMA foreign_keys = ON")
+
+    # Connections opened before the listener don't enforce them
+    file_db.dispose()
+    group = GroupCommit(file_db, window=0.5, max_units=100)
+    session_factory = sessionmaker(bind=file_db)
+
+    def add_task():
+        uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory, group=group)
+        services.add_task("Midgar", REVIEW_STAFFING, "Kosovo", "KB9", uow)
+
+    def assign_unknown_user():
+        uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory, group=group)
+        with uow:
+            # On SQLite, every run shares the group
+            uow.so.get("CR7")
+            # Only checked by the COMMIT of the batch
+            uow.session.execute("PRAGMA defer_foreign_keys = ON")
+            uow.session.execute("INSERT INTO assignments (task_id, user_id) VALUES (1, 999)")
+            uow.commit()
+
+    outcomes = side_by_side(add_task, assign_unknown_user)
+
+    assert all(isinstance(outcome, unit_of_work.GroupCommitFailed) for outcome in outcomes)
+    assert group.stats()["batches"] == 1
+    assert references(file_db) == set()
+    # The next batch gets a connection of its own
+    add_task()
+    assert references(file_db) == {"Midgar"}
+
+
+def test_validating_in_database_joins_the_group(file_db, mappers):
+    group = GroupCommit(file_db, window=0, max_units=100)
+    session_factory = sessionmaker(bind=file_db)
+    services.add_task("Midgar", REVIEW_STAFFING, "Kosovo", "KB9", unit_of_work.SQLAlchemyUnitOfWork(session_factory))
+
+    services.validate("KB9", unit_of_work.SQLAlchemyUnitOfWork(session_factory, group=group), in_database=True)
+
+    assert group.stats()["units"] == 1
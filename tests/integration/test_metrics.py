@@ -0,0 +1,72 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import sessionmaker
+
+from src.staffoptimizer.adapters import metrics
+from src.staffoptimizer.domain.model import Status
+from src.staffoptimizer.entrypoints import metrics as metrics_endpoint, router
+from src.staffoptimizer.service_layer import services, unit_of_work
+
+
+@pytest.fixture
+def instrumented(in_memory_db):
+    metrics.instrument(in_memory_db)
+    metrics.enable()
+    metrics.reset()
+    yield
+    metrics.disable()
+    metrics.reset()
+
+
+def observed(name, use_case):
+    counts, total = metrics.HISTOGRAMS[name]._series[use_case]
+    return sum(counts), total
+
+
+def test_units_of_work_are_recorded_per_use_case(session_factory, instrumented):
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory)
+    services.add_tasks("KB9", [(f"Task {i}", Status.REVIEW_STAFFING.value, "Kosovo") for i in range(3)], uow)
+
+    services.validate("KB9", uow)
+
+    # the run, its tasks and their assignments, an UPDATE for the 3 tasks, and the UPDATEs of the version and the
+    # revision of the run
+    assert observed("statements", "validate") == (1, 6)
+    assert observed("rows_flushed", "validate") == (1, 4)
+    # the summary's DELETE and INSERT, by the handler of RunValidated
+    assert observed("statements", "refresh_summary") == (1, 2)
+    assert observed("handler", "refresh_summary")[0] == 1
+    assert observed("load", "validate")[0] == 1
+    assert observed("commit", "validate")[0] == 1
+    assert observed("total", "add_tasks")[0] == 1
+
+
+def test_nothing_is_recorded_when_disabled(session_factory, instrumented):
+    metrics.disable()
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory)
+
+    services.add_tasks("KB9", [("Midgar", Status.REVIEW_STAFFING.value, "Kosovo")], uow)
+
+    assert metrics.HISTOGRAMS["statements"]._series == {}
+
+
+def test_metrics_are_exposed_with_server_timing(file_db, mappers, instrumented):
+    metrics.instrument(file_db)
+    app = FastAPI()
+    app.include_router(router.router)
+    app.include_router(metrics_endpoint.router)
+    app.add_middleware(metrics_endpoint.ServerTimingMiddleware)
+    app.dependency_overrides[router.get_uow] = lambda: unit_of_work.SQLAlchemyUnitOfWork(sessionmaker(bind=file_db))
+    client = TestClient(app)
+
+    response = client.post("/tasks", params={"run_id": "KB9"}, json=[{"ref": "Midgar", "status": 2, "team": "Kosovo"}])
+
+    assert response.headers["server-timing"].startswith('sql;desc="')
+    assert "commit;dur=" in response.headers["server-timing"]
+    exposed = client.get("/metrics").text
+    assert "# TYPE staffoptimizer_uow_statements histogram" in exposed
+    assert 'staffoptimizer_uow_seconds_count{use_case="add_tasks"} 1' in exposed
+    assert 'staffoptimizer_uow_rows_flushed_bucket{use_case="add_tasks",le="+Inf"} 1' in exposed
+    assert "# TYPE staffoptimizer_aggregate_cache_hits_total counter" in exposed
+    assert "# TYPE staffoptimizer_messagebus_pending gauge" in exposed
@@ -0,0 +1,67 @@
+import pytest
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.exc import IntegrityError
+
+from src.staffoptimizer.adapters import migrations
+
+LEGACY_SCHEMA = [
+    "CREATE TABLE staffoptimizers (run_id VARCHAR(255))",
+    "CREATE TABLE tasks (id INTEGER PRIMARY KEY, run_id VARCHAR(255) REFERENCES staffoptimizer_runs (id),"
+    " reference VARCHAR(255), status VARCHAR(255), team VARCHAR(255))",
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, name VARCHAR(255), editor_id VARCHAR(255),"
+    " csid VARCHAR(255), esid VARCHAR(255))",
+]
+
+
+@pytest.fixture
+def legacy_db():
+    engine = create_engine("sqlite:///:memory:")
+    with engine.begin() as connection:
+        for statement in LEGACY_SCHEMA:
+            connection.exec_driver_sql(statement)
+        connection.exec_driver_sql("INSERT INTO staffoptimizers VALUES ('KB9'), ('KB9')")
+        connection.exec_driver_sql("INSERT INTO tasks VALUES (1, 'KB9', 'Midgar', '2', 'Kosovo')")
+        connection.exec_driver_sql("INSERT INTO users (id, name, editor_id) VALUES (1, 'Medhi', 'MB13')")
+        connection.exec_driver_sql("INSERT INTO users (id, name, csid) VALUES (2, 'Aerith', 'CS1')")
+    return engine
+
+
+def test_upgrade_adds_keys_indexes_and_constraints(legacy_db):
+    migrations.upgrade(legacy_db)
+
+    inspector = inspect(legacy_db)
+    assert inspector.get_pk_constraint("staffoptimizers")["constrained_columns"] == ["run_id"]
+    assert inspector.get_foreign_keys("tasks")[0]["referred_table"] == "staffoptimizers"
+    assert "ix_users_editor_id" in {i["name"] for i in inspector.get_indexes("users")}
+    assert "assignments" in inspector.get_table_names()
+    with legacy_db.connect() as connection:
+        assert connection.exec_driver_sql("SELECT * FROM staffoptimizers").all() == [("KB9", 0, 0)]
+        # Existing tasks are to be validated
+        assert connection.exec_driver_sql("SELECT * FROM tasks").all() == [(1, "KB9", "Midgar", 2, "Kosovo", 1)]
+        assert connection.exec_driver_sql(
+            "SELECT run_id, team, tasks, staffed, unallocated FROM run_summaries"
+        ).all() == [("KB9", "Kosovo", 1, 0, 1)]
+
+
+def test_upgrade_is_idempotent(legacy_db):
+    migrations.upgrade(legacy_db)
+    migrations.upgrade(legacy_db)
+    with legacy_db.connect() as connection:
+        assert connection.exec_driver_sql("SELECT count(*) FROM tasks").scalar() == 1
+
+
+def test_upgrade_refuses_duplicated_references(legacy_db):
+    with legacy_db.begin() as connection:
+        connection.exec_driver_sql("INSERT INTO tasks VALUES (2, 'KB9', 'Midgar', '3', 'Kosovo')")
+    with pytest.raises(IntegrityError):
+        migrations.upgrade(legacy_db)
+    assert inspect(legacy_db).get_pk_constraint("staffoptimizers")["constrained_columns"] == []
+
+
+def test_upgrade_derives_user_roles(legacy_db):
+    migrations.upgrade(legacy_db)
+    with legacy_db.connect() as connection:
+        assert connection.exec_driver_sql("SELECT name, role FROM users ORDER BY id").all() == [
+            ("Medhi", "editor"),
+            ("Aerith", "content_strategist"),
+        ]
@@ -1,45 +1,7 @@
-from src.staffoptimizer.adapters import repository
 from src.staffoptimizer.domain import model
 from src.staffoptimizer.domain.model import Status
-from src.staffoptimizer.service_layer import unit_of_work, services
-
-
-class FakeSORepository(repository.AbstractRepository):
-    def __init__(self, so):
-        self._so = set(so)
-
-    def add(self, so):
-        self._so.add(so)
-
-    def get(self, run_id):
-        return next((so for so in self._so if so.run_id == run_id), None)
-
-
-class FakeUserRepository(repository.AbstractRepository):
-    def __init__(self, user):
-        self._user = set(user)
-
-    def add(self, user):
-        self._user.add(user)
-
-    def get(self, ref):
-        pass
-
-    def get_editor(self, editor_id):
-        return next((user for user in self._user if user.editor_id == editor_id), None)
-
-
-class FakeUnitOfWork(unit_of_work.AbstractUnitOfWork):
-    def __init__(self):
-        self.so = FakeSORepository([])
-        self.user = FakeUserRepository([])
-        self.committed = False
-
-    def commit(self):
-        self.committed = True
-
-    def rollback(self):
-        pass
+from src.staffoptimizer.service_layer import services
+from tests.fakes import FakeUnitOfWork
 
 
 def test_validate_after_so_run():
@@ -0,0 +1,120 @@
+import asyncio
+from itertools import count
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.staffoptimizer import views
+from src.staffoptimizer.adapters import sharding
+from src.staffoptimizer.adapters.orm import metadata
+from src.staffoptimizer.domain import model
+from src.staffoptimizer.domain.model import Status
+from src.staffoptimizer.service_layer import async_services, services, unit_of_work
+
+REVIEW_STAFFING = Status.REVIEW_STAFFING.value
+
+
+@pytest.fixture
+def shards(tmp_path):
+    engines = [
+        create_engine(f"sqlite:///{tmp_path / f'shard{i}.sqlite'}", connect_args={"check_same_thread": False})
+        for i in range(3)
+    ]
+    for engine in engines:
+        metadata.create_all(engine)
+    return engines
+
+
+@pytest.fixture
+def sharded_session_factory(shards, mappers):
+    return sessionmaker(class_=sharding.ShardedSession, shards=shards)
+
+
+def run_on(shard: int, shards=3) -> str:
+    return next(run_id for i in count() if sharding.shard_of(run_id := f"RUN{i}", shards) == shard)
+
+
+def run_ids(engine):
+    with engine.connect() as connection:
+        return set(connection.execute("SELECT run_id FROM tasks").scalars())
+
+
+def add_editor(engine, editor: model.Editor):
+    session = sessionmaker(bind=engine)()
+    session.add(editor)
+    session.commit()
+
+
+def test_each_run_is_written_to_its_own_shard(shards, sharded_session_factory):
+    uow = unit_of_work.SQLAlchemyUnitOfWork(sharded_session_factory)
+    for shard in range(3):
+        services.add_tasks(run_on(shard), [("Midgar", REVIEW_STAFFING, "Kosovo")], uow)
+
+    assert [run_ids(engine) for engine in shards] == [{run_on(0)}, {run_on(1)}, {run_on(2)}]
+    assert views.run_summary(run_on(2), uow)["tasks"] == 1
+
+
+def test_runs_are_staffed_with_the_replicated_users(shards, sharded_session_factory):
+    add_editor(shards[0], model.Editor("Medhi", "MB13"))
+    sharding.replicate_users(shards)
+    uow = unit_of_work.SQLAlchemyUnitOfWork(sharded_session_factory)
+    services.add_task("Midgar", REVIEW_STAFFING, "Kosovo", run_on(2), uow)
+
+    services.assign("MB13", "Midgar", run_on(2), uow)
+
+    with shards[2].connect() as connection:
+        assert connection.execute("SELECT user_id FROM assignments").scalars().all() == [1]
+
+
+def test_replicated_users_follow_the_directory(shards, mappers):
+    add_editor(shards[0], model.Editor("Medhi", "MB13"))
+    sharding.replicate_users(shards)
+    with shards[0].begin() as connection:
+        connection.execute("UPDATE users SET capacity = 7")
+        connection.execute("INSERT INTO users (id, name, editor_id, role) VALUES (2, 'Fred', 'FLS92', 'editor')")
+
+    sharding.replicate_users(shards)
+
+    for engine in shards:
+        with engine.connect() as connection:
+            assert connection.execute("SELECT id, capacity FROM users ORDER BY id").all() == [(1, 7), (2, 1)]
+
+
+def test_validation_jobs_are_found_on_their_shard(shards, sharded_session_factory):
+    uow = unit_of_work.SQLAlchemyUnitOfWork(sharded_session_factory)
+    services.add_task("Midgar", REVIEW_STAFFING, "Kosovo", run_on(1), uow)
+    job_id, _ = services.start_validation(run_on(1), uow)
+
+    assert services.pending_validations(uow) == [job_id]
+    services.run_validation(job_id, uow, chunk_size=10)
+    assert views.validation_job(job_id, uow)["status"] == "done"
+    assert views.validation_job("unknown", uow) is None
+
+
+def test_a_unit_of_work_stays_on_the_shard_of_its_run(sharded_session_factory):
+    uow = unit_of_work.SQLAlchemyUnitOfWork(sharded_session_factory)
+    services.add_task("Midgar", REVIEW_STAFFING, "Kosovo", run_on(0), uow)
+
+    with pytest.raises(sharding.RunOnAnotherShard):
+        with uow:
+            uow.so.get(run_on(0))
+            uow.so.get(run_on(1))
+
+
+def test_runs_are_sharded_asynchronously(shards, mappers):
+    session_factory = sessionmaker(
+        class_=AsyncSession,
+        sync_session_class=sharding.ShardedSession,
+        shards=[create_async_engine(f"sqlite+aiosqlite:///{engine.url.database}").sync_engine for engine in shards],
+        expire_on_commit=False,
+    )
+
+    async def scenario():
+        uow = unit_of_work.AsyncSQLAlchemyUnitOfWork(session_factory)
+        await async_services.add_task("Midgar", REVIEW_STAFFING, "Kosovo", run_on(1), uow)
+        return await views.async_run_summary(run_on(1), uow)
+
+    assert asyncio.run(scenario())["tasks"] == 1
+    assert [run_ids(engine) for engine in shards] == [set(), {run_on(1)}, set()]
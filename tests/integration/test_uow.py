@@ -0,0 +1,242 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+from src.staffoptimizer.adapters import repository
+from src.staffoptimizer.domain import model
+from src.staffoptimizer.domain.model import Status
+from src.staffoptimizer.service_layer import unit_of_work, services
+
+
+def test_add_tasks_inserts_the_batch_in_one_unit_of_work(session_factory):
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory)
+    services.add_task("Midgar", Status.REVIEW_STAFFING.value, "Arts and Craft", "KB9", uow)
+
+    rejected = services.add_tasks(
+        "KB9",
+        [(f"Task {i}", Status.REVIEW_STAFFING.value, "Kosovo") for i in range(2500)]
+        + [("Midgar", Status.REVIEW_STAFFING.value, "Kosovo")],
+        uow,
+    )
+
+    assert rejected == [(2500, "Midgar", "TaskAlreadyExists")]
+    session = session_factory()
+    [[count]] = session.execute("SELECT count(*) FROM tasks WHERE run_id = 'KB9'")
+    assert count == 2501
+
+
+def test_add_tasks_creates_the_run(session_factory):
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory)
+    services.add_tasks("KB9", [("Midgar", Status.REVIEW_STAFFING.value, "Kosovo")], uow)
+
+    session = session_factory()
+    assert list(session.execute("SELECT run_id, reference, status, team FROM tasks")) == [
+        ("KB9", "Midgar", Status.REVIEW_STAFFING.value, "Kosovo")
+    ]
+
+
+def test_loaded_aggregate_indexes_its_tasks(session_factory):
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory)
+    services.add_tasks(
+        "KB9",
+        [
+            ("Midgar", Status.REVIEW_STAFFING.value, "Arts and Craft"),
+            ("Chocobo farm", Status.READY_FOR_STAFFING.value, "Kosovo"),
+        ],
+        uow,
+    )
+
+    with uow:
+        so = uow.so.get("KB9")
+        midgar = so.get_task("Midgar")
+        assert so.tasks.in_team("Kosovo") == [so.get_task("Chocobo farm")]
+        midgar.status = Status.READY_TO_EDIT.value
+        assert so.tasks.with_status(Status.READY_TO_EDIT.value) == [midgar]
+        uow.commit()
+
+    session = session_factory()
+    [[status]] = session.execute("SELECT status FROM tasks WHERE reference = 'Midgar'")
+    assert status == Status.READY_TO_EDIT.value
+
+
+def test_editor_count_is_rebuilt_when_assignments_are_loaded(session_factory):
+    session = session_factory()
+    session.execute("INSERT INTO staffoptimizers (run_id) VALUES ('KB9')")
+    session.execute(
+        "INSERT INTO tasks (id, run_id, reference, status, team)"
+        " VALUES (1, 'KB9', 'Midgar', 2, 'Arts and Craft')"
+    )
+    session.execute("INSERT INTO users (id, name, editor_id, role) VALUES (1, 'Medhi', 'MB13', 'editor')")
+    session.execute("INSERT INTO users (id, name, csid, role) VALUES (2, 'Aerith', 'CS1', 'content_strategist')")
+    session.execute("INSERT INTO assignments (task_id, user_id) VALUES (1, 1), (1, 2)")
+    session.commit()
+
+    task = session_factory().query(model.Task).one()
+
+    assert {type(user) for user in task._assignments} == {model.Editor, model.ContentStrategist}
+    assert task._assignments.editors == 1
+    assert task.staffed
+
+
+def test_loaded_tasks_share_their_run_id_and_team(session_factory):
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory)
+    services.add_tasks("KB9", [(f"Task {i}", Status.REVIEW_STAFFING.value, "Kosovo") for i in range(3)], uow)
+
+    with uow:
+        first, *others = uow.so.get("KB9", profile="validate").tasks
+        assert all(task.team is first.team and task.run_id is first.run_id for task in others)
+        assert first.status == Status.REVIEW_STAFFING
+
+
+def insert_run(session_factory, size, assigned=True):
+    session = session_factory()
+    session.execute("INSERT INTO staffoptimizers (run_id) VALUES ('KB9')")
+    session.execute("INSERT INTO users (id, name, editor_id, role) VALUES (1, 'Medhi', 'MB13', 'editor')")
+    for i in range(size):
+        session.execute(
+            f"INSERT INTO tasks (id, run_id, reference, status, team) VALUES ({i}, 'KB9', 'Task {i}', 2, 'Kosovo')"
+        )
+        if assigned:
+            session.execute(f"INSERT INTO assignments (task_id, user_id) VALUES ({i}, 1)")
+    session.commit()
+
+
+def test_validate_loads_the_run_with_a_constant_number_of_selects(session_factory, assert_selects):
+    insert_run(session_factory, size=50)
+    # The run, its tasks, their assignments
+    with assert_selects(3):
+        services.validate("KB9", unit_of_work.SQLAlchemyUnitOfWork(session_factory))
+
+
+def test_assign_loads_a_single_task(session_factory, assert_selects):
+    insert_run(session_factory, size=50, assigned=False)
+    # The run joined to the task, the task assignments, the editor
+    with assert_selects(3):
+        services.assign("MB13", "Task 7", "KB9", unit_of_work.SQLAlchemyUnitOfWork(session_factory))
+
+
+def test_add_task_loads_a_single_task(session_factory, assert_selects):
+    insert_run(session_factory, size=50)
+    with assert_selects(2):
+        with pytest.raises(services.TaskAlreadyExists):
+            services.add_task("Task 7", 2, "Kosovo", "KB9", unit_of_work.SQLAlchemyUnitOfWork(session_factory))
+
+
+def test_database_rejects_duplicated_references(session_factory):
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory)
+    services.add_task("Midgar", Status.REVIEW_STAFFING.value, "Arts and Craft", "KB9", uow)
+
+    # As if another request had added the task since references were checked
+    with pytest.raises(unit_of_work.IntegrityViolation) as violation:
+        with uow:
+            so = uow.so.get("KB9", profile="add_tasks")
+            uow.so.add_tasks(so, [model.Task("Midgar", Status.REVIEW_STAFFING.value, "Kosovo")])
+
+    assert violation.value.constraint == "uq_tasks_run_id_reference"
+
+
+def test_requests_adding_the_first_tasks_of_a_run_are_both_committed(file_db, mappers, monkeypatch):
+    session_factory = sessionmaker(bind=file_db)
+    get = repository.StaffOptimizerRepository.get
+
+    def get_missed(self, run_id, profile=None, **criteria):
+        monkeypatch.setattr(repository.StaffOptimizerRepository, "get", get)
+        # As if another request had created the run since it was looked up
+        services.add_task("Midgar", 2, "Kosovo", run_id, unit_of_work.SQLAlchemyUnitOfWork(session_factory))
+        return None
+
+    monkeypatch.setattr(repository.StaffOptimizerRepository, "get", get_missed)
+    services.add_task("Gold Saucer", 2, "Kosovo", "KB9", unit_of_work.SQLAlchemyUnitOfWork(session_factory))
+
+    session = session_factory()
+    assert session.execute(text("SELECT reference FROM tasks ORDER BY reference")).scalars().all() == [
+        "Gold Saucer", "Midgar"
+    ]
+    assert session.execute(text("SELECT team, tasks FROM run_summaries")).all() == [("Kosovo", 2)]
+
+
+def test_other_integrity_violations_are_not_duplicated_tasks(session_factory):
+    with pytest.raises(unit_of_work.IntegrityViolation) as violation:
+        with unit_of_work.SQLAlchemyUnitOfWork(session_factory) as uow:
+            uow.session.execute(text("INSERT INTO tasks (run_id, reference) VALUES (NULL, 'Midgar')"))
+            uow.commit()
+
+    assert violation.value.constraint is None
+
+
+def test_users_are_loaded_with_their_role(session):
+    session.add_all([model.Editor("Medhi", "MB13"), model.ContentStrategist("Aerith", "CS1")])
+    session.commit()
+
+    assert isinstance(repository.UserRepository(session).get_editor("MB13"), model.Editor)
+    assert repository.UserRepository(session).get_editor("CS1") is None
+    assert session.query(model.User).filter_by(name="Aerith").one().csid == "CS1"
+
+
+def test_unallocated_tasks_are_filtered_by_the_database(session_factory):
+    session = session_factory()
+    editor, strategist = model.Editor("Medhi", "MB13"), model.ContentStrategist("Aerith", "CS1")
+    staffed = model.Task("Midgar", Status.REVIEW_STAFFING.value, "Kosovo")
+    staffed.assign(editor)
+    unallocated = model.Task("Chocobo farm", Status.REVIEW_STAFFING.value, "Kosovo")
+    unallocated.assign(strategist)
+    waiting = model.Task("Nibelheim", Status.READY_FOR_STAFFING.value, "Kosovo")
+    session.add(model.StaffOptimizer("KB9", [staffed, unallocated, waiting]))
+    session.commit()
+
+    tasks = repository.StaffOptimizerRepository(session_factory()).list_unallocated("KB9")
+
+    assert [t.reference for t in tasks] == ["Chocobo farm"]
+
+
+def test_assign_many_resolves_editors_in_one_query(session_factory, assert_selects):
+    insert_run(session_factory, size=50, assigned=False)
+    session = session_factory()
+    session.add(model.Editor("Fred", "FLS92"))
+    session.commit()
+
+    # The run joined to the tasks, their assignments, the editors
+    with assert_selects(3):
+        outcomes = services.assign_many(
+            "KB9",
+            [("MB13", "Task 1"), ("FLS92", "Task 2"), ("Cid", "Task 3")],
+            unit_of_work.SQLAlchemyUnitOfWork(session_factory),
+        )
+
+    assert outcomes == [None, None, "EditorNotFound"]
+    assert sorted(session_factory().execute("SELECT task_id, user_id FROM assignments")) == [(1, 1), (2, 2)]
+
+
+def test_optimize_persists_the_allocation(session_factory):
+    session = session_factory()
+    session.add_all(
+        [
+            model.Editor("Medhi", "MB13", team="Kosovo", capacity=1),
+            model.Editor("Fred", "FLS92", team="Arts and Craft", capacity=1),
+        ]
+    )
+    session.commit()
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory)
+    services.add_tasks(
+        "KB9",
+        [("Midgar", Status.READY_FOR_STAFFING.value, "Arts and Craft"), ("Chocobo farm", 1, "Kosovo")],
+        uow,
+    )
+
+    assert set(services.optimize("KB9", uow)) == {("FLS92", "Midgar"), ("MB13", "Chocobo farm")}
+    services.validate("KB9", uow)
+    with uow:
+        assert {t.reference for t in uow.so.get("KB9").staffed_tasks} == {"Midgar", "Chocobo farm"}
+
+
+def test_stream_tasks_groups_assignments_across_batches(session_factory, assigned_run):
+    expected = assigned_run(session_factory())
+
+    session = session_factory()
+    # A batch per row: the assignments of Chocobo farm are split between two batches
+    assert list(repository.StaffOptimizerRepository(session).stream_tasks("KB9", batch_size=1)) == expected
+
+
+def test_export_tasks_of_an_unknown_run(session_factory):
+    with pytest.raises(services.SORunNotFound):
+        next(services.export_tasks("CR7", unit_of_work.SQLAlchemyUnitOfWork(session_factory)))
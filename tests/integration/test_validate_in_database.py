@@ -0,0 +1,174 @@
+import random
+import threading
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from src.staffoptimizer import views
+from src.staffoptimizer.adapters import orm
+from src.staffoptimizer.domain import model
+from src.staffoptimizer.domain.model import Status
+from src.staffoptimizer.service_layer import messagebus, unit_of_work, services
+
+
+def make_users():
+    return [
+        model.Editor("Medhi", "MB13"),
+        model.Editor("Fred", "FLS92"),
+        model.ContentStrategist("Aerith", "CS1"),
+        model.EditorSupervisor("Cid", "ES1"),
+    ]
+
+
+def random_run(seed, size=200):
+    rng = random.Random(seed)
+    return [
+        (f"Task {i}", rng.choice(list(Status)).value, rng.sample(range(4), rng.randrange(3)))
+        for i in range(size)
+    ]
+
+
+def seed_run(session_factory, run):
+    session = session_factory()
+    users = make_users()
+    tasks = []
+    for ref, status, assignees in run:
+        task = model.Task(ref, status, "Kosovo")
+        for index in assignees:
+            task.assign(users[index])
+        tasks.append(task)
+    session.add(model.StaffOptimizer("KB9", tasks))
+    session.commit()
+
+
+def statuses(session_factory):
+    with session_factory() as session:
+        return dict(session.execute(select(orm.tasks.c.reference, orm.tasks.c.status)).all())
+
+
+def validate(session_factory, in_database):
+    services.validate("KB9", unit_of_work.SQLAlchemyUnitOfWork(session_factory), in_database=in_database)
+    return statuses(session_factory)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_validate_in_database_matches_validate_in_memory(session_factory, seed):
+    other_db = create_engine("sqlite:///:memory:")
+    orm.metadata.create_all(other_db)
+    other_session_factory = sessionmaker(bind=other_db)
+    run = random_run(seed)
+    seed_run(session_factory, run)
+    seed_run(other_session_factory, run)
+
+    assert validate(session_factory, in_database=True) == validate(other_session_factory, in_database=False)
+
+
+VALIDATION_MODES = [{}, {"in_database": True}, {"incremental": True}]
+
+
+@pytest.mark.parametrize("mode", VALIDATION_MODES)
+def test_validate_goes_on_hunger_strike_whatever_the_mode(session_factory, mode):
+    with session_factory() as session:
+        session.execute("INSERT INTO staffoptimizers (run_id) VALUES ('KB9')")
+        session.commit()
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory)
+    with pytest.raises(services.HungerStrike):
+        services.validate("KB9", uow, **mode)
+
+
+@pytest.mark.parametrize("mode", VALIDATION_MODES)
+def test_validate_an_unknown_run_whatever_the_mode(session_factory, mode):
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory)
+    with pytest.raises(services.SORunNotFound):
+        services.validate("KB9", uow, **mode)
+
+
+def inline_bus(session_factory):
+    return messagebus.MessageBus(lambda: unit_of_work.SQLAlchemyUnitOfWork(session_factory), workers=0)
+
+
+def summaries(session_factory):
+    with session_factory() as session:
+        return session.execute("SELECT team, tasks, staffed, unallocated FROM run_summaries ORDER BY team").all()
+
+
+def change_run(session_factory, run, seed):
+    rng = random.Random(seed)
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory)
+    # Tasks without an editor, staffed ones can't be assigned
+    lacking_editor = [ref for ref, _, assignees in run if not {0, 1} & set(assignees)]
+    for ref in rng.sample(lacking_editor, 10):
+        services.assign(rng.choice(["MB13", "FLS92"]), ref, "KB9", uow)
+    services.add_task("Midgar", Status.REVIEW_STAFFING.value, "Kosovo", "KB9", uow)
+
+
+@pytest.mark.parametrize("in_database", [False, True])
+def test_incremental_validate_matches_validating_the_whole_run(session_factory, in_database):
+    engine = create_engine("sqlite://")
+    orm.metadata.create_all(engine)
+    other_session_factory = sessionmaker(bind=engine)
+    run = random_run(seed=0)
+    for factory in (session_factory, other_session_factory):
+        seed_run(factory, run)
+        bus = inline_bus(factory)
+        services.validate("KB9", unit_of_work.SQLAlchemyUnitOfWork(factory, bus=bus), in_database=in_database)
+        change_run(factory, run, seed=1)
+        with factory() as session:
+            assert session.execute("SELECT count(*) FROM tasks WHERE needs_validation").scalar() == 11
+
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory, bus=inline_bus(session_factory))
+    services.validate("KB9", uow, incremental=True)
+    other_uow = unit_of_work.SQLAlchemyUnitOfWork(other_session_factory, bus=inline_bus(other_session_factory))
+    services.validate("KB9", other_uow)
+
+    assert statuses(session_factory) == statuses(other_session_factory)
+    assert summaries(session_factory) == summaries(other_session_factory)
+    with session_factory() as session:
+        assert session.execute("SELECT count(*) FROM tasks WHERE needs_validation").scalar() == 0
+
+
+def test_validation_job_matches_validate_in_memory(session_factory):
+    run = random_run(seed=0)
+    seed_run(session_factory, run)
+    engine = create_engine("sqlite://")
+    orm.metadata.create_all(engine)
+    other_session_factory = sessionmaker(bind=engine)
+    seed_run(other_session_factory, run)
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory, bus=inline_bus(session_factory))
+
+    job_id, created = services.start_validation("KB9", uow)
+    services.run_validation(job_id, uow, chunk_size=30)
+
+    assert created
+    with session_factory() as session:
+        [[summarized]] = session.execute("SELECT sum(tasks) FROM run_summaries WHERE run_id = 'KB9'")
+    assert statuses(session_factory) == validate(other_session_factory, in_database=False)
+    job = views.validation_job(job_id, uow)
+    assert (job["status"], job["tasks"], job["validated"], summarized) == ("done", 200, 200, 200)
+
+
+def test_a_run_is_validated_by_a_single_job_at_a_time(session_factory):
+    seed_run(session_factory, random_run(seed=0))
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory)
+
+    job_id, _ = services.start_validation("KB9", uow)
+
+    assert services.start_validation("KB9", uow) == (job_id, False)
+    services.run_validation(job_id, uow)
+    assert services.start_validation("KB9", uow)[0] != job_id
+
+
+def test_an_interrupted_job_resumes_where_it_stopped(session_factory):
+    seed_run(session_factory, random_run(seed=0))
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory)
+    job_id, _ = services.start_validation("KB9", uow)
+    stopping = threading.Event()
+    stopping.set()
+
+    services.run_validation(job_id, uow, chunk_size=50, stopping=stopping)
+
+    assert views.validation_job(job_id, uow)["validated"] == 50
+    assert services.pending_validations(uow) == [job_id]
+    services.run_validation(job_id, uow, chunk_size=50)
+    assert (views.validation_job(job_id, uow)["validated"], services.pending_validations(uow)) == (200, [])
@@ -0,0 +1,38 @@
+from sqlalchemy import create_engine
+
+from src.staffoptimizer import bootstrap
+from src.staffoptimizer.adapters import orm
+from src.staffoptimizer.config import Settings
+from src.staffoptimizer.domain.model import Status
+
+
+REVIEW_STAFFING = Status.REVIEW_STAFFING.value
+
+
+def test_runs_are_validated_by_worker_processes(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'staffoptimizer.sqlite'}")
+    orm.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(orm.staffoptimizers.insert(), [{"run_id": f"RUN{r}"} for r in range(4)])
+        connection.execute(
+            orm.tasks.insert(),
+            [
+                {"run_id": f"RUN{r}", "reference": f"Task {t}", "status": REVIEW_STAFFING, "team": "Kosovo"}
+                for r in range(3)
+                for t in range(5)
+            ],
+        )
+    settings = Settings(database_url=str(engine.url), metrics_enabled=False)
+
+    errors = bootstrap.validate_many([f"RUN{r}" for r in range(4)], processes=2, settings=settings)
+
+    assert errors == {
+        "RUN0": None,
+        "RUN1": None,
+        "RUN2": None,
+        "RUN3": "HungerStrike: Not a single task to run in the StaffOptimizer",
+    }
+    with engine.connect() as connection:
+        assert set(connection.execute("SELECT status FROM tasks").scalars()) == {Status.READY_FOR_STAFFING.value}
+        # Refreshed by validate, within the worker
+        assert connection.execute("SELECT sum(tasks) FROM run_summaries").scalar() == 15
@@ -0,0 +1,81 @@
+import threading
+
+from sqlalchemy.orm import sessionmaker
+
+from src.staffoptimizer import views
+from src.staffoptimizer.domain import events, model
+from src.staffoptimizer.domain.model import Status
+from src.staffoptimizer.service_layer import messagebus, services, unit_of_work
+
+
+def test_run_summary_follows_the_write_side(session_factory, assert_selects):
+    session = session_factory()
+    session.add(model.Editor("Medhi", "MB13"))
+    session.commit()
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory)
+    services.add_task("Midgar", Status.REVIEW_STAFFING.value, "Kosovo", "KB9", uow)
+    services.add_tasks(
+        "KB9",
+        [("Chocobo farm", Status.REVIEW_STAFFING.value, "Kosovo"), ("Nibelheim", Status.REVIEW_STAFFING.value, None)],
+        uow,
+    )
+    services.assign("MB13", "Midgar", "KB9", uow)
+    services.validate("KB9", uow)
+
+    with assert_selects(1):
+        summary = views.run_summary("KB9", uow)
+
+    assert summary == {
+        "run_id": "KB9",
+        "tasks": 3,
+        "staffed": 1,
+        "unallocated": 0,
+        "teams": [
+            {"team": None, "tasks": 1, "staffed": 0, "unallocated": 0},
+            {"team": "Kosovo", "tasks": 2, "staffed": 1, "unallocated": 0},
+        ],
+    }
+    with uow:
+        so = uow.so.get("KB9")
+        assert (len(so.staffed_tasks), len(so.unallocated_tasks)) == (summary["staffed"], summary["unallocated"])
+
+
+def test_summary_of_a_validated_run_is_refreshed_once_the_request_is_done(file_db, mappers):
+    session_factory = sessionmaker(bind=file_db)
+    bus = messagebus.MessageBus(lambda: unit_of_work.SQLAlchemyUnitOfWork(session_factory), workers=1)
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory, bus=bus)
+    services.add_task("Midgar", Status.REVIEW_STAFFING.value, "Kosovo", "KB9", uow)
+    # Keeps the single worker busy
+    busy = threading.Event()
+    bus.submit([(events.TaskAdded("KB9", "Midgar", 2, "Kosovo"), lambda *_: busy.wait(5))])
+
+    services.validate("KB9", uow)
+
+    # Committed, but not summarized yet
+    assert views.run_summary("KB9", uow)["unallocated"] == 1
+    busy.set()
+    assert bus.join(timeout=5)
+    bus.shutdown()
+    assert views.run_summary("KB9", uow)["unallocated"] == 0
+
+
+def test_run_summary_of_an_unknown_run(session_factory):
+    assert views.run_summary("CR7", unit_of_work.SQLAlchemyUnitOfWork(session_factory)) is None
+
+
+def test_patched_summary_matches_a_recomputed_one(session_factory):
+    session = session_factory()
+    session.add_all([model.Editor("Medhi", "MB13", team="Kosovo", capacity=2), model.Editor("Fred", "FLS92")])
+    session.commit()
+    uow = unit_of_work.SQLAlchemyUnitOfWork(session_factory)
+    services.add_tasks("KB9", [(f"Task {i}", 1 + i % 2, ["Kosovo", "Arts", None][i % 3]) for i in range(12)], uow)
+    services.add_task("Midgar", Status.REVIEW_STAFFING.value, "Arts", "KB9", uow)
+    services.assign("FLS92", "Midgar", "KB9", uow)
+    services.assign_many("KB9", [("MB13", "Task 1"), ("FLS92", "Task 2"), ("MB13", "Nibelheim")], uow)
+    services.optimize("KB9", uow)
+
+    patched = session.execute("SELECT team, tasks, staffed, unallocated FROM run_summaries ORDER BY team").all()
+    with uow:
+        uow.so.refresh_summary("KB9")
+        uow.commit()
+    assert session.execute("SELECT team, tasks, staffed, unallocated FROM run_summaries ORDER BY team").all() == patched
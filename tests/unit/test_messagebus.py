@@ -0,0 +1,56 @@
+import threading
+
+from src.staffoptimizer.domain import events
+from src.staffoptimizer.service_layer import messagebus
+
+VALIDATED = events.RunValidated("KB9", staffed=1, unallocated=0)
+
+
+class FakeUnitOfWork:
+    pass
+
+
+def test_handlers_get_a_unit_of_work_of_their_own():
+    handled = []
+    bus = messagebus.MessageBus(
+        FakeUnitOfWork, {events.RunValidated: [lambda event, uow: handled.append((event, type(uow)))]}, workers=2
+    )
+
+    bus.publish([VALIDATED, events.TaskAssigned("KB9", "Midgar", "MB13")])
+
+    assert bus.join(timeout=5)
+    assert handled == [(VALIDATED, FakeUnitOfWork)]
+    bus.shutdown()
+
+
+def test_publishing_waits_for_a_free_slot():
+    release = threading.Event()
+    bus = messagebus.MessageBus(
+        FakeUnitOfWork, {events.RunValidated: [lambda event, uow: release.wait(5)]}, workers=1, max_pending=1
+    )
+    bus.publish([VALIDATED])
+
+    # The only slot is taken: what can't be queued is handed back rather than waited for
+    [handler] = bus.handlers[events.RunValidated]
+    assert bus.publish([VALIDATED, VALIDATED], block=False) == [(VALIDATED, handler)] * 2
+    publisher = threading.Thread(target=bus.publish, args=([VALIDATED],))
+    publisher.start()
+    while not bus.stats()["waits"]:
+        publisher.join(timeout=0.01)
+    release.set()
+    publisher.join(timeout=5)
+
+    assert bus.join(timeout=5)
+    assert bus.stats() == {"pending": 0, "handled": 2, "failed": 0, "waits": 1}
+    bus.shutdown()
+
+
+def test_a_failing_handler_doesnt_fail_the_publisher():
+    def failing(event, uow):
+        raise RuntimeError("Mail server down")
+
+    bus = messagebus.MessageBus(FakeUnitOfWork, {events.RunValidated: [failing]}, workers=0)
+
+    bus.publish([VALIDATED])
+
+    assert bus.stats()["failed"] == 1
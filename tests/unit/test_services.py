@@ -1,50 +1,150 @@
-from src.staffoptimizer.adapters import repository
-from src.staffoptimizer.domain import model
+from concurrent.futures import ThreadPoolExecutor
+
+from src.staffoptimizer.domain import events, model
 from src.staffoptimizer.domain.model import Status
-from src.staffoptimizer.service_layer import unit_of_work, services
+from src.staffoptimizer.service_layer import services
+from tests.fakes import FakeUnitOfWork
+
+
+def test_assign_returns_taskref():
+    uow = FakeUnitOfWork()
+    uow.user.add(model.Editor("Medhi", "MB13"))
+    services.add_task("Vidéo d'Emma", Status.REVIEW_STAFFING.value, "Arts and Craft", "CR7", uow)
+    result = services.assign("MB13", "Vidéo d'Emma", "CR7", uow)
+    assert result == "Vidéo d'Emma"
 
 
-class FakeSORepository(repository.AbstractRepository):
-    def __init__(self, so):
-        self._so = set(so)
+def test_events_are_collected_once_committed():
+    uow = FakeUnitOfWork()
+    uow.user.add(model.Editor("Medhi", "MB13"))
+    services.add_task("Vidéo d'Emma", Status.REVIEW_STAFFING.value, "Arts and Craft", "CR7", uow)
+    services.assign("MB13", "Vidéo d'Emma", "CR7", uow)
 
-    def add(self, so):
-        self._so.add(so)
+    assert uow.collect_new_events() == [
+        events.TaskAdded("CR7", "Vidéo d'Emma", Status.REVIEW_STAFFING.value, "Arts and Craft"),
+        events.TaskAssigned("CR7", "Vidéo d'Emma", "MB13"),
+    ]
+    assert uow.collect_new_events() == []
 
-    def get(self, run_id):
-        return next((so for so in self._so if so.run_id == run_id), None)
 
+def test_validate_many_reports_the_error_of_each_run():
+    uow = FakeUnitOfWork()
+    services.add_task("Vidéo d'Emma", Status.REVIEW_STAFFING.value, "Arts and Craft", "CR7", uow)
+    uow.so.add(model.StaffOptimizer("KB9", []))
 
-class FakeUserRepository(repository.AbstractRepository):
-    def __init__(self, user):
-        self._user = set(user)
+    with ThreadPoolExecutor(2) as executor:
+        errors = services.validate_many(["CR7", "KB9", "FF7", "CR7"], lambda: uow, executor)
 
-    def add(self, user):
-        self._user.add(user)
+    assert errors == {
+        "CR7": None,
+        "KB9": "HungerStrike: Not a single task to run in the StaffOptimizer",
+        "FF7": "SORunNotFound: Invalid run_id FF7",
+    }
+    assert uow.so.get("CR7").get_task("Vidéo d'Emma").status == Status.READY_FOR_STAFFING.value
 
-    def get(self, ref):
-        pass
 
-    def get_editor(self, editor_id):
-        return next((user for user in self._user if user.editor_id == editor_id), None)
+def test_add_tasks_reports_duplicates_without_aborting_the_batch():
+    uow = FakeUnitOfWork()
+    services.add_task("Vidéo d'Emma", Status.REVIEW_STAFFING.value, "Arts and Craft", "CR7", uow)
+    rejected = services.add_tasks(
+        "CR7",
+        [
+            ("Vidéo d'Emma", Status.REVIEW_STAFFING.value, "Arts and Craft"),
+            ("Midgar", Status.REVIEW_STAFFING.value, "Kosovo"),
+            ("Midgar", Status.REVIEW_STAFFING.value, "Kosovo"),
+        ],
+        uow,
+    )
+    assert rejected == [
+        (0, "Vidéo d'Emma", "TaskAlreadyExists"),
+        (2, "Midgar", "TaskAlreadyExists"),
+    ]
+    assert [t.reference for t in uow.so.get("CR7").tasks] == ["Vidéo d'Emma", "Midgar"]
+    assert uow.committed
 
 
-class FakeUnitOfWork(unit_of_work.AbstractUnitOfWork):
-    def __init__(self):
-        self.so = FakeSORepository([])
-        self.user = FakeUserRepository([])
-        self.committed = False
+def test_assign_many_reports_each_pair():
+    uow = FakeUnitOfWork()
+    uow.user.add(model.Editor("Medhi", "MB13"))
+    uow.user.add(model.Editor("Fred", "FLS92"))
+    for ref in ("Midgar", "Chocobo farm"):
+        services.add_task(ref, Status.REVIEW_STAFFING.value, "Kosovo", "KB9", uow)
 
-    def commit(self):
-        self.committed = True
+    outcomes = services.assign_many(
+        "KB9",
+        [
+            ("MB13", "Midgar"),
+            ("FLS92", "Midgar"),
+            ("Cid", "Chocobo farm"),
+            ("FLS92", "Nibelheim"),
+            ("FLS92", "Chocobo farm"),
+        ],
+        uow,
+    )
 
-    def rollback(self):
-        pass
+    assert outcomes == [None, "TaskAlreadyStaffed", "EditorNotFound", "TaskNotFound", None]
+    assert {t.reference for t in uow.so.get("KB9").staffed_tasks} == {"Midgar", "Chocobo farm"}
 
 
-def test_assign_returns_taskref():
+def test_optimize_staffs_tasks_lacking_an_editor():
     uow = FakeUnitOfWork()
-    uow.user.add(model.Editor("Medhi", "MB13"))
-    services.add_task("Vidéo d'Emma", Status.REVIEW_STAFFING.value, "Arts and Craft", "CR7", uow)
-    result = services.assign("MB13", "Vidéo d'Emma", "CR7", uow)
-    assert result == "Vidéo d'Emma"
+    uow.user.add(model.Editor("Medhi", "MB13", team="Kosovo", capacity=2))
+    uow.user.add(model.ContentStrategist("Aerith", "CS1"))
+    services.add_task("Midgar", Status.READY_FOR_STAFFING.value, "Kosovo", "KB9", uow)
+    services.add_task("Chocobo farm", Status.READY_FOR_STAFFING.value, "Kosovo", "KB9", uow)
+    services.add_task("Nibelheim", Status.REVIEW_STAFFING.value, "Kosovo", "KB9", uow)
+    services.assign("MB13", "Nibelheim", "KB9", uow)
+
+    assert services.optimize("KB9", uow) == [("MB13", "Midgar")]
+    assert uow.so.get("KB9").get_task("Midgar").status == Status.REVIEW_STAFFING.value
+    assert uow.so.get("KB9").get_task("Chocobo farm").needs_editor
+
+
+def test_import_tasks_reports_progress_and_rejected_lines():
+    uow = FakeUnitOfWork()
+    services.add_task("Midgar", Status.REVIEW_STAFFING.value, "Kosovo", "CR7", uow)
+    lines = [
+        "ref,status,team",
+        "Vidéo d'Emma,2,Arts and Craft",
+        "Midgar,2,Kosovo",
+        "Chocobo farm,7,Kosovo",
+        "",
+        "Nibelheim,1,",
+        "Gold Saucer,1,Kosovo",
+    ]
+
+    progress = list(services.import_tasks("CR7", lines, "csv", uow, batch_size=3))
+
+    assert progress == [
+        (1, [(3, "Midgar", "TaskAlreadyExists")]),
+        (1, [(4, None, "InvalidTask: Invalid status 7"), (6, None, "InvalidTask: Missing team")]),
+        (2, []),
+    ]
+    assert [t.reference for t in uow.so.get("CR7").tasks] == ["Midgar", "Vidéo d'Emma", "Gold Saucer"]
+
+
+def test_import_tasks_creates_the_run():
+    uow = FakeUnitOfWork()
+
+    lines = ['{"ref": "Midgar", "status": 2, "team": "Kosovo"}', '["Chocobo farm", 2, "Kosovo"]']
+
+    progress = list(services.import_tasks("CR7", lines, "ndjson", uow))
+
+    assert progress == [(1, [(2, None, "InvalidTask: A JSON object is expected")])]
+    assert uow.so.get("CR7").tasks.get("Midgar")
+
+
+def test_import_tasks_rejects_a_status_which_isnt_a_number():
+    uow = FakeUnitOfWork()
+    lines = [
+        '{"ref": "Midgar", "status": [1], "team": "Kosovo"}',
+        '{"ref": "Chocobo farm", "status": {}, "team": "Kosovo"}',
+        '{"ref": "Nibelheim", "status": 2, "team": "Kosovo"}',
+    ]
+
+    progress = list(services.import_tasks("CR7", lines, "ndjson", uow))
+
+    assert progress == [
+        (1, [(1, None, "InvalidTask: Invalid status [1]"), (2, None, "InvalidTask: Invalid status {}")]),
+    ]
+    assert [t.reference for t in uow.so.get("CR7").tasks] == ["Nibelheim"]
@@ -0,0 +1,57 @@
+from collections import Counter
+
+from hypothesis import given, strategies as st
+
+from src.staffoptimizer.domain.model import Task, Status, Editor
+from src.staffoptimizer.domain.solver import allocate
+
+TEAMS = ["Arts and Craft", "Kosovo", "Sports"]
+
+
+def make_task(i, team):
+    return Task(f"Task {i}", Status.REVIEW_STAFFING.value, team)
+
+
+def test_editors_of_the_same_team_come_first():
+    medhi = Editor("Medhi", "MB13", team="Arts and Craft", capacity=1)
+    fred = Editor("Fred", "FLS92", team="Kosovo", capacity=1)
+    midgar, chocobo = make_task(1, "Kosovo"), make_task(2, "Arts and Craft")
+
+    assert allocate([midgar, chocobo], [medhi, fred]) == [(fred, midgar), (medhi, chocobo)]
+
+
+def test_leftover_tasks_fill_the_remaining_capacity():
+    medhi = Editor("Medhi", "MB13", team="Arts and Craft", capacity=2)
+    tasks = [make_task(i, "Kosovo") for i in range(3)]
+
+    assert allocate(tasks, [medhi]) == [(medhi, tasks[0]), (medhi, tasks[1])]
+
+
+def test_workload_counts_against_capacity():
+    medhi = Editor("Medhi", "MB13", team="Kosovo", capacity=2)
+    fred = Editor("Fred", "FLS92", team="Kosovo", capacity=2)
+    tasks = [make_task(i, "Kosovo") for i in range(3)]
+
+    allocation = allocate(tasks, [medhi, fred], workload={medhi: 1})
+
+    assert Counter(editor for editor, _ in allocation) == {medhi: 1, fred: 2}
+
+
+@given(
+    task_teams=st.lists(st.sampled_from(TEAMS), max_size=60),
+    editors=st.lists(st.tuples(st.sampled_from(TEAMS + [None]), st.integers(0, 5)), max_size=15),
+)
+def test_allocation_is_optimal(task_teams, editors):
+    tasks = [make_task(i, team) for i, team in enumerate(task_teams)]
+    editors = [Editor(f"E{i}", f"E{i}", team, capacity) for i, (team, capacity) in enumerate(editors)]
+
+    allocation = allocate(tasks, editors)
+
+    load = Counter(editor for editor, _ in allocation)
+    assert all(load[editor] <= editor.capacity for editor in editors)
+    assert len({id(task) for _, task in allocation}) == len(allocation)
+    assert len(allocation) == min(len(tasks), sum(e.capacity for e in editors))
+    same_team = sum(editor.team == task.team for editor, task in allocation)
+    assert same_team == sum(
+        min(task_teams.count(team), sum(e.capacity for e in editors if e.team == team)) for team in TEAMS
+    )
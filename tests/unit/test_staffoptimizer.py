@@ -0,0 +1,60 @@
+from src.staffoptimizer.domain import events
+from src.staffoptimizer.domain.model import StaffOptimizer, Task, Status, Editor
+
+
+def test_tasks_are_found_by_reference():
+    midgar = Task("Midgar", Status.REVIEW_STAFFING.value, "Arts and Craft")
+    so = StaffOptimizer("KB9", tasks=[midgar])
+    so.tasks.append(Task("Chocobo farm", Status.REVIEW_STAFFING.value, "Kosovo"))
+    assert so.get_task("Midgar") is midgar
+    assert so.get_task("Chocobo farm").team == "Kosovo"
+    assert so.get_task("Nibelheim") is None
+
+
+def test_indexes_follow_status_and_team_changes():
+    midgar = Task("Midgar", Status.REVIEW_STAFFING.value, "Arts and Craft")
+    so = StaffOptimizer("KB9", tasks=[midgar])
+    midgar.status = Status.READY_TO_EDIT.value
+    midgar.team = "Kosovo"
+    assert so.tasks.with_status(Status.REVIEW_STAFFING.value) == []
+    assert so.tasks.with_status(Status.READY_TO_EDIT.value) == [midgar]
+    assert so.tasks.in_team("Arts and Craft") == []
+    assert so.tasks.in_team("Kosovo") == [midgar]
+
+
+def test_staffed_and_unallocated_tasks_follow_assignments():
+    midgar = Task("Midgar", Status.REVIEW_STAFFING.value, "Arts and Craft")
+    waiting = Task("Chocobo farm", Status.READY_FOR_STAFFING.value, "Kosovo")
+    so = StaffOptimizer("KB9", tasks=[midgar, waiting])
+    assert so.unallocated_tasks == [midgar]
+    so.assign(Editor("Medhi", "MB13"), midgar)
+    assert so.staffed_tasks == [midgar]
+    assert so.unallocated_tasks == []
+
+
+def test_changes_to_the_run_are_recorded_as_events():
+    so = StaffOptimizer("KB9", tasks=[])
+    midgar = Task("Midgar", Status.REVIEW_STAFFING.value, "Kosovo")
+    so.add_task(midgar)
+    so.add_task(Task("Chocobo farm", Status.REVIEW_STAFFING.value, "Kosovo"))
+    so.assign(Editor("Medhi", "MB13"), midgar)
+    so.validate()
+
+    assert so.events == [
+        events.TaskAdded("KB9", "Midgar", Status.REVIEW_STAFFING.value, "Kosovo"),
+        events.TaskAdded("KB9", "Chocobo farm", Status.REVIEW_STAFFING.value, "Kosovo"),
+        events.TaskAssigned("KB9", "Midgar", "MB13"),
+        events.RunValidated("KB9", staffed=1, unallocated=1),
+    ]
+
+
+def test_tasks_changed_since_validated_need_to_be_validated_again():
+    midgar = Task("Midgar", Status.REVIEW_STAFFING.value, "Kosovo")
+    chocobo_farm = Task("Chocobo farm", Status.REVIEW_STAFFING.value, "Kosovo")
+    so = StaffOptimizer("KB9", tasks=[midgar, chocobo_farm])
+    so.validate()
+    assert not midgar.needs_validation and not chocobo_farm.needs_validation
+
+    so.assign(Editor("Medhi", "MB13"), midgar)
+    chocobo_farm.team = "Arts and Craft"
+    assert midgar.needs_validation and not chocobo_farm.needs_validation
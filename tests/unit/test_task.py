@@ -1,4 +1,6 @@
-from src.staffoptimizer.domain.model import Task, Status, Editor
+from hypothesis import given, strategies as st
+
+from src.staffoptimizer.domain.model import Task, Status, Editor, ContentStrategist, EditorSupervisor
 
 
 def make_task_and_editor(ref, status, team, name, editor_id):
@@ -19,3 +21,27 @@ def test_task_is_unallocated():
     assert task.staffed is True
     task.unassign(editor)
     assert task.unallocated is True
+
+
+users = st.sampled_from(
+    [
+        Editor("Medhi", "MB13"),
+        Editor("Fred", "FLS92"),
+        ContentStrategist("Aerith", "CS1"),
+        EditorSupervisor("Cid", "ES1"),
+    ]
+)
+
+
+@given(
+    status=st.sampled_from([s.value for s in Status]),
+    operations=st.lists(st.tuples(st.booleans(), users)),
+)
+def test_staffing_state_matches_a_scan_of_the_assignments(status, operations):
+    task = Task("Vidéo d'Emma", status, "Arts and Craft")
+    for assign, user in operations:
+        task.assign(user) if assign else task.unassign(user)
+
+    has_editor = any(isinstance(user, Editor) for user in task._assignments)
+    assert task.staffed is (status > Status.READY_FOR_STAFFING.value and has_editor)
+    assert task.unallocated is (status > Status.READY_FOR_STAFFING.value and not has_editor)